@@ -0,0 +1,81 @@
+'''
+Parser benchmark: large map and notes responses, per backend
+
+    python bench/bench_parser.py [--nodes 200000] [--notes 5000] [--repeat 3]
+
+prints the best of --repeat runs for every backend, next to the former
+multi-pass element parser as a reference.
+'''
+
+import os
+import sys
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from osm import osm_parser
+from osm.osm_util import Node, Way, Relation
+from bench.fixtures import synthetic_map, notes as synthetic_notes
+
+
+def multi_pass_elem(elem):
+    """
+    the former element parser: one findall per child kind and a dict copy per member
+    """
+    nodes = [node.get('ref') for node in elem.findall('nd')]
+    members = []
+    for member in elem.findall('member'):
+        mem = {key: member.get(key) for key in member.keys()}
+        mem['ref'] = int(mem['ref'])
+        members.append(mem)
+    tags = osm_parser.kv_parser(elem.findall('tag'))
+    args = (int(elem.get('version')), elem.get('changeset'), elem.get('user'), elem.get('uid'),
+            elem.get('timestamp'), elem.get('visible') != 'false', tags)
+    if elem.tag == 'node':
+        return Node(elem.get('id'), elem.get('lat'), elem.get('lon'), *args)
+    elif elem.tag == 'way':
+        return Way(elem.get('id'), nodes, *args)
+    return Relation(elem.get('id'), members, *args)
+
+
+def best(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(argv: list = None):
+    args = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    args.add_argument('--nodes', type=int, default=200000, help='nodes of the map response')
+    args.add_argument('--notes', type=int, default=5000, help='notes of the notes response')
+    args.add_argument('--repeat', type=int, default=3)
+    args = args.parse_args(argv)
+
+    osm_map = b''.join(synthetic_map((13.0, 52.0, 13.1, 52.1), args.nodes))
+    notes = synthetic_notes(args.notes)
+    print('map: {:.1f} MB, notes: {:.1f} MB'.format(len(osm_map) / 1e6, len(notes) / 1e6))
+    print('{:<8} {:<24} {:>10}'.format('backend', 'case', 'seconds'))
+
+    for name in osm_parser.available_backends():
+        osm_parser.use_backend(name)
+        tree = osm_parser.fromstring(osm_map)
+        cases = (('map parse', lambda: osm_parser.fromstring(osm_map)),
+                 ('map build multi-pass', lambda: [multi_pass_elem(sub) for sub in tree
+                                                   if sub.tag in ('node', 'way', 'relation')]),
+                 ('map build', lambda: osm_parser.parse_elems(tree)),
+                 ('map parse + build', lambda: osm_parser.parse_elems(osm_parser.fromstring(osm_map))),
+                 ('map streamed', lambda: sum(1 for _ in osm_parser.iter_elems(
+                     osm_map[i:i + 65536] for i in range(0, len(osm_map), 65536)))),
+                 ('notes parse + build', lambda: osm_parser.parse_notes(osm_parser.fromstring(notes))))
+        for case, fn in cases:
+            print('{:<8} {:<24} {:>10.3f}'.format(name, case, best(fn, args.repeat)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,268 @@
+'''
+Synthetic fixtures of realistic sizes for the benchmarks and the fake server
+
+every generator is deterministic, so runs compare against the stored baseline
+'''
+
+import math
+import random
+import urllib.parse
+from datetime import datetime, timedelta, timezone
+from osm.osm_util import Node, Way, Relation
+
+STAMP = '2020-05-30T08:01:10Z'
+KEYS = ('highway', 'name', 'surface', 'amenity', 'building', 'source', 'lit', 'oneway')
+
+
+def osm_map(n_elements: int = 50000, way_len: int = 8, seed: int = 1) -> bytes:
+    """
+    :returns: <osm> map response of about n_elements elements,
+        80% nodes, 18% ways of way_len nodes and 2% relations of 5 ways
+    """
+    rnd = random.Random(seed)
+    n_nodes = n_elements * 8 // 10
+    n_ways = (n_elements - n_nodes) * 9 // 10
+    n_relations = n_elements - n_nodes - n_ways
+    attrs = 'visible="true" version="{}" changeset="{}" timestamp="' + STAMP + '" user="user{}" uid="{}"'
+    parts = ['<?xml version="1.0" encoding="UTF-8"?>\n<osm version="0.6" generator="bench">\n'
+             ' <bounds minlat="52.0" minlon="13.0" maxlat="52.1" maxlon="13.1"/>\n']
+    for i in range(1, n_nodes + 1):
+        user = rnd.randrange(50)
+        head = ' <node id="{}" {} lat="{:.7f}" lon="{:.7f}"'.format(
+            i, attrs.format(rnd.randrange(1, 9), 1000 + i // 100, user, user), 52 + rnd.random() / 10,
+            13 + rnd.random() / 10)
+        if i % 5:
+            parts.append(head + '/>\n')
+        else:
+            parts.append(head + '>\n' + _tags(rnd, 2) + ' </node>\n')
+    for i in range(1, n_ways + 1):
+        user = rnd.randrange(50)
+        parts.append(' <way id="{}" {}>\n'.format(i, attrs.format(rnd.randrange(1, 9), 2000 + i // 100, user, user)))
+        parts.extend('  <nd ref="{}"/>\n'.format(ref) for ref in _refs(i, way_len, n_nodes))
+        parts.append(_tags(rnd, 3) + ' </way>\n')
+    for i in range(1, n_relations + 1):
+        user = rnd.randrange(50)
+        parts.append(' <relation id="{}" {}>\n'.format(i, attrs.format(1, 3000 + i, user, user)))
+        parts.extend('  <member type="way" ref="{}" role="{}"/>\n'.format(ref, 'outer' if ref % 5 else 'inner')
+                     for ref in _refs(i, 5, n_ways))
+        parts.append('  <tag k="type" v="multipolygon"/>\n' + _tags(rnd, 1) + ' </relation>\n')
+    parts.append('</osm>\n')
+    return ''.join(parts).encode()
+
+
+def notes(count: int = 5000, comments: int = 3) -> bytes:
+    """
+    :returns: <osm> notes response with count notes of comments comments each
+    """
+    parts = ['<?xml version="1.0" encoding="UTF-8"?>\n<osm version="0.6" generator="bench">\n']
+    for i in range(count):
+        parts.append(' <note lon="13.{0:07d}" lat="52.{0:07d}">\n  <id>{1}</id>\n'
+                     '  <url>https://api.openstreetmap.org/api/0.6/notes/{1}</url>\n'
+                     '  <date_created>2020-05-31 12:00:00 UTC</date_created>\n  <status>open</status>\n'
+                     '  <comments>\n'.format(i % 10000000, i + 1))
+        for j in range(comments):
+            parts.append('   <comment>\n    <date>2020-05-31 12:00:00 UTC</date>\n    <uid>{}</uid>\n'
+                         '    <user>user{}</user>\n    <action>commented</action>\n'
+                         '    <text>comment {} of note {}</text>\n   </comment>\n'.format(j, j, j, i))
+        parts.append('  </comments>\n </note>\n')
+    parts.append('</osm>\n')
+    return ''.join(parts).encode()
+
+
+def changesets(count: int = 2000, comments: int = 2) -> bytes:
+    """
+    :returns: <osm> changesets response, every changeset with tags and a discussion
+    """
+    parts = ['<?xml version="1.0" encoding="UTF-8"?>\n<osm version="0.6" generator="bench">\n']
+    for i in range(count, 0, -1):
+        parts.append(' <changeset id="{}" created_at="{}" open="false" closed_at="{}" user="user{}" uid="{}" '
+                     'min_lat="52.5" min_lon="13.4" max_lat="52.6" max_lon="13.5" comments_count="{}" '
+                     'changes_count="12">\n  <tag k="comment" v="change {}"/>\n'
+                     '  <tag k="created_by" v="JOSM/1.5 (18303 en)"/>\n  <discussion>\n'
+                     .format(i, STAMP, STAMP, i % 50, i % 50, comments, i))
+        for j in range(comments):
+            parts.append('   <comment date="{}" uid="{}" user="user{}">\n    <text>comment {}</text>\n'
+                         '   </comment>\n'.format(STAMP, j, j, j))
+        parts.append('  </discussion>\n </changeset>\n')
+    parts.append('</osm>\n')
+    return ''.join(parts).encode()
+
+
+def issues(count: int = 500) -> dict:
+    """
+    :returns: decoded osmose /issues?full=true response
+    """
+    kinds = ('nodes', 'ways', 'relations')
+    return {'issues': [{'id': '{:08x}-0000-0000-0000-{:012x}'.format(i, i), 'lat': 49.1 + i / 1e5,
+                        'lon': 9.3 + i / 1e5, 'item': 2080, 'class': 20805,
+                        'title': {'auto': 'Highway without type'}, 'subtitle': {'auto': 'amenity=bench'},
+                        'osm_ids': {kinds[i % 3]: [1000 + i, 2000 + i]}} for i in range(count)]}
+
+
+def elements(count: int = 10000, seed: int = 2) -> list:
+    """
+    :returns: downloaded looking nodes, ways and relations, 8:1:1
+    """
+    rnd = random.Random(seed)
+    elems = []
+    for i in range(1, count + 1):
+        tags = {key: 'value {}'.format(rnd.randrange(100)) for key in rnd.sample(KEYS, rnd.randrange(4))}
+        args = (rnd.randrange(1, 9), 1000 + i, 'user', 1, STAMP, True, tags)
+        if i % 10 == 9:
+            elems.append(Way(i, list(range(i, i + 8)), *args))
+        elif i % 10 == 0:
+            elems.append(Relation(i, [{'type': 'way', 'ref': i, 'role': 'outer'}], *args))
+        else:
+            elems.append(Node(i, 52 + rnd.random(), 13 + rnd.random(), *args))
+    return elems
+
+
+def synthetic_map(bbox: tuple, n_nodes: int, way_len: int = 10):
+    """
+    generates an <osm> map response with n_nodes nodes inside bbox and ways of way_len nodes
+
+    :returns: generator of bytes
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox
+    side = max(int(n_nodes ** 0.5), 1)
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n<osm version="0.6" generator="fake_server">\n' \
+          ' <bounds minlat="{}" minlon="{}" maxlat="{}" maxlon="{}"/>\n'.format(min_lat, min_lon, max_lat, max_lon) \
+        .encode()
+    buf = []
+    for i in range(n_nodes):
+        lat = min_lat + (max_lat - min_lat) * (i // side) / side
+        lon = min_lon + (max_lon - min_lon) * (i % side) / side
+        tags = ' <tag k="amenity" v="bench"/>\n' if i % 10 == 0 else ''
+        buf.append(' <node id="{}" visible="true" version="1" changeset="1" timestamp="2020-01-01T00:00:00Z" '
+                   'user="fake" uid="1" lat="{:.7f}" lon="{:.7f}"{}\n'
+                   .format(i + 1, lat, lon, '>\n' + tags + ' </node>' if tags else '/>'))
+        if len(buf) == 1000:
+            yield ''.join(buf).encode()
+            buf = []
+    for way in range(n_nodes // way_len):
+        buf.append(' <way id="{}" visible="true" version="1" changeset="1" timestamp="2020-01-01T00:00:00Z" '
+                   'user="fake" uid="1">\n'.format(way + 1))
+        for ref in range(way * way_len, (way + 1) * way_len):
+            buf.append('  <nd ref="{}"/>\n'.format(ref + 1))
+        buf.append('  <tag k="highway" v="footway"/>\n </way>\n')
+        if len(buf) > 1000:
+            yield ''.join(buf).encode()
+            buf = []
+    buf.append('</osm>\n')
+    yield ''.join(buf).encode()
+
+
+def grid_map(bbox: tuple, spacing: float, way_len: int = 10):
+    """
+    like synthetic_map, but nodes lie on a global grid with fixed ids, so overlapping bboxes agree.
+    ways run along grid rows in blocks of way_len nodes and are complete like in a real /map response.
+    every way is the member of a relation, which are grouped by 5 rows into parent relations,
+    both are returned like /map does.
+
+    :returns: (node count inside bbox, generator of bytes)
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox
+    rows = range(math.ceil(min_lat / spacing), math.floor(max_lat / spacing) + 1)
+    cols = range(math.ceil(min_lon / spacing), math.floor(max_lon / spacing) + 1)
+    blocks = range(cols.start // way_len, (cols.stop - 1) // way_len + 1) if cols else range(0)
+
+    def node_id(row, col):
+        return (row + 10 ** 5) * 10 ** 6 + col + 5 * 10 ** 5
+
+    def generate():
+        yield '<?xml version="1.0" encoding="UTF-8"?>\n<osm version="0.6" generator="fake_server">\n'.encode()
+        for row in rows:
+            buf = []
+            first, last = blocks.start * way_len, blocks.stop * way_len if cols else 0
+            for col in range(first, last):
+                buf.append(' <node id="{}" visible="true" version="1" changeset="1" '
+                           'timestamp="2020-01-01T00:00:00Z" user="fake" uid="1" lat="{:.7f}" lon="{:.7f}"/>\n'
+                           .format(node_id(row, col), row * spacing, col * spacing))
+            for block in blocks:
+                buf.append(' <way id="{}" visible="true" version="1" changeset="1" timestamp="2020-01-01T00:00:00Z" '
+                           'user="fake" uid="1">\n'.format(node_id(row, block)))
+                for col in range(block * way_len, (block + 1) * way_len):
+                    buf.append('  <nd ref="{}"/>\n'.format(node_id(row, col)))
+                buf.append('  <tag k="highway" v="footway"/>\n </way>\n')
+            yield ''.join(buf).encode()
+        buf = []
+        head = ' <relation id="{}" visible="true" version="1" changeset="1" timestamp="2020-01-01T00:00:00Z" ' \
+               'user="fake" uid="1">\n'
+        for row in rows:
+            for block in blocks:
+                buf.append(head.format(node_id(row, block)))
+                buf.append('  <member type="way" ref="{}" role=""/>\n'.format(node_id(row, block)))
+                buf.append('  <tag k="type" v="route"/>\n </relation>\n')
+        for group in sorted({row // 5 for row in rows}):
+            for block in blocks:
+                buf.append(head.format(10 ** 12 + node_id(group, block)))
+                buf.extend('  <member type="relation" ref="{}" role=""/>\n'.format(node_id(row, block))
+                           for row in range(group * 5, group * 5 + 5))
+                buf.append('  <tag k="type" v="superroute"/>\n </relation>\n')
+        buf.append('</osm>\n')
+        yield ''.join(buf).encode()
+
+    return len(rows) * len(cols), generate()
+
+
+def synthetic_trackpoints(bbox: tuple, total: int, page: int, page_size: int = 5000):
+    """
+    one page of a /trackpoints response with total points inside bbox,
+    segments have 100 points, points of even segments carry a timestamp
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox
+    buf = ['<?xml version="1.0" encoding="UTF-8"?>\n'
+           '<gpx version="1.0" creator="fake_server" xmlns="http://www.topografix.com/GPX/1/0">\n <trk>\n']
+    points = range(page * page_size, min((page + 1) * page_size, total))
+    for i in points:
+        if i % 100 == 0 or i == points.start:
+            buf.append('  <trkseg>\n')
+        frac = i / max(total, 1)
+        buf.append('   <trkpt lat="{:.7f}" lon="{:.7f}">'.format(min_lat + (max_lat - min_lat) * frac,
+                                                                 min_lon + (max_lon - min_lon) * frac))
+        if (i // 100) % 2 == 0:
+            buf.append('<time>2020-01-01T00:{:02d}:{:02d}Z</time>'.format(i // 60 % 60, i % 60))
+        buf.append('</trkpt>\n')
+        if i % 100 == 99 or i == points.stop - 1:
+            buf.append('  </trkseg>\n')
+    buf.append(' </trk>\n</gpx>\n')
+    return ''.join(buf).encode()
+
+
+def synthetic_changesets(query: str, total: int, page_size: int = 100) -> bytes:
+    """
+    answers GET /changesets over total changesets, three are created per second starting 2020-01-01,
+    time, changesets and the 100 newest first cap behave like the real API
+    """
+    params = urllib.parse.parse_qs(query)
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    cids = range(total, 0, -1)
+    if 'changesets' in params:
+        wanted = set(map(int, params['changesets'][0].split(',')))
+        cids = [cid for cid in cids if cid in wanted]
+    if 'time' in params:
+        times = [datetime.strptime(value, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc)
+                 for value in params['time'][0].split(',')]
+        closed_after = times[0] - timedelta(hours=1)
+        created_before = times[1] if len(times) > 1 else None
+        cids = [cid for cid in cids if start + timedelta(seconds=cid // 3) > closed_after
+                and (created_before is None or start + timedelta(seconds=cid // 3) < created_before)]
+    buf = ['<?xml version="1.0" encoding="UTF-8"?>\n<osm version="0.6" generator="fake_server">\n']
+    for cid in list(cids)[:page_size]:
+        created = start + timedelta(seconds=cid // 3)
+        buf.append(' <changeset id="{}" created_at="{}" open="false" closed_at="{}" user="fake" uid="1" '
+                   'min_lat="52.5" min_lon="13.4" max_lat="52.6" max_lon="13.5" comments_count="0" '
+                   'changes_count="1">\n  <tag k="comment" v="change {}"/>\n </changeset>\n'
+                   .format(cid, created.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                           (created + timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M:%SZ'), cid))
+    buf.append('</osm>\n')
+    return ''.join(buf).encode()
+
+
+def _tags(rnd: random.Random, count: int) -> str:
+    return ''.join('  <tag k="{}" v="value {}"/>\n'.format(key, rnd.randrange(100))
+                   for key in rnd.sample(KEYS, count))
+
+
+def _refs(i: int, count: int, total: int) -> list:
+    return [(ref % total) + 1 for ref in range((i - 1) * count, i * count)]
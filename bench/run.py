@@ -0,0 +1,224 @@
+'''
+Benchmark suite of the parser, serializer and client hot paths
+
+    python bench/run.py                 # run and compare against bench/baseline.json
+    python bench/run.py --save          # run and store the results as the new baseline
+    python bench/run.py -k parse        # only the cases containing "parse"
+
+every case reports its throughput (best of --repeat samples) and the peak memory
+traced by tracemalloc during one extra run. The exit code is 1 when a case is
+slower than the baseline by more than --tolerance, or allocates more than
+--alloc-tolerance over it. Baselines are machine specific, store one per
+deploy host (or CI runner) and compare on the same host.
+'''
+
+import gc
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import osmose
+from osm import osm_parser
+from osm.osm_util import create_bbox
+from bench import fixtures
+
+BASELINE = os.path.join(ROOT, 'bench', 'baseline.json')
+
+CASES = {}
+
+
+def case(fn):
+    """
+    registers a case: fn(scale) prepares its fixture and returns (run, items),
+    run() executes the hot path once and items is the number of items it processes
+    """
+    CASES[fn.__name__] = fn
+    return fn
+
+
+@case
+def parse_elem(scale: float):
+    tree = osm_parser.fromstring(fixtures.osm_map(int(50000 * scale)))
+    return (lambda: osm_parser.parse_elems(tree)), len(osm_parser.parse_elems(tree))
+
+
+@case
+def parse_map(scale: float):
+    data = fixtures.osm_map(int(50000 * scale))
+    return (lambda: osm_parser.parse_elems(osm_parser.fromstring(data))), \
+        len(osm_parser.parse_elems(osm_parser.fromstring(data)))
+
+
+@case
+def parse_notes(scale: float):
+    count = int(5000 * scale)
+    tree = osm_parser.fromstring(fixtures.notes(count))
+    return (lambda: osm_parser.parse_notes(tree)), count
+
+
+@case
+def parse_changesets(scale: float):
+    count = int(2000 * scale)
+    tree = osm_parser.fromstring(fixtures.changesets(count))
+    return (lambda: osm_parser.parse_changesets(tree)), count
+
+
+@case
+def to_issue_list(scale: float):
+    count = int(5000 * scale)
+    data = fixtures.issues(count)
+    to_list = getattr(osmose, '__to_issue_list')
+    return (lambda: to_list(data)), count
+
+
+@case
+def serial_elem(scale: float):
+    elems = fixtures.elements(int(10000 * scale))
+    return (lambda: [osm_parser.serial_elem(elem) for elem in elems]), len(elems)
+
+
+@case
+def create_bbox_many(scale: float):
+    rnd = random.Random(3)
+    points = [(rnd.uniform(-80, 80), rnd.uniform(-180, 180)) for _ in range(int(100000 * scale))]
+    return (lambda: [create_bbox(lat, lon, 500) for lat, lon in points]), len(points)
+
+
+@case
+def pager_to_msg(scale: float):
+    issues = getattr(osmose, '__to_issue_list')(fixtures.issues(int(5000 * scale)))
+    pages = [issues[i:i + 10] for i in range(0, len(issues), 10)]
+    return (lambda: [osmose.Pager.to_msg(page) for page in pages]), len(issues)
+
+
+def measure(run, items: int, repeat: int, min_time: float = 0.2) -> dict:
+    """
+    like timeit, every sample calls run often enough to take min_time and gc is off while timing
+
+    :returns: throughput of the best of repeat samples and the tracemalloc peak of one more run
+    """
+    number = 1
+    while True:
+        seconds = _sample(run, number)
+        if seconds >= min_time:
+            break
+        number *= 2
+    times = [seconds / number] + [_sample(run, number) / number for _ in range(repeat - 1)]
+    tracemalloc.start()
+    try:
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    best = min(times)
+    return {'items': items, 'seconds': round(best, 6), 'items_per_s': round(items / best, 1),
+            'peak_kib': round(peak / 1024, 1)}
+
+
+def _sample(run, number: int) -> float:
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for _ in range(number):
+            run()
+        return time.perf_counter() - start
+    finally:
+        gc.enable()
+
+
+def run_cases(names: list, scale: float = 1.0, repeat: int = 5) -> dict:
+    results = {}
+    for name in names:
+        run, items = CASES[name](scale)
+        results[name] = measure(run, items, repeat)
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float, alloc_tolerance: float) -> list:
+    """
+    :param results: case results of run_cases
+    :param baseline: stored case results
+    :param tolerance: allowed relative throughput loss
+    :param alloc_tolerance: allowed relative growth of the peak allocation
+    :returns: messages of all regressions
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result['items_per_s'] < base['items_per_s'] * (1 - tolerance):
+            regressions.append('{}: {:.0f} items/s, baseline {:.0f}'.format(
+                name, result['items_per_s'], base['items_per_s']))
+        if result['peak_kib'] > base['peak_kib'] * (1 + alloc_tolerance):
+            regressions.append('{}: peak {:.0f} KiB, baseline {:.0f}'.format(
+                name, result['peak_kib'], base['peak_kib']))
+    return regressions
+
+
+def environment(scale: float) -> dict:
+    return {'python': platform.python_version(), 'machine': platform.machine(),
+            'backend': osm_parser.backend(), 'scale': scale}
+
+
+def main(argv: list = None) -> int:
+    args = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    args.add_argument('-k', dest='select', default='', help='only run cases containing this string')
+    args.add_argument('--baseline', default=BASELINE, help='baseline json file')
+    args.add_argument('--save', action='store_true', help='store the results as the baseline')
+    args.add_argument('--repeat', type=int, default=5)
+    args.add_argument('--scale', type=float, default=1.0, help='fixture size factor')
+    args.add_argument('--tolerance', type=float, default=0.25, help='allowed relative throughput loss')
+    args.add_argument('--alloc-tolerance', type=float, default=0.10, help='allowed relative peak allocation growth')
+    args = args.parse_args(argv)
+
+    names = [name for name in CASES if args.select in name]
+    results = run_cases(names, args.scale, args.repeat)
+    env = environment(args.scale)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            stored = json.load(file)
+        if stored['environment'] != env:
+            print('baseline environment {} differs from {}, not compared'.format(stored['environment'], env))
+        else:
+            baseline = stored['cases']
+
+    print('{:<18} {:>8} {:>14} {:>11} {:>9}'.format('case', 'items', 'items/s', 'peak KiB', 'vs base'))
+    for name, result in results.items():
+        base = baseline.get(name)
+        delta = '{:+.1%}'.format(result['items_per_s'] / base['items_per_s'] - 1) if base else '-'
+        print('{:<18} {:>8} {:>14,.0f} {:>11,.1f} {:>9}'.format(
+            name, result['items'], result['items_per_s'], result['peak_kib'], delta))
+
+    if args.save:
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as file:
+                stored = json.load(file)
+            if stored['environment'] == env:
+                results = {**stored['cases'], **results}
+        with open(args.baseline, 'w') as file:
+            json.dump({'environment': env, 'cases': results}, file, indent=2, sort_keys=True)
+            file.write('\n')
+        print('baseline saved to ' + args.baseline)
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance, args.alloc_tolerance)
+    for message in regressions:
+        print('REGRESSION ' + message)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
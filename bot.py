@@ -1,23 +1,16 @@
 import os
+import sys
 import logging
 import bot_osm_edit
 import ee_osmose
 import osmose
-from telegram import *
+from telegram import Bot, CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, Location, ParseMode, Update
 import telegram.error
 from telegram.ext import (Updater, CommandHandler, MessageHandler, Filters,
                           CallbackQueryHandler, CallbackContext)
 
-# Enable logging
-logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-try:
-    TOKEN = os.environ['BOT_TOKEN']
-except KeyError:
-    logger.exception('no "BOT_TOKEN" token in environment variables.', 'Exit program')
-    exit()
-
 
 # Define a few command handlers. These usually take the two arguments update and
 # context. Error handlers also receive the raised TelegramError object in error.
@@ -155,10 +148,18 @@ def error(update, context, err: Exception):
 
 def main():
     """Start the bot."""
+    # Enable logging
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.DEBUG)
+    try:
+        token = os.environ['BOT_TOKEN']
+    except KeyError:
+        logger.error('no "BOT_TOKEN" token in environment variables. Exit program')
+        sys.exit(1)
+
     # Create the Updater and pass it your bot's token.
     # Make sure to set use_context=True to use the new context based callbacks
     # Post version 12 this will no longer be necessary
-    updater = Updater(TOKEN, use_context=True)
+    updater = Updater(token, use_context=True)
 
     # Get the dispatcher to register handlers
     dp = updater.dispatcher
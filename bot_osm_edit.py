@@ -5,13 +5,10 @@ import osm.osm_api
 import logging
 import io
 
-# Enable logging
-logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-                    level=logging.INFO)
-
 logger = logging.getLogger(__name__)
 
 CHOOSING, TAG_CHOICE, VALUE_REPLY, TYPING_REPLY, LOCATION, TEXT, GPX_DESCRIPTION, GPX_NAME, GPX_TAG, GPX_SAVE, SAVE = range(11)
+GPX_TOLERANCE = 2.0  # meters an uploaded trace may deviate after simplification
 
 
 class ElemEditor:
@@ -65,8 +62,8 @@ class ElemEditor:
         return  # handled by bot
 
     def gpx_up(self, update: Update, context):
-        data = open(update.effective_message.document.get_file().download()).read()
-        context.user_data['gpx'] = osm.osm_util.Trace(None, data, None, None, None)
+        path = update.effective_message.document.get_file().download()  # kept on disk until upload
+        context.user_data['gpx'] = osm.osm_util.Trace(None, path, None, None, None)
         update.message.reply_text('please send trace-name.')
         return GPX_NAME
 
@@ -115,7 +112,15 @@ class ElemEditor:
 
     def gpx_save(self, update, context):
         gpx = context.user_data['gpx']
-        tid = self.osmapi.upload_gpx(gpx.gpx, gpx.name, gpx.desc, gpx.tags, gpx.visibility)
+        with open(gpx.gpx, 'rb') as trace:
+            try:
+                tid = self.osmapi.upload_gpx(trace, gpx.name, gpx.desc, gpx.tags, visibility=gpx.visibility,
+                                             tolerance=GPX_TOLERANCE, compress=True)
+            except ImportError:
+                # simplifying needs numpy, without it the trace is uploaded as it is
+                logger.warning('numpy is missing, uploading the unsimplified trace')
+                trace.seek(0)
+                tid = self.osmapi.upload_gpx(trace, gpx.name, gpx.desc, gpx.tags, visibility=gpx.visibility)
         update.callback_query.edit_message_text('uploaded track: ' + str(tid))
 
     def invalid(self, update, context):
@@ -19,3 +19,18 @@ class MethodError(LookupError):
 class NoneFoundError(ValueError):
     def __init__(self, message):
         self.message = message
+
+
+class AreaRefusedError(ValueError):
+    def __init__(self, message):
+        self.message = message
+
+
+class ThrottleError(Exception):
+    def __init__(self, message):
+        self.message = message
+
+
+class AuthError(Exception):
+    def __init__(self, message):
+        self.message = message
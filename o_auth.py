@@ -1,24 +1,31 @@
 import os
 import logging
 
-# Using OAuth1Session
-from requests_oauthlib import OAuth1Session
-
-logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(lineno)d - %(message)s', level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-try:
-    CLIENT_KEY = os.environ['OSM_KEY']
-    CLIENT_SECRET = os.environ['OSM_SECRET']
-except KeyError:
-    logger.exception('please set up environment variables OSM_KEY and OSM_SECRET')
-    raise AttributeError
+
+def client_credentials() -> tuple:
+    """
+    :returns: (client key, client secret) from the environment variables OSM_KEY and OSM_SECRET
+    """
+    try:
+        return os.environ['OSM_KEY'], os.environ['OSM_SECRET']
+    except KeyError:
+        raise AttributeError('please set up environment variables OSM_KEY and OSM_SECRET') from None
+
+
+def _session(**kwargs):
+    # Using OAuth1Session, imported on first use
+    from requests_oauthlib import OAuth1Session
+
+    key, secret = client_credentials()
+    return OAuth1Session(key, client_secret=secret, **kwargs)
 
 
 class Authorisation:
 
     def __init__(self, req_token_url=None, base_auth_url=None, acc_token_url=None):
-        self.oauth = OAuth1Session(CLIENT_KEY, client_secret=CLIENT_SECRET)
+        self.oauth = _session()
         self.owner_key = ''
         self.owner_secret = ''
         self.verifier = ''
@@ -50,10 +57,8 @@ class Authorisation:
 
     # Using OAuth1Session
     def access_token(self):
-        self.oauth = OAuth1Session(CLIENT_KEY,
-                                   client_secret=CLIENT_SECRET,
-                                   resource_owner_key=self.owner_key,
-                                   resource_owner_secret=self.owner_secret,
-                                   verifier=self.verifier)
+        self.oauth = _session(resource_owner_key=self.owner_key,
+                              resource_owner_secret=self.owner_secret,
+                              verifier=self.verifier)
         oauth_tokens = self.oauth.fetch_access_token(self.access_token_url)
 
@@ -1,5 +1,7 @@
 from osm.osm_util import Element, Note, ChangeSet
-from datetime import *
+from osm.osm_change import OsmChange
+from osm.rebase import ElementDelta
+from datetime import datetime
 
 
 class OsmApi:
@@ -70,17 +72,37 @@ class OsmApi:
         raise NotImplementedError
 
     def get_changesets(self, bbox: tuple = None, user: str = '', time1: datetime = None, time2: datetime = None,
-                       is_open: bool = True, is_closed: bool = True, changesets: list = None) -> list:
+                       is_open: bool = True, is_closed: bool = True, changesets: list = None,
+                       limit: int = None, prefetch: bool = True):
         """
-        returns max 100 changesets matching all provided parameters
+        all changesets matching all provided parameters, newest first
         GET /api/0.6/changesets
-        parameters by ?/&
+        parameters by ?/&, the API answers 100 changesets max, further pages are requested automatically
+
+        :param user: user ID or display name
+        :param time1: closed after
+        :param time2: created before
+        :param limit: stop after this many changesets
+        :param prefetch: download the next page while the current one is consumed
+        :returns: iterator of ChangeSets
         """
         raise NotImplementedError
 
-    def diff_upload(self, cid: int) -> list:
+    def diff_upload(self, cid: int, change: OsmChange) -> list:
         """
+        uploads all collected creates, modifies and deletes in one request
         POST /api/0.6/changeset/#id/upload
+
+        :param cid: open changeset ID
+        :param change: collected changes, new ids and versions are written back onto its elements
+        :returns: uploaded elements
+        :raises ValueError: When there are errors parsing the XML
+        :raises NoneFoundError: an element or the changeset does not exist
+        :raises ConflictError:
+            When changeset already closed
+            When the version of an element does not match the current database version
+        :raises LookupError: an element was already deleted
+        :raises ParseError: When an element is still used or references missing elements
         """
         raise NotImplementedError
 
@@ -162,6 +184,23 @@ class OsmApi:
         """
         raise NotImplementedError
 
+    def edit_element_rebase(self, delta: ElementDelta, cid: int, retries: int = 3) -> int:
+        """
+        edit_element of delta applied to its base version, rebased on a version mismatch:
+        the current version is fetched, the delta merged into it three-way and the upload retried
+
+        :param delta: intended tag and geometry change
+        :param cid: open changeset id
+        :param retries: max rebases
+        :returns: new version number, the current one if it already contains the change
+        :raises ConflictError:
+            When the current version changed the same tags or geometry differently
+            When the element got deleted
+            When still a version mismatch after retries
+            When changeset already closed
+        """
+        raise NotImplementedError
+
     def delete_element(self, elem: Element, cid: int) -> int:
         """
         :param elem: changed element to get deleted
@@ -226,7 +265,8 @@ class OsmApi:
     def get_element_bbox(self, bbox: tuple) -> list:
         """
         :returns: all Elements with minimum one Node within this BoundingBox
-        :raise NoneFoundError: either none or over 50.000 element are found
+            areas too large or too dense for one request are downloaded in parts
+        :raise NoneFoundError: no elements are found
         """
         raise NotImplementedError
 
@@ -239,13 +279,24 @@ class OsmApi:
 
     ''' GPX '''
 
-    def get_bbox_gpx(self, bbox: tuple, page: int) -> dict:
+    def get_bbox_gpx(self, bbox: tuple, page: int):
         """
         returns 5000GPS trackpoints max, increase page for any additional 5000
 
         :param bbox: (minlon, minlat, maxlon, maxlat)
         :param page: 5000 trackpoints are returned each page
-        :returns: max 5000 trackpoints within bbox, format GPX Version 1.0
+        :returns: gpx.TrackPoints, max 5000 trackpoints within bbox
+        """
+        raise NotImplementedError
+
+    def iter_bbox_gpx(self, bbox: tuple, page: int = 0, prefetch: bool = True):
+        """
+        walks all pages of trackpoints within bbox
+
+        :param bbox: (minlon, minlat, maxlon, maxlat)
+        :param page: first page
+        :param prefetch: download the next page while the current one is consumed
+        :returns: iterator of gpx.TrackPoints, one per page
         """
         raise NotImplementedError
 
@@ -304,6 +355,14 @@ class OsmApi:
         """
         raise NotImplementedError
 
+    def get_gpx_points(self, tid: int):
+        """
+
+        :param tid: id identifying the gpx file on the server
+        :returns: gpx.TrackPoints of the trace
+        """
+        raise NotImplementedError
+
     def get_own_gpx(self) -> list:
         """
         :returns: list of dictionary representing the metadata
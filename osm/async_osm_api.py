@@ -0,0 +1,707 @@
+import logging
+from http import HTTPStatus
+import xml.etree.ElementTree as ElemTree
+import asyncio
+from datetime import datetime
+from osm.osm_util import Element, Note, ChangeSet, split_bbox, quarter_bbox
+from osm.osm_change import OsmChange
+from osm.rebase import ElementDelta, server_version
+from osm import a_osm_api, osm_api, osm_parser
+from osm.transport import AsyncTransport
+from osm.tile_cache import merge_elements
+from osm.metrics import Metrics, shared as metrics_shared
+from ee_osmose import ParseError, ConflictError, MethodError, NoneFoundError, AreaRefusedError
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncOsmApi(a_osm_api.OsmApi):
+    """
+    asyncio implementation of the OsmApi, every call is a coroutine
+    many requests can be in flight at once, limited by the transports connection pool.
+    """
+    BASE_URL = osm_api.OsmApi.BASE_URL
+
+    MAX_BBOX_AREA = osm_api.OsmApi.MAX_BBOX_AREA
+    MIN_BBOX_EDGE = osm_api.OsmApi.MIN_BBOX_EDGE
+    MAX_MAP_REQUESTS = osm_api.OsmApi.MAX_MAP_REQUESTS
+
+    def __init__(self, transport: AsyncTransport = None, base_url: str = None, max_workers: int = 8,
+                 metrics: Metrics = None):
+        """
+        :param transport: asyncio HTTP transport used for all calls, default: pooled keep-alive session
+            authenticated with OSM_USERNAME and OSM_PASSWORD, read at the first request
+        :param base_url: API root, default: OSM_API_URL environment variable or the OSM dev server
+        :param max_workers: max concurrent requests when one call is split into several requests
+        :param metrics: records parse and build times, default: the one of the transport or the process wide one
+        """
+        if base_url:
+            self.BASE_URL = base_url
+        self.transport = transport or AsyncTransport(auth=osm_api.credentials)
+        self.max_workers = max_workers
+        self.metrics = metrics or getattr(self.transport, 'metrics', None) or metrics_shared()
+
+    async def close(self):
+        await self.transport.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def get_permissions(self) -> set:
+        """
+        current permissions
+        GET /api/0.6/permissions
+        """
+        data = await self.transport.get(self.BASE_URL + '/permissions')
+        if data.ok:
+            tree = self.__xml(data)
+            permissions = set()
+            for item in tree.findall('permissions/permission'):
+                permissions.add(item.get('name'))
+            return permissions
+        raise Exception(data.text)
+
+    ''' changeset '''
+
+    async def create_changeset(self, tags: dict) -> int:
+        """
+        PUT /api/0.6/changeset/create
+        :returns: changeset ID
+        """
+        xml = osm_parser.serial_changeset(tags)
+
+        logger.debug(xml)
+        data = await self.transport.put(self.BASE_URL + '/changeset/create', data=xml)
+        if data.ok:
+            return int(data.text)
+        elif data.status_code == HTTPStatus.BAD_REQUEST:
+            raise ParseError(data.text)
+        raise Exception(data.text)
+
+    async def get_changeset(self, cid: int, discussion: bool = False) -> ChangeSet:
+        """
+        A Call to get a changeset optionally with discussion.
+        no elements included
+
+        GET /api/0.6/changeset/#id?include_discussion=
+        exclude discussion by <empty> or omitting
+        """
+        url = self.BASE_URL + '/changeset/{}'.format(cid)
+        if discussion:
+            url += '?include_discussion=True'
+        data = await self.transport.get(url)
+        if data.ok:
+            logger.debug(data.text)
+            return self.__build(data, osm_parser.parse_changeset, self.__xml(data))
+        elif data.status_code == HTTPStatus.NOT_FOUND:
+            raise NoneFoundError(data.text)
+        raise Exception(data.text)
+
+    async def close_changeset(self, cid: int):
+        """
+        closes a changeset
+        PUT /api/0.6/changeset/#id/close
+        """
+        data = await self.transport.put(self.BASE_URL + '/changeset/{}/close'.format(cid))
+        if data.ok:
+            return None
+        elif data.status_code == HTTPStatus.NOT_FOUND:
+            raise NoneFoundError(data.text)
+        elif data.status_code == HTTPStatus.CONFLICT:
+            raise ConflictError(data.text)
+        raise Exception(data.text)
+
+    async def get_changesets(self, bbox: tuple = None, user: str = '', time1: datetime = None,
+                             time2: datetime = None, is_open: bool = True, is_closed: bool = True,
+                             changesets: list = None, limit: int = None, prefetch: bool = True):
+        """
+        all changesets matching the provided parameters, newest first, see OsmApi.get_changesets
+        GET /api/0.6/changesets
+
+        :returns: async generator of ChangeSets
+        """
+        page_size = osm_api.OsmApi.CHANGESET_PAGE
+        params = osm_api.changeset_params(bbox, user, is_open, is_closed)
+        count = 0
+        if changesets:
+            for i in range(0, len(changesets), page_size):
+                page = dict(params, changesets=','.join(map(str, changesets[i:i + page_size])))
+                for changeset in await self.__get_changesets(page):
+                    if limit is not None and count >= limit:
+                        return
+                    count += 1
+                    yield changeset
+            return
+        task = asyncio.ensure_future(self.__get_changesets(osm_api.changeset_window(params, time1, time2)))
+        seen = set()
+        try:
+            while task:
+                page = await task
+                task = None
+                fresh = [changeset for changeset in page if changeset.id not in seen]
+                seen.update(changeset.id for changeset in fresh)
+                if len(page) >= page_size:
+                    time2 = osm_api.next_window_end(page, fresh)
+                    window = osm_api.changeset_window(params, time1, time2)
+                    task = asyncio.ensure_future(self.__get_changesets(window)) if prefetch else None
+                for changeset in fresh:
+                    if limit is not None and count >= limit:
+                        return
+                    count += 1
+                    yield changeset
+                if len(page) >= page_size:
+                    task = task or asyncio.ensure_future(self.__get_changesets(window))
+        finally:
+            if task:
+                task.cancel()
+
+    async def __get_changesets(self, params: dict) -> list:
+        data = await self.transport.get(self.BASE_URL + '/changesets', params=params)
+        if data.ok:
+            return self.__build(data, osm_parser.parse_changesets, self.__xml(data))
+        elif data.status_code == HTTPStatus.BAD_REQUEST:
+            raise ValueError(data.text)
+        elif data.status_code == HTTPStatus.NOT_FOUND:
+            raise NoneFoundError(data.text)
+        raise Exception(data.text)
+
+    async def download_changeset(self, cid: int) -> str:
+        """
+        GET /api/0.6/changeset/#id/download
+        """
+        data = await self.transport.get(self.BASE_URL + '/changeset/{}/download'.format(cid))
+        if data.ok:
+            return data.text
+        elif data.status_code == HTTPStatus.NOT_FOUND:
+            raise NoneFoundError(data.text)
+        raise Exception(data.text)
+
+    async def diff_upload(self, cid: int, change: OsmChange) -> list:
+        """
+        POST /api/0.6/changeset/#id/upload
+        :returns: uploaded elements with new ids and versions
+        """
+        data = await self.transport.post(self.BASE_URL + '/changeset/{}/upload'.format(cid),
+                                         data=osm_parser.serial_change(change, cid),
+                                         headers={'Content-Type': 'text/xml'})
+        if data.ok:
+            return change.apply_diff(self.__build(data, osm_parser.parse_diff_result, self.__xml(data)))
+        elif data.status_code == HTTPStatus.BAD_REQUEST:
+            raise ValueError(data.text)
+        elif data.status_code == HTTPStatus.NOT_FOUND:
+            raise NoneFoundError(data.text)
+        elif data.status_code == HTTPStatus.CONFLICT:
+            raise ConflictError(data.text)
+        elif data.status_code == HTTPStatus.GONE:
+            raise LookupError(data.text)
+        elif data.status_code == HTTPStatus.PRECONDITION_FAILED:
+            raise ParseError(data.text)
+        raise Exception(data.text)
+
+    async def comm_changeset(self, cid: int, text: str) -> ChangeSet:
+        """
+        Add a comment to a changeset. The changeset must be closed.
+        POST /api/0.6/changeset/#id/comment
+        """
+        data = await self.transport.post(self.BASE_URL + '/changeset/{}/comment'.format(str(cid)),
+                                         data={'text': text})
+        logger.debug(data.text)
+        if data.ok:
+            return self.__build(data, osm_parser.parse_changeset, self.__xml(data))
+        elif data.status_code == HTTPStatus.BAD_REQUEST:
+            raise ValueError(data.text)
+        elif data.status_code == HTTPStatus.CONFLICT:
+            raise ConflictError(data.text)
+
+    async def sub_changeset(self, cid: int) -> ChangeSet:
+        """
+        Subscribes the current authenticated user to changeset discussion
+        POST /api/0.6/changeset/#id/subscribe
+        """
+        data = await self.transport.post(self.BASE_URL + '/changeset/{}/subscribe'.format(cid))
+        if data.ok:
+            return self.__build(data, osm_parser.parse_changeset, self.__xml(data))
+        elif data.status_code == HTTPStatus.CONFLICT:
+            raise ConflictError(data.text)
+        raise Exception(data.text)
+
+    async def unsub_changeset(self, cid: int) -> ChangeSet:
+        """
+        Unsubscribe the current authenticated user from changeset discussion
+        POST /api/0.6/changeset/#id/subscribe
+        """
+        data = await self.transport.post(self.BASE_URL + '/changeset/{}/unsubscribe'.format(cid))
+        if data.ok:
+            return self.__build(data, osm_parser.parse_changeset, self.__xml(data))
+        elif data.status_code == HTTPStatus.NOT_FOUND:
+            raise NoneFoundError(data.text)
+        raise Exception(data.text)
+
+    ''' Element '''
+
+    async def create_element(self, elem: Element, cid: int) -> int:
+        """
+        creates new element of specified type
+        PUT /api/0.6/[node|way|relation]/create
+        :returns: Element ID
+        """
+        elem.changeset = cid
+        xml = osm_parser.serial_elem(elem, True)
+        data = await self.transport.put(self.BASE_URL + '/{}/create'.format(elem.e_type), data=xml)
+        if data.ok:
+            return int(data.text)
+        elif data.status_code == HTTPStatus.BAD_REQUEST:
+            raise NoneFoundError(data.text)
+        elif data.status_code == HTTPStatus.CONFLICT:
+            raise ConflictError(data.text)
+        elif data.status_code == HTTPStatus.PRECONDITION_FAILED:
+            raise ParseError(data.text)
+        raise Exception(data.text)
+
+    async def get_element(self, etype: str, eid: int) -> Element:
+        """
+        GET /api/0.6/[node|way|relation]/#id
+        """
+        data = await self.transport.get(self.BASE_URL + '/{}/{}'.format(etype, eid))
+        if data.ok:
+            tree = self.__xml(data)
+            logger.debug(data.text)
+            return self.__build(data, osm_parser.parse_elem, tree[0])
+        elif data.status_code == HTTPStatus.NOT_FOUND:
+            raise NoneFoundError(data.text)
+        elif data.status_code == HTTPStatus.GONE:
+            raise LookupError(data.text)
+        raise Exception(data.text)
+
+    async def edit_element(self, elem: Element, cid: int) -> int:
+        """
+        PUT /api/0.6/[node|way|relation]/#id
+        :returns: New version Number
+        """
+        elem.changeset = cid
+        data = await self.transport.put(self.BASE_URL + '/{}/{}'.format(elem.e_type, elem.id),
+                                        data=osm_parser.serial_elem(elem))
+        if data.ok:
+            return int(data.text)
+        elif data.status_code == HTTPStatus.BAD_REQUEST:
+            raise ValueError(data.text)
+        elif data.status_code == HTTPStatus.NOT_FOUND:
+            raise NoneFoundError(data.text)
+        elif data.status_code == HTTPStatus.CONFLICT:
+            raise ConflictError(data.text)
+        elif data.status_code == HTTPStatus.PRECONDITION_FAILED:
+            raise ParseError(data.text)
+        raise Exception(data.text)
+
+    async def edit_element_rebase(self, delta: ElementDelta, cid: int, retries: int = 3) -> int:
+        """
+        PUT /api/0.6/[node|way|relation]/#id of delta applied to its base version
+        on a version mismatch (409) the current version is fetched, the delta merged into it and the PUT retried
+        """
+        current = delta.base
+        for attempt in range(retries + 1):
+            if not delta.pending(current):
+                return current.version
+            elem = delta.merge(current)
+            try:
+                return await self.edit_element(elem, cid)
+            except ConflictError as err:
+                if attempt == retries or server_version(err.message) is None:
+                    raise
+                logger.info('rebasing {} {} onto version {}'.format(delta.etype, delta.eid,
+                                                                    server_version(err.message)))
+            try:
+                current = await self.get_element(delta.etype, delta.eid)
+            except LookupError:
+                raise ConflictError('{} {} was deleted'.format(delta.etype, delta.eid)) from None
+
+    async def delete_element(self, elem: Element, cid: int) -> int:
+        """
+        DELETE /api/0.6/[node|way|relation]/#id
+
+        :returns: new version number
+        """
+        elem.changeset = cid
+        data = await self.transport.delete(self.BASE_URL + '/{}/{}'.format(elem.e_type, elem.id),
+                                           data=osm_parser.serial_elem(elem))
+        if data.ok:
+            return int(data.text)
+        elif data.status_code == HTTPStatus.BAD_REQUEST:
+            raise ValueError(data.text)
+        elif data.status_code == HTTPStatus.NOT_FOUND:
+            raise NoneFoundError(data.text)
+        elif data.status_code == HTTPStatus.CONFLICT:
+            raise ConflictError(data.text)
+        elif data.status_code == HTTPStatus.GONE:
+            raise LookupError(data.text)
+        elif data.status_code == HTTPStatus.PRECONDITION_FAILED:
+            raise ParseError(data.text)
+        raise Exception(data.text)
+
+    async def get_elements(self, etype: str, lst_eid: list) -> list:
+        """
+        GET /api/0.6/[nodes|ways|relations]?#parameters
+        """
+        data = await self.transport.get(self.BASE_URL + '/{}s?{}s={}'.format(etype, etype,
+                                                                                  ','.join(map(str, lst_eid))))
+        if data.ok:
+            tree = self.__xml(data)
+            logger.debug(data.text)
+            elems = self.__build(data, osm_parser.parse_elems, tree)
+            return elems
+
+        elif data.status_code == HTTPStatus.BAD_REQUEST:
+            raise ParseError(data.text)
+        elif data.status_code == HTTPStatus.NOT_FOUND:
+            raise NoneFoundError(data.text)
+        elif data.status_code == HTTPStatus.REQUEST_URI_TOO_LONG:
+            raise MethodError(data.text)
+        raise Exception(data.text)
+
+    async def get_relation_of_element(self, etype: str, eid: int) -> list:
+        """
+        GET /api/0.6/[node|way|relation]/#id/relations
+        """
+        data = await self.transport.get(self.BASE_URL + '/{}/{}/relations'.format(etype, eid))
+        if data.ok:
+            tree = self.__xml(data)
+            logger.debug(data.text)
+            elems = self.__build(data, osm_parser.parse_elems, tree)
+            if not elems:
+                raise NoneFoundError('no such element or no relations on this element')
+            return elems
+        raise Exception(data.text)
+
+    async def get_ways_of_node(self, eid: int) -> list:
+        """
+        GET /api/0.6/node/#id/ways
+        """
+        data = await self.transport.get(self.BASE_URL + '/node/{}/ways'.format(eid))
+        if data.ok:
+            tree = self.__xml(data)
+            logger.debug(data.text)
+            elems = self.__build(data, osm_parser.parse_elems, tree)
+            if not elems:
+                raise NoneFoundError('no such node or no ways on this element')
+            return elems
+        raise Exception(data.text)
+
+    async def get_element_bbox(self, bbox: tuple) -> list:
+        """
+        :returns: all Elements with minimum one Node within this BoundingBox
+        GET /api/0.6/map?bbox=left,bottom,right,top
+        areas the server refuses as too large or too dense are split until every part is accepted,
+        see OsmApi.get_element_bbox
+
+        :raise NoneFoundError: no elements are found
+        :raise AreaRefusedError: an area below MIN_BBOX_EDGE is still refused
+            or the split needs more than MAX_MAP_REQUESTS requests
+        :raise ValueError: HTTP 400 BAD REQUEST for another reason e.g. an invalid bbox
+        """
+        limit = asyncio.Semaphore(self.max_workers)
+        pending = split_bbox(bbox, self.MAX_BBOX_AREA)
+        leaves = []
+        sent = 0
+        while pending:
+            sent += len(pending)
+            if sent > self.MAX_MAP_REQUESTS:
+                raise AreaRefusedError('area {} needs more than {} requests'.format(bbox, self.MAX_MAP_REQUESTS))
+            results = await asyncio.gather(*(self.__get_map_leaf(part, limit) for part in pending))
+            refused = []
+            for part, elems in zip(pending, results):
+                if elems is not None:
+                    leaves.append(elems)
+                elif part[2] - part[0] < self.MIN_BBOX_EDGE:
+                    raise AreaRefusedError('area {} is still refused'.format(part))
+                else:
+                    refused.extend(quarter_bbox(part))
+            pending = refused
+        elems = leaves[0] if len(leaves) == 1 else merge_elements(leaves, bbox)
+        if not elems:
+            raise NoneFoundError('no elements')
+        return elems
+
+    async def __get_map_leaf(self, bbox: tuple, limit: asyncio.Semaphore):
+        """
+        :returns: elements of bbox, None if the server refuses the area as too large or too dense
+        """
+        async with limit:
+            data = await self.transport.get(self.BASE_URL + '/map?bbox={}'.format(','.join(map(str, bbox))))
+        if data.ok:
+            tree = self.__xml(data)
+            return self.__build(data, osm_parser.parse_elems, tree)
+        elif data.status_code == HTTPStatus.BAD_REQUEST:
+            error = osm_api.map_error(data.text)
+            if isinstance(error, AreaRefusedError):
+                return None
+            raise error
+        raise Exception(data.text)
+
+    ''' GPX '''
+
+    async def get_bbox_gpx(self, bbox: tuple, page: int = 0):
+        """
+        returns 5000GPS trackpoints max, increase page for any additional 5000, requires numpy
+        GET /api/0.6/trackpoints?bbox=left,bottom,right,top&page=pageNumber
+
+        :returns: gpx.TrackPoints
+        :raise ValueError: HTTP 400 BAD REQUEST
+            area too large
+        """
+        from osm.gpx import TrackPoints
+
+        data = await self.transport.get(self.BASE_URL + '/trackpoints',
+                                        params={'bbox': ','.join(map(str, bbox)), 'page': page})
+        if data.ok:
+            return self.__build(data, TrackPoints.from_gpx, [data.content])
+        elif data.status_code == HTTPStatus.BAD_REQUEST:
+            raise ValueError(data.text)
+        raise Exception(data.text)
+
+    async def iter_bbox_gpx(self, bbox: tuple, page: int = 0, prefetch: bool = True):
+        """
+        walks all pages of trackpoints in bbox, see OsmApi.iter_bbox_gpx
+
+        :returns: async generator of gpx.TrackPoints, one per page
+        """
+        from osm.gpx import TRACKPOINTS_PAGE
+
+        task = asyncio.ensure_future(self.get_bbox_gpx(bbox, page))
+        try:
+            while task:
+                points = await task
+                task = None
+                if len(points) >= TRACKPOINTS_PAGE:
+                    page += 1
+                    task = asyncio.ensure_future(self.get_bbox_gpx(bbox, page)) if prefetch else None
+                    yield points
+                    task = task or asyncio.ensure_future(self.get_bbox_gpx(bbox, page))
+                elif len(points):
+                    yield points
+        finally:
+            if task:
+                task.cancel()
+
+    async def upload_gpx(self, trace: str, name: str, description: str, tags: set,
+                         public: bool = True, visibility: str = 'trackable',
+                         tolerance: float = None, min_interval: float = None, compress: bool = False) -> int:
+        """
+        uploads gpx trace, see OsmApi.upload_gpx for simplification and compression
+        POST /api/0.6/gpx/create
+        """
+        if tolerance is not None or min_interval is not None or compress:
+            from osm.gpx import prepare_upload
+
+            trace = prepare_upload(trace, tolerance, min_interval, compress)
+            if compress:
+                name += '.gz'
+        content = {'description': description, 'tags': ','.join(tags), 'visibility': visibility}
+        req_file = {'file': (name, trace)}
+        data = await self.transport.post(self.BASE_URL + '/gpx/create', files=req_file, data=content)
+        if data.ok:
+            return int(data.text)
+        raise Exception(data.text)
+
+    async def update_gpx(self, tid: int, trace: str, description: str, tags: list,
+                         public: bool = True, visibility: str = 'trackable'):
+        """
+        updates gpx trace
+        PUT /api/0.6/gpx/#id
+        """
+        content = {'description': description, 'tags': ','.join(tags), 'public': public, 'visibility': visibility}
+        req_file = {'file': ('test-trace.gpx', trace)}
+        data = await self.transport.put(self.BASE_URL + '/gpx/' + str(tid), files=req_file, data=content)
+        if data.ok:
+            logger.debug('updated')
+        else:
+            logger.debug('not updated')
+            raise Exception(data.text)
+
+    async def delete_gpx(self, tid: int):
+        """
+        DELETE /api/0.6/gpx/#id
+        """
+        data = await self.transport.delete(self.BASE_URL + '/gpx/' + str(tid))
+        if data.ok:
+            logger.debug('deleted')
+        else:
+            logger.debug('not deleted')
+            raise Exception(data.text)
+
+    async def get_gpx(self, tid: int) -> str:
+        """
+        GET /api/0.6/gpx/#id/data
+        """
+        data = await self.transport.get(self.BASE_URL + '/gpx/{}/data'.format(tid))
+        if data.ok:
+            return data.text
+        raise Exception(data.text)
+
+    async def get_gpx_points(self, tid: int):
+        """
+        trackpoints of a trace, requires numpy
+        GET /api/0.6/gpx/#id/data.xml
+
+        :returns: gpx.TrackPoints
+        """
+        from osm.gpx import read_gpx
+
+        data = await self.transport.get(self.BASE_URL + '/gpx/{}/data.xml'.format(tid))
+        if data.ok:
+            return self.__build(data, read_gpx, data.content)
+        elif data.status_code == HTTPStatus.NOT_FOUND:
+            raise NoneFoundError(data.text)
+        raise Exception(data.text)
+
+    async def get_own_gpx(self) -> list:
+        """
+        GET /api/0.6/user/gpx_files
+        """
+        data = await self.transport.get(self.BASE_URL + '/user/gpx_files')
+        if data.ok:
+            return self.__build(data, osm_parser.parse_gpx_info, self.__xml(data))
+        raise Exception(data.text)
+
+    ''' user '''
+
+    async def get_user(self, uid: int) -> dict:
+        """
+        GET /api/0.6/user/#id
+        :param uid: user id
+        :returns: dictionary with user detail
+        """
+        data = await self.transport.get(self.BASE_URL + '/user/' + str(uid))
+        if data.ok:
+            return self.__build(data, osm_parser.parse_user, self.__xml(data))[0]
+        raise Exception(data.text)
+
+    async def get_users(self, uids: list) -> list:
+        """
+        GET /api/0.6/users?users=#id1,#id2,...,#idn
+
+        :param uids: uid in a list
+        :returns: list of dictionary with user detail
+        """
+        data = await self.transport.get(self.BASE_URL + '/users?users=' + ','.join(map(str, uids)))
+        if data.ok:
+            logger.debug(data.text)
+            return self.__build(data, osm_parser.parse_user, self.__xml(data))
+        raise Exception(data.text)
+
+    ''' notes '''
+
+    async def get_notes_bbox(self, bbox: tuple, limit: int = 100, closed: int = 7) -> list:
+        """
+        GET /api/0.6/notes?bbox=left,bottom,right,top&limit=&closed=
+
+        :param limit: max notes, 1-10000
+        :param closed: max days closed -1=all, 0=only_open
+        """
+        data = await self.transport.get(self.BASE_URL + '/notes',
+                                        params={'bbox': ','.join(map(str, bbox)), 'limit': limit, 'closed': closed})
+        logger.debug(data.text)
+        if data.ok:
+            tree = self.__xml(data)
+            return self.__build(data, osm_parser.parse_notes, tree)
+        elif data.status_code == HTTPStatus.BAD_REQUEST:
+            raise ValueError(data.text)
+        raise Exception(data.text)
+
+    async def get_note(self, nid: int) -> Note:
+        """
+        GET /api/0.6/notes/#id
+        """
+        data = await self.transport.get(self.BASE_URL + '/notes/{}'.format(str(nid)))
+        logger.debug(data.text)
+        if data.ok:
+            tree = self.__xml(data)
+            return self.__build(data, osm_parser.parse_notes, tree)[0]
+        elif data.status_code == HTTPStatus.BAD_REQUEST:
+            raise ValueError(data.text)
+        raise Exception(data.text)
+
+    async def create_note(self, text: str, lat: float, lon: float) -> Note:
+        """
+        POST /api/0.6/notes?lat=<lat>&lon=<lon>&text=<ANote>
+        """
+        data = await self.transport.post(self.BASE_URL + '/notes', params={'lat': lat, 'lon': lon, 'text': text})
+        logger.debug(data.text)
+        if data.ok:
+            tree = self.__xml(data)
+            return self.__build(data, osm_parser.parse_notes, tree)[0]
+        elif data.status_code == HTTPStatus.BAD_REQUEST:
+            raise ValueError(data.text)
+        raise Exception(data.text)
+
+    async def comment_note(self, nid: int, text: str) -> Note:
+        """
+        POST /api/0.6/notes/#id/comment?text=<ANoteComment>
+        """
+        data = await self.transport.post(self.BASE_URL + '/notes/{}/comment'.format(str(nid)),
+                                         params={'text': text})
+        logger.debug(data.text)
+        if data.ok:
+            tree = self.__xml(data)
+            return self.__build(data, osm_parser.parse_notes, tree)[0]
+        elif data.status_code == HTTPStatus.BAD_REQUEST:
+            raise ValueError(data.text)
+        elif data.status_code == HTTPStatus.NOT_FOUND:
+            raise NoneFoundError(data.text)
+        elif data.status_code == HTTPStatus.CONFLICT:
+            raise ConflictError(data.text)
+        raise Exception(data.text)
+
+    async def close_note(self, nid: int, text: str) -> Note:
+        """
+        POST /api/0.6/notes/#id/close?text=<Comment>
+        """
+        data = await self.transport.post(self.BASE_URL + '/notes/{}/close'.format(str(nid)),
+                                         params={'text': text})
+        logger.debug(data.text)
+        if data.ok:
+            tree = self.__xml(data)
+            return self.__build(data, osm_parser.parse_notes, tree)[0]
+        elif data.status_code == HTTPStatus.BAD_REQUEST:
+            raise ValueError(data.text)
+        elif data.status_code == HTTPStatus.NOT_FOUND:
+            raise NoneFoundError(data.text)
+        elif data.status_code == HTTPStatus.CONFLICT:
+            raise ConflictError(data.text)
+        raise Exception(data.text)
+
+    async def reopen_note(self, nid: int, text: str):
+        """
+        POST /api/0.6/notes/#id/reopen?text=<ANoteComment>
+        """
+        data = await self.transport.post(self.BASE_URL + '/notes/{}/reopen'.format(str(nid)),
+                                         params={'text': text})
+        logger.debug(data.text)
+        if data.ok:
+            tree = self.__xml(data)
+            return self.__build(data, osm_parser.parse_notes, tree)[0]
+        elif data.status_code == HTTPStatus.NOT_FOUND:
+            raise NoneFoundError(data.text)
+        elif data.status_code == HTTPStatus.CONFLICT:
+            raise ConflictError(data.text)
+        elif data.status_code == HTTPStatus.GONE:
+            raise LookupError(data.text)
+        raise Exception(data.text)
+
+    ''' metrics '''
+
+    def __xml(self, data) -> ElemTree.Element:
+        """
+        parses a response body, timed as parse phase of its endpoint
+        """
+        with self.metrics.time('parse', data.url):
+            return osm_parser.fromstring(data.content)
+
+    def __build(self, data, build, *args):
+        """
+        calls build with args, timed as build phase of the endpoint of response data
+        """
+        with self.metrics.time('build', data.url):
+            return build(*args)
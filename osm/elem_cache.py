@@ -0,0 +1,131 @@
+import sys
+import copy
+import time
+import threading
+from array import array
+from collections import OrderedDict
+from osm.osm_util import Element, Way, Relation
+
+
+class ElementCache:
+    """
+    in-process identity map of downloaded elements keyed by (type, id, version)
+    the least recently used entries are evicted once max_entries or max_bytes is exceeded,
+    entries older than ttl seconds are treated as missing.
+    Elements are copied on put and on get, so callers editing an element never change the cached one.
+    """
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 64 * 1024 * 1024, ttl: float = 60.0):
+        """
+        :param max_entries: max number of cached elements, 0 disables caching
+        :param max_bytes: approximate memory cap of all cached elements
+        :param ttl: seconds an element is served from the cache
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # (etype, eid, version) -> (element, stored_at, size)
+        self._latest = {}  # (etype, eid) -> newest cached version
+        self._lock = threading.Lock()
+
+    def get(self, etype: str, eid: int, version: int = None):
+        """
+        :param version: specific version, default: newest cached version
+        :returns: cached element or None
+        """
+        with self._lock:
+            if version is None:
+                version = self._latest.get((etype, int(eid)))
+            key = (etype, int(eid), version)
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[1] > self.ttl:
+                if entry is not None:
+                    self.__remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy_element(entry[0])
+
+    def put(self, elem: Element):
+        if not self.max_entries:
+            return
+        elem = copy_element(elem)
+        key = (elem.type, int(elem.id), elem.version)
+        size = _sizeof(elem)
+        with self._lock:
+            if key in self._entries:
+                self.__remove(key)
+            self._entries[key] = (elem, time.monotonic(), size)
+            self.size += size
+            latest = (elem.type, int(elem.id))
+            if self._latest.get(latest, -1) < elem.version:
+                self._latest[latest] = elem.version
+            while self._entries and (len(self._entries) > self.max_entries or self.size > self.max_bytes):
+                self.__remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, etype: str, eid: int):
+        """
+        drops all cached versions of an element
+        """
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == etype and key[1] == int(eid)]:
+                self.__remove(key)
+            self._latest.pop((etype, int(eid)), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._latest.clear()
+            self.size = 0
+
+    def stats(self) -> dict:
+        """
+        :returns: counters to size the cache
+        """
+        return {'entries': len(self._entries), 'bytes': self.size, 'hits': self.hits,
+                'misses': self.misses, 'evictions': self.evictions}
+
+    def __remove(self, key: tuple):
+        elem, stored, size = self._entries.pop(key)
+        self.size -= size
+        latest = key[:2]
+        if self._latest.get(latest) == key[2]:
+            del self._latest[latest]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def copy_element(elem: Element) -> Element:
+    """
+    copy of elem not sharing tags, node refs or members
+    """
+    elem = copy.copy(elem)
+    elem.tags = dict(elem.tags)
+    if isinstance(elem, Way):
+        elem.nodes = elem.nodes
+    elif isinstance(elem, Relation):
+        elem.members = [dict(member) for member in elem.members]
+    return elem
+
+
+def _sizeof(elem: Element) -> int:
+    """
+    rough memory footprint of an element including tags, node refs and members
+    """
+    size = sys.getsizeof(elem) + sys.getsizeof(elem.tags)
+    for key, value in elem.tags.items():
+        size += sys.getsizeof(key) + sys.getsizeof(value)
+    for attr in ('nodes', 'members'):
+        items = getattr(elem, attr, None)
+        if isinstance(items, array):
+            size += sys.getsizeof(items)
+        elif items is not None:
+            size += sys.getsizeof(items) + sum(sys.getsizeof(item) for item in items)
+    return size
@@ -0,0 +1,362 @@
+'''
+GPS trackpoints as NumPy columns, requires numpy
+
+points are held as parallel arrays: lat, lon, time and a segment id
+that increases with every <trkseg>, so consecutive points with the same id belong to one track segment.
+traces are read incrementally, length, speed, bbox and gaps are computed on the arrays.
+before upload a trace can be simplified (Douglas-Peucker or time based thinning) and gzip compressed.
+'''
+
+import io
+import os
+import re
+import pathlib
+import gzip
+from datetime import timezone
+from osm import osm_parser
+import dateutil.parser
+import numpy as np
+from osm.osm_columnar import haversine
+from osm.osm_util import DEG_M
+
+TRACKPOINTS_PAGE = 5000  # points per page of GET /api/0.6/trackpoints
+_OFFSET = re.compile(r'T.*[+-]\d\d:?\d\d$')
+
+
+class TrackPoints:
+    """
+    lat, lon: float64 per point
+    time: datetime64[ms] per point, NaT for anonymous points
+    segment: int64 per point, points of one <trkseg> share the id
+    ele: float64 elevation per point, NaN where missing
+    """
+
+    def __init__(self, lat: np.ndarray, lon: np.ndarray, time: np.ndarray, segment: np.ndarray,
+                 ele: np.ndarray = None):
+        self.lat = lat
+        self.lon = lon
+        self.time = time
+        self.segment = segment
+        self.ele = ele if ele is not None else np.full(len(lat), np.nan)
+
+    @classmethod
+    def empty(cls):
+        return cls(np.empty(0), np.empty(0), np.empty(0, dtype='datetime64[ms]'), np.empty(0, dtype=np.int64))
+
+    @classmethod
+    def from_gpx(cls, chunks):
+        """
+        parses a GPX document incrementally, without building the whole tree
+
+        :param chunks: iterable of bytes, e.g. a streamed response body
+        """
+        lat, lon, time, segment, ele = [], [], [], [], []
+        seg = -1
+        parser = osm_parser.pull_parser()
+        root = None
+        parent = None
+        for chunk in chunks:
+            parser.feed(chunk)
+            for event, elem in parser.read_events():
+                tag = elem.tag.rpartition('}')[2]
+                if event == 'start':
+                    if root is None:
+                        root = parent = elem
+                    elif tag == 'trkseg':
+                        seg += 1
+                        parent = elem
+                    elif tag == 'trkpt':
+                        lat.append(float(elem.get('lat')))
+                        lon.append(float(elem.get('lon')))
+                        segment.append(max(seg, 0))
+                elif tag == 'trkpt':
+                    stamp = height = None
+                    for sub in elem:
+                        sub_tag = sub.tag.rpartition('}')[2]
+                        if sub_tag == 'time':
+                            stamp = sub.text
+                        elif sub_tag == 'ele':
+                            height = sub.text
+                    time.append(stamp)
+                    ele.append(float(height) if height else np.nan)
+                    parent.clear()  # finished points are dropped, the tree never grows
+        parser.close()
+        return cls(np.array(lat, dtype=np.float64), np.array(lon, dtype=np.float64),
+                   to_datetime64(time), np.array(segment, dtype=np.int64), np.array(ele, dtype=np.float64))
+
+    @classmethod
+    def concat(cls, parts: list):
+        """
+        joins several results, segment ids are shifted so segments of different parts stay apart
+        """
+        parts = [part for part in parts if len(part)]
+        if not parts:
+            return cls.empty()
+        segments = []
+        offset = 0
+        for part in parts:
+            segments.append(part.segment + offset)
+            offset = segments[-1][-1] + 1
+        return cls(np.concatenate([part.lat for part in parts]), np.concatenate([part.lon for part in parts]),
+                   np.concatenate([part.time for part in parts]), np.concatenate(segments),
+                   np.concatenate([part.ele for part in parts]))
+
+    def mask(self, bbox: tuple) -> np.ndarray:
+        """
+        :param bbox: (minlon, minlat, maxlon, maxlat)
+        :returns: bool mask of points inside bbox
+        """
+        min_lon, min_lat, max_lon, max_lat = bbox
+        return (self.lon >= min_lon) & (self.lon <= max_lon) & (self.lat >= min_lat) & (self.lat <= max_lat)
+
+    ''' analytics '''
+
+    def step_distances(self) -> np.ndarray:
+        """
+        :returns: meters from every point to the next one, 0 between segments, one entry less than points
+        """
+        if len(self) < 2:
+            return np.empty(0)
+        dist = haversine(self.lat[:-1], self.lon[:-1], self.lat[1:], self.lon[1:])
+        dist[self.segment[1:] != self.segment[:-1]] = 0
+        return dist
+
+    def step_seconds(self) -> np.ndarray:
+        """
+        :returns: seconds from every point to the next one, NaN between segments or without timestamps
+        """
+        if len(self) < 2:
+            return np.empty(0)
+        secs = (self.time[1:] - self.time[:-1]) / np.timedelta64(1, 's')
+        secs[self.segment[1:] != self.segment[:-1]] = np.nan
+        return secs
+
+    def length(self) -> float:
+        """
+        :returns: total length in meters
+        """
+        return float(self.step_distances().sum())
+
+    def segment_lengths(self) -> np.ndarray:
+        """
+        :returns: length in meters indexed by segment id
+        """
+        if not len(self):
+            return np.empty(0)
+        return np.bincount(self.segment[1:], weights=self.step_distances(), minlength=self.segment.max() + 1)
+
+    def speeds(self) -> np.ndarray:
+        """
+        :returns: m/s from every point to the next one, NaN where the time step is unknown or not positive
+        """
+        secs = self.step_seconds()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(secs > 0, self.step_distances() / secs, np.nan)
+
+    def bbox(self):
+        """
+        :returns: (minlon, minlat, maxlon, maxlat), None without points
+        """
+        if not len(self):
+            return None
+        return float(self.lon.min()), float(self.lat.min()), float(self.lon.max()), float(self.lat.max())
+
+    def gaps(self, max_seconds: float = 60.0, max_meters: float = None) -> np.ndarray:
+        """
+        recording gaps inside segments, e.g. lost GPS signal
+
+        :param max_seconds: longer time steps are gaps
+        :param max_meters: longer steps are gaps, default: ignore distance
+        :returns: indices i of points followed by a gap before point i + 1
+        """
+        secs = self.step_seconds()
+        with np.errstate(invalid='ignore'):
+            gap = secs > max_seconds
+        if max_meters is not None:
+            gap |= self.step_distances() > max_meters
+        return np.nonzero(gap)[0]
+
+    ''' simplification '''
+
+    def simplify_mask(self, tolerance: float) -> np.ndarray:
+        """
+        Douglas-Peucker per segment, every dropped point lies within tolerance of the simplified line
+
+        :param tolerance: max deviation in meters
+        :returns: bool mask of points to keep, first and last point of every segment are kept
+        """
+        keep = self.__segment_ends()
+        if len(self) < 3:
+            return keep
+        # local equirectangular projection in meters, exact enough at trace scale
+        y = self.lat * DEG_M
+        x = self.lon * DEG_M * np.cos(np.radians(self.lat))
+        starts = np.nonzero(np.r_[True, self.segment[1:] != self.segment[:-1]])[0]
+        stack = [(start, end - 1) for start, end in zip(starts, np.r_[starts[1:], len(self)]) if end - start > 2]
+        while stack:
+            first, last = stack.pop()
+            dist = _line_distances(x[first + 1:last], y[first + 1:last], x[first], y[first], x[last], y[last])
+            worst = int(np.argmax(dist))
+            if dist[worst] > tolerance:
+                mid = first + 1 + worst
+                keep[mid] = True
+                if mid - first > 1:
+                    stack.append((first, mid))
+                if last - mid > 1:
+                    stack.append((mid, last))
+        return keep
+
+    def thin_mask(self, min_interval: float) -> np.ndarray:
+        """
+        time based thinning, keeps the first point of every min_interval window per segment
+
+        :param min_interval: seconds
+        :returns: bool mask of points to keep, points without timestamp and segment ends are kept
+        """
+        keep = self.__segment_ends()
+        timed = ~np.isnat(self.time)
+        keep |= ~timed
+        if not timed.any():
+            return keep
+        window = (self.time[timed] - self.time[timed].min()) // np.timedelta64(int(min_interval * 1000), 'ms')
+        first = np.r_[True, (window[1:] != window[:-1]) | (self.segment[timed][1:] != self.segment[timed][:-1])]
+        keep[np.nonzero(timed)[0][first]] = True
+        return keep
+
+    def to_gpx(self, creator: str = 'osmate') -> bytes:
+        """
+        :returns: GPX 1.1 document with one track, one <trkseg> per segment
+        """
+        buf = ['<?xml version="1.0" encoding="UTF-8"?>\n<gpx version="1.1" creator="{}" '
+               'xmlns="http://www.topografix.com/GPX/1/1">\n<trk>\n'.format(creator)]
+        times = np.datetime_as_string(self.time, unit='s')
+        for i in range(len(self)):
+            if i == 0 or self.segment[i] != self.segment[i - 1]:
+                buf.append('<trkseg>\n' if i == 0 else '</trkseg>\n<trkseg>\n')
+            buf.append('<trkpt lat="{:.7f}" lon="{:.7f}">'.format(self.lat[i], self.lon[i]))
+            if not np.isnan(self.ele[i]):
+                buf.append('<ele>{:.1f}</ele>'.format(self.ele[i]))
+            if times[i] != 'NaT':
+                buf.append('<time>{}Z</time>'.format(times[i]))
+            buf.append('</trkpt>\n')
+        if len(self):
+            buf.append('</trkseg>\n')
+        buf.append('</trk>\n</gpx>\n')
+        return ''.join(buf).encode()
+
+    def __segment_ends(self) -> np.ndarray:
+        keep = np.zeros(len(self), dtype=bool)
+        if len(self):
+            change = self.segment[1:] != self.segment[:-1]
+            keep[0] = keep[-1] = True
+            keep[:-1] |= change
+            keep[1:] |= change
+        return keep
+
+    def __getitem__(self, index):
+        """
+        :param index: bool mask, index array or slice
+        :returns: TrackPoints with the selected points
+        """
+        return TrackPoints(self.lat[index], self.lon[index], self.time[index], self.segment[index], self.ele[index])
+
+    def __len__(self):
+        return len(self.lat)
+
+
+def read_gpx(source, chunk_size: int = 64 * 1024) -> TrackPoints:
+    """
+    reads the trackpoints of a GPX trace incrementally
+
+    :param source: GPX document as str or bytes, path of a GPX file as str or os.PathLike,
+        binary or text file object, or iterable of bytes chunks e.g. Response.iter_content()
+    :param chunk_size: bytes read from files at once
+    """
+    return TrackPoints.from_gpx(_chunks(source, chunk_size))
+
+
+def prepare_upload(trace, tolerance: float = None, min_interval: float = None, compress: bool = False):
+    """
+    optional stage before a trace upload, simplifies and compresses the trace
+
+    :param trace: anything read_gpx accepts
+    :param tolerance: Douglas-Peucker tolerance in meters, default: no simplification
+    :param min_interval: seconds between kept points, default: no thinning
+    :param compress: gzip the result, the API accepts .gpx.gz files
+    :returns: trace unchanged if nothing is to do, bytes otherwise,
+        a simplified trace only keeps its trackpoints with elevation and time
+    """
+    if tolerance is not None or min_interval is not None:
+        points = read_gpx(trace)
+        keep = np.ones(len(points), dtype=bool)
+        if min_interval is not None:
+            keep &= points.thin_mask(min_interval)
+        if tolerance is not None:
+            kept = points[keep]
+            mask = kept.simplify_mask(tolerance)
+            keep[np.nonzero(keep)[0][~mask]] = False
+        trace = points[keep].to_gpx()
+    if not compress:
+        return trace
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode='wb') as file:
+        for chunk in _chunks(trace):
+            file.write(chunk)
+    return buf.getvalue()
+
+
+def _chunks(source, chunk_size: int = 64 * 1024):
+    """
+    :param source: see read_gpx
+    :returns: generator of bytes
+    """
+    if isinstance(source, str):
+        document = source.lstrip('\ufeff \t\r\n')
+        if document.startswith('<'):
+            source = document.encode()
+        else:
+            source = pathlib.Path(source)
+    if isinstance(source, os.PathLike):
+        with open(source, 'rb') as file:
+            yield from _chunks(file, chunk_size)
+        return
+    if isinstance(source, (bytes, bytearray)):
+        chunks = (source[i:i + chunk_size] for i in range(0, len(source), chunk_size))
+    elif hasattr(source, 'read'):
+        chunks = iter(lambda: source.read(chunk_size), source.read(0))
+    else:
+        chunks = source
+    for chunk in chunks:
+        yield chunk.encode() if isinstance(chunk, str) else chunk
+
+
+def _line_distances(x: np.ndarray, y: np.ndarray, x1: float, y1: float, x2: float, y2: float) -> np.ndarray:
+    """
+    :returns: distances of the points (x, y) to the line segment (x1, y1) - (x2, y2)
+    """
+    dx, dy = x2 - x1, y2 - y1
+    norm = dx * dx + dy * dy
+    if not norm:
+        return np.hypot(x - x1, y - y1)
+    t = np.clip(((x - x1) * dx + (y - y1) * dy) / norm, 0, 1)
+    return np.hypot(x - (x1 + t * dx), y - (y1 + t * dy))
+
+
+def to_datetime64(values: list) -> np.ndarray:
+    """
+    :param values: ISO 8601 timestamps in UTC or None
+    :returns: datetime64[ms] array, NaT for None
+    """
+    stamps = [value[:-1] if value and value.endswith('Z') else value or 'NaT' for value in values]
+    if any(_OFFSET.search(stamp) for stamp in stamps):
+        return np.array([_utc(value) for value in values], dtype='datetime64[ms]')
+    return np.array(stamps, dtype='datetime64[ms]')
+
+
+def _utc(value: str):
+    if not value:
+        return None
+    stamp = dateutil.parser.isoparse(value)
+    if stamp.tzinfo:
+        stamp = stamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return stamp
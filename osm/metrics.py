@@ -0,0 +1,207 @@
+import re
+import time
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+PHASES = ('network', 'parse', 'build', 'stream')
+_API_ROOT = re.compile(r'^.*?/api/[^/]+')
+_ID = re.compile(r'^(\d+|[0-9a-fA-F-]{16,})$')
+
+
+class Histogram:
+    """
+    cumulative bucket counts with sum and count, like a Prometheus histogram
+    """
+    __slots__ = ('bounds', 'counts', 'count', 'sum')
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def snapshot(self) -> dict:
+        return {'count': self.count, 'sum': self.sum, 'buckets': dict(zip(self.bounds, self.counts))}
+
+
+class EndpointStats:
+    """
+    everything recorded for one endpoint
+    """
+    __slots__ = ('requests', 'status', 'bytes_in', 'bytes_out', 'retries', 'latency')
+
+    def __init__(self):
+        self.requests = 0
+        self.status = {}  # (method, status code) -> count
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.retries = 0
+        self.latency = {}  # phase -> Histogram
+
+
+class Metrics:
+    """
+    per endpoint request counts, status codes, payload sizes, retries and latency histograms
+    latency is split into phases: network (request until the headers are read, or the full body when not streamed),
+    parse (response text to XML tree or JSON), build (tree to model objects)
+    and stream (download and parse of streamed responses, which overlap).
+    an endpoint is the API path with IDs replaced by {id}, e.g. /node/{id}/ways
+    """
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self, buckets: tuple = None, prefix: str = 'osmate'):
+        """
+        :param buckets: upper bounds of the latency buckets in seconds
+        :param prefix: name prefix of the exported metrics
+        """
+        self.buckets = tuple(buckets or self.BUCKETS)
+        self.prefix = prefix
+        self._endpoints = {}  # endpoint -> EndpointStats
+        self._lock = threading.Lock()
+
+    def request(self, url: str, method: str, status: int, seconds: float, bytes_in: int = 0, bytes_out: int = 0,
+                retry: bool = False):
+        """
+        records one sent request, every retry is a request of its own
+
+        :param retry: the request repeats a throttled one
+        """
+        with self._lock:
+            stats = self.__stats(endpoint(url))
+            stats.requests += 1
+            key = (method, status)
+            stats.status[key] = stats.status.get(key, 0) + 1
+            stats.bytes_in += bytes_in
+            stats.bytes_out += bytes_out
+            stats.retries += retry
+            self.__histogram(stats, 'network').observe(seconds)
+
+    def received(self, url: str, bytes_in: int):
+        """
+        adds bytes of a streamed response body as they are read, it may have no or a compressed Content-Length
+        """
+        with self._lock:
+            self.__stats(endpoint(url)).bytes_in += bytes_in
+
+    def observe(self, phase: str, url: str, seconds: float):
+        """
+        :param phase: one of PHASES
+        """
+        with self._lock:
+            self.__histogram(self.__stats(endpoint(url)), phase).observe(seconds)
+
+    @contextmanager
+    def time(self, phase: str, url: str):
+        """
+        records the duration of the with block as phase of the endpoint of url
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(phase, url, time.perf_counter() - start)
+
+    def snapshot(self) -> dict:
+        """
+        :returns: endpoint -> {requests, status: {(method, code): count}, bytes_in, bytes_out, retries,
+            latency: {phase: {count, sum, buckets: {upper bound: cumulative count}}}}
+        """
+        with self._lock:
+            return {name: {'requests': stats.requests, 'status': dict(stats.status),
+                           'bytes_in': stats.bytes_in, 'bytes_out': stats.bytes_out, 'retries': stats.retries,
+                           'latency': {phase: hist.snapshot() for phase, hist in stats.latency.items()}}
+                    for name, stats in self._endpoints.items()}
+
+    def prometheus(self) -> str:
+        """
+        :returns: all metrics in the Prometheus text exposition format
+        """
+        name = self.prefix
+        snap = self.snapshot()
+        lines = ['# HELP {}_requests_total HTTP requests sent'.format(name),
+                 '# TYPE {}_requests_total counter'.format(name)]
+        for ep, stats in sorted(snap.items()):
+            for (method, status), count in sorted(stats['status'].items()):
+                lines.append('{}_requests_total{{endpoint="{}",method="{}",status="{}"}} {}'
+                             .format(name, _escape(ep), method, status, count))
+        for key, help_text in (('retries', 'requests repeated after throttling'),
+                               ('bytes_in', 'response body bytes received'),
+                               ('bytes_out', 'request body bytes sent')):
+            lines.append('# HELP {}_{}_total {}'.format(name, key, help_text))
+            lines.append('# TYPE {}_{}_total counter'.format(name, key))
+            for ep, stats in sorted(snap.items()):
+                lines.append('{}_{}_total{{endpoint="{}"}} {}'.format(name, key, _escape(ep), stats[key]))
+        lines.append('# HELP {}_latency_seconds time spent per phase of a call'.format(name))
+        lines.append('# TYPE {}_latency_seconds histogram'.format(name))
+        for ep, stats in sorted(snap.items()):
+            for phase, hist in sorted(stats['latency'].items()):
+                labels = 'endpoint="{}",phase="{}"'.format(_escape(ep), phase)
+                for bound, count in hist['buckets'].items():
+                    lines.append('{}_latency_seconds_bucket{{{},le="{}"}} {}'.format(name, labels, bound, count))
+                lines.append('{}_latency_seconds_bucket{{{},le="+Inf"}} {}'.format(name, labels, hist['count']))
+                lines.append('{}_latency_seconds_sum{{{}}} {}'.format(name, labels, hist['sum']))
+                lines.append('{}_latency_seconds_count{{{}}} {}'.format(name, labels, hist['count']))
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+    def __stats(self, name: str) -> EndpointStats:
+        stats = self._endpoints.get(name)
+        if stats is None:
+            stats = self._endpoints[name] = EndpointStats()
+        return stats
+
+    def __histogram(self, stats: EndpointStats, phase: str) -> Histogram:
+        hist = stats.latency.get(phase)
+        if hist is None:
+            hist = stats.latency[phase] = Histogram(self.buckets)
+        return hist
+
+
+def endpoint(url: str) -> str:
+    """
+    :returns: path of url below the API root with IDs replaced by {id}
+    """
+    path = _API_ROOT.sub('', urlsplit(url).path) or '/'
+    return '/'.join('{id}' if _ID.match(part) else part for part in path.split('/'))
+
+
+def body_size(body) -> int:
+    """
+    :returns: size of a request body in bytes, the size attribute of streamed bodies that count what they sent,
+        0 for bodies of unknown size e.g. generators
+    """
+    if isinstance(body, (bytes, bytearray)):
+        return len(body)
+    if isinstance(body, str):
+        return len(body.encode())
+    return getattr(body, 'size', 0)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared() -> Metrics:
+    """
+    :returns: the process wide Metrics used by default
+    """
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = Metrics()
+        return _shared
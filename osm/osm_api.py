@@ -1,37 +1,68 @@
-import requests
 from http import HTTPStatus
+import copy
 import logging
 import os
-import dateutil.parser
+import time
 import xml.etree.ElementTree as ElemTree
-from osm.osm_util import *
-from osm import a_osm_api
-from ee_osmose import *
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from osm.osm_util import Element, Node, Note, ChangeSet, split_bbox, quarter_bbox
+from osm import a_osm_api, osm_parser
+from osm.transport import Transport
+from osm.elem_cache import ElementCache, copy_element
+from osm.tile_cache import TileCache, merge_elements, merge_located
+from osm.user_directory import UserDirectory
+from osm.single_flight import SingleFlight
+from osm.metrics import Metrics, shared as metrics_shared
+from osm.osm_change import OsmChange
+from osm.rebase import ElementDelta, server_version
+from ee_osmose import ParseError, ConflictError, MethodError, NoneFoundError, AuthError, AreaRefusedError
 
-
-# Enable logging
-logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(lineno)d - %(message)s', level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-try:
-    NAME = os.environ['OSM_USERNAME']
-    PASS = os.environ['OSM_PASSWORD']
-except KeyError:
-    logger.exception('no "OSM_USERNAME" or "OSM_PASSWORD" in environment variables.', 'Exit program')
-    exit()
+OSM_EPOCH = datetime(2004, 1, 1, tzinfo=timezone.utc)  # earliest changeset time
 
 
 class OsmApi(a_osm_api.OsmApi):
-    BASE_URL = 'https://master.apis.dev.openstreetmap.org/api/0.6'
+    BASE_URL = os.environ.get('OSM_API_URL', 'https://master.apis.dev.openstreetmap.org/api/0.6')
+    MAX_URL_LENGTH = 8000
+    MAX_BBOX_AREA = 0.25  # square degrees, larger /map requests are refused
+    MIN_BBOX_EDGE = 0.0001  # degrees, refused areas are not split below this
+    MAX_MAP_REQUESTS = 256  # max /map requests of one split download
+    CHANGESET_PAGE = 100  # max changesets of one GET /changesets
+
+    def __init__(self, transport: Transport = None, max_workers: int = 4, cache: ElementCache = None,
+                 base_url: str = None, tiles: TileCache = None, users: UserDirectory = None, metrics: Metrics = None):
+        """
+        :param transport: HTTP transport used for all calls, default: pooled keep-alive session
+            authenticated with OSM_USERNAME and OSM_PASSWORD, read at the first request
+        :param max_workers: max concurrent requests when one call is split into several requests
+        :param cache: identity map for downloaded elements, ElementCache(max_entries=0) disables caching
+        :param base_url: API root, default: OSM_API_URL environment variable or the OSM dev server
+        :param tiles: tile cache for bbox queries, TileCache(max_tiles=0) disables caching
+        :param users: user directory, default: cached for an hour, fetched in chunks of 100
+        :param metrics: records parse and build times, default: the one of the transport or the process wide one
+        """
+        if base_url:
+            self.BASE_URL = base_url
+        self.transport = transport or Transport(auth=credentials)
+        self.max_workers = max_workers
+        self.cache = cache if cache is not None else ElementCache()
+        self.tiles = tiles if tiles is not None else TileCache()
+        self.flight = SingleFlight()
+        self.metrics = metrics or getattr(self.transport, 'metrics', None) or metrics_shared()
+        self.users = users if users is not None else UserDirectory(self.__get_users_chunk, max_workers=max_workers,
+                                                                   flight=self.flight)
 
     def get_permissions(self) -> set:
         """
         current permissions
         GET /api/0.6/permissions
         """
-        data = requests.get(self.BASE_URL + '/permissions', auth=(NAME, PASS))
+        data = self.transport.get(self.BASE_URL + '/permissions')
         if data.ok:
-            tree = ElemTree.fromstring(data.text)
+            tree = self.__xml(data)
             permissions = set()
             for item in tree.findall('permissions/permission'):
                 permissions.add(item.get('name'))
@@ -45,13 +76,10 @@ class OsmApi(a_osm_api.OsmApi):
         PUT /api/0.6/changeset/create
         :returns: changeset ID
         """
-        root = ElemTree.Element('osm')
-        cs = ElemTree.SubElement(root, 'changeset')
-        self.__kv_serial(tags, cs)
-        xml = ElemTree.tostring(root)
+        xml = osm_parser.serial_changeset(tags)
 
         logger.debug(xml)
-        data = requests.put(self.BASE_URL + '/changeset/create', data=xml, auth=(NAME, PASS))
+        data = self.transport.put(self.BASE_URL + '/changeset/create', data=xml)
         if data.ok:
             return int(data.text)
         elif data.status_code == HTTPStatus.BAD_REQUEST:
@@ -69,10 +97,10 @@ class OsmApi(a_osm_api.OsmApi):
         url = self.BASE_URL + '/changeset/{}'.format(cid)
         if discussion:
             url += '?include_discussion=True'
-        data = requests.get(url, auth=(NAME, PASS))
+        data = self.transport.get(url)
         if data.ok:
             logger.debug(data.text)
-            return self.__changeset_parser(data.text)
+            return self.__build(data, osm_parser.parse_changeset, self.__xml(data))
         elif data.status_code == HTTPStatus.NOT_FOUND:
             raise NoneFoundError(data.text)
         raise Exception(data.text)
@@ -82,7 +110,7 @@ class OsmApi(a_osm_api.OsmApi):
         closes a changeset
         PUT /api/0.6/changeset/#id/close
         """
-        data = requests.get(self.BASE_URL + '/changeset/{}/close'.format(cid), auth=(NAME, PASS))
+        data = self.transport.put(self.BASE_URL + '/changeset/{}/close'.format(cid))
         if data.ok:
             return None
         elif data.status_code == HTTPStatus.NOT_FOUND:
@@ -91,47 +119,118 @@ class OsmApi(a_osm_api.OsmApi):
             raise ConflictError(data.text)
         raise Exception(data.text)
 
+    def get_changesets(self, bbox: tuple = None, user: str = '', time1: datetime = None, time2: datetime = None,
+                       is_open: bool = True, is_closed: bool = True, changesets: list = None,
+                       limit: int = None, prefetch: bool = True):
+        """
+        all changesets matching the provided parameters, newest first
+        GET /api/0.6/changesets?bbox=&user=|display_name=&time=&open=&closed=&changesets=
+        the API answers max 100 changesets, the following pages are requested by moving the end of the time
+        window to the oldest changeset seen, the next page is fetched while the current one is consumed
+
+        :param bbox: (minlon, minlat, maxlon, maxlat)
+        :param user: user ID or display name
+        :param time1: closed after
+        :param time2: created before
+        :param is_open: include open changesets
+        :param is_closed: include closed changesets
+        :param changesets: only these changeset IDs
+        :param limit: stop after this many changesets
+        :param prefetch: request the next page in the background
+        :returns: generator of ChangeSets
+        :raises ValueError: HTTP 400 BAD REQUEST
+            invalid parameters
+        :raises NoneFoundError: no such user
+        """
+        params = changeset_params(bbox, user, is_open, is_closed)
+        if changesets:
+            pages = (dict(params, changesets=','.join(map(str, changesets[i:i + self.CHANGESET_PAGE])))
+                     for i in range(0, len(changesets), self.CHANGESET_PAGE))
+            found = (changeset for page in pages for changeset in self.__get_changesets(page))
+            yield from islice(found, limit)
+            return
+        pool = ThreadPoolExecutor(max_workers=1)
+        try:
+            future = pool.submit(self.__get_changesets, changeset_window(params, time1, time2))
+            seen = set()
+            count = 0
+            while future:
+                page = future.result()
+                future = None
+                fresh = [changeset for changeset in page if changeset.id not in seen]
+                seen.update(changeset.id for changeset in fresh)
+                if len(page) >= self.CHANGESET_PAGE:
+                    time2 = next_window_end(page, fresh)
+                    future = pool.submit(self.__get_changesets, changeset_window(params, time1, time2)) \
+                        if prefetch else None
+                for changeset in fresh:
+                    if limit is not None and count >= limit:
+                        return
+                    count += 1
+                    yield changeset
+                if len(page) >= self.CHANGESET_PAGE:
+                    future = future or pool.submit(self.__get_changesets, changeset_window(params, time1, time2))
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def __get_changesets(self, params: dict) -> list:
+        data = self.transport.get(self.BASE_URL + '/changesets', params=params)
+        if data.ok:
+            return self.__build(data, osm_parser.parse_changesets, self.__xml(data))
+        elif data.status_code == HTTPStatus.BAD_REQUEST:
+            raise ValueError(data.text)
+        elif data.status_code == HTTPStatus.NOT_FOUND:
+            raise NoneFoundError(data.text)
+        raise Exception(data.text)
+
     def download_changeset(self, cid: int) -> str:
         """
         GET /api/0.6/changeset/#id/download
         """
-        data = requests.get(self.BASE_URL + '/changeset/close', auth=(NAME, PASS))
+        data = self.transport.get(self.BASE_URL + '/changeset/{}/download'.format(cid))
         if data.ok:
             return data.text
         elif data.status_code == HTTPStatus.NOT_FOUND:
             raise NoneFoundError(data.text)
         raise Exception(data.text)
 
-    def __changeset_parser(self, data: str):
-        tree = ElemTree.fromstring(data)
-        tags = self.__kv_parser(tree.findall('changeset/tag'))
-        cs_xml = tree.find('changeset')
-        cs_prop = {}
-        for key in cs_xml.keys():
-            cs_prop[key] = cs_xml.get(key)
-
-        com_xml = cs_xml.findall('discussion/comment')
-        comments = []
-        for com in com_xml:
-            comments.append(Comment(com.find('text').text, com.get('uid'), com.get('user'), com.get('date')))
-        try:
-            bbox = cs_prop['max_lon'], cs_prop['max_lat'], cs_prop['min_lon'], cs_prop['min_lat']
-        except KeyError:
-            bbox = ()
-        ch_set = ChangeSet(cs_prop['id'], cs_prop['user'], cs_prop['uid'], cs_prop['created_at'],
-                           True, bbox, cs_prop['open'] or datetime.fromisoformat(cs_prop['closed_at']), tags, comments)
-        return ch_set
+    def diff_upload(self, cid: int, change: OsmChange) -> list:
+        """
+        POST /api/0.6/changeset/#id/upload
+        the osmChange document is written while it is sent, as chunked request body
+        :returns: uploaded elements with new ids and versions
+        """
+        for elem in change.creates:
+            self.__invalidate_tiles(elem, create=True)
+        for elem in change.modifies + change.deletes:
+            self.__invalidate_tiles(elem)
+            self.cache.invalidate(elem.type, elem.id)
+        data = self.transport.post(self.BASE_URL + '/changeset/{}/upload'.format(cid),
+                                   data=osm_parser.ChangeBody(change, cid), headers={'Content-Type': 'text/xml'})
+        if data.ok:
+            return change.apply_diff(self.__build(data, osm_parser.parse_diff_result, self.__xml(data)))
+        elif data.status_code == HTTPStatus.BAD_REQUEST:
+            raise ValueError(data.text)
+        elif data.status_code == HTTPStatus.NOT_FOUND:
+            raise NoneFoundError(data.text)
+        elif data.status_code == HTTPStatus.CONFLICT:
+            raise ConflictError(data.text)
+        elif data.status_code == HTTPStatus.GONE:
+            raise LookupError(data.text)
+        elif data.status_code == HTTPStatus.PRECONDITION_FAILED:
+            raise ParseError(data.text)
+        raise Exception(data.text)
 
     def comm_changeset(self, cid: int, text: str) -> ChangeSet:
         """
         Add a comment to a changeset. The changeset must be closed.
         POST /api/0.6/changeset/#id/comment
         """
-        data = requests.post(self.BASE_URL + '/changeset/{}/comment'.format(str(cid)),
-                             data={'text': text}, auth=(NAME, PASS))
+        data = self.transport.post(self.BASE_URL + '/changeset/{}/comment'.format(str(cid)),
+                                   data={'text': text})
         logger.debug(data.text)
         if data.ok:
-            return self.__changeset_parser(data.text)
+            return self.__build(data, osm_parser.parse_changeset, self.__xml(data))
         elif data.status_code == HTTPStatus.BAD_REQUEST:
             raise ValueError(data.text)
         elif data.status_code == HTTPStatus.CONFLICT:
@@ -142,9 +241,9 @@ class OsmApi(a_osm_api.OsmApi):
         Subscribes the current authenticated user to changeset discussion
         POST /api/0.6/changeset/#id/subscribe
         """
-        data = requests.post(self.BASE_URL + '/changeset/{}/subscribe'.format(cid), auth=(NAME, PASS))
+        data = self.transport.post(self.BASE_URL + '/changeset/{}/subscribe'.format(cid))
         if data.ok:
-            return self.__changeset_parser(data.text)
+            return self.__build(data, osm_parser.parse_changeset, self.__xml(data))
         elif data.status_code == HTTPStatus.CONFLICT:
             raise ConflictError(data.text)
         raise Exception(data.text)
@@ -154,9 +253,9 @@ class OsmApi(a_osm_api.OsmApi):
         Unsubscribe the current authenticated user from changeset discussion
         POST /api/0.6/changeset/#id/subscribe
         """
-        data = requests.post(self.BASE_URL + '/changeset/{}/unsubscribe'.format(cid), auth=(NAME, PASS))
+        data = self.transport.post(self.BASE_URL + '/changeset/{}/unsubscribe'.format(cid))
         if data.ok:
-            return self.__changeset_parser(data.text)
+            return self.__build(data, osm_parser.parse_changeset, self.__xml(data))
         elif data.status_code == HTTPStatus.NOT_FOUND:
             raise NoneFoundError(data.text)
         raise Exception(data.text)
@@ -170,8 +269,9 @@ class OsmApi(a_osm_api.OsmApi):
         :returns: Element ID
         """
         elem.changeset = cid
-        xml = self.__serial_elem(elem, True)
-        data = requests.get(self.BASE_URL + '/{}/create'.format(elem.e_type), data=xml, auth=(NAME, PASS))
+        self.__invalidate_tiles(elem, create=True)
+        xml = osm_parser.serial_elem(elem, True)
+        data = self.transport.put(self.BASE_URL + '/{}/create'.format(elem.e_type), data=xml)
         if data.ok:
             return int(data.text)
         elif data.status_code == HTTPStatus.BAD_REQUEST:
@@ -180,87 +280,43 @@ class OsmApi(a_osm_api.OsmApi):
             raise ConflictError(data.text)
         elif data.status_code == HTTPStatus.PRECONDITION_FAILED:
             raise ParseError(data.text)
+        raise Exception(data.text)
 
     def get_element(self, etype: str, eid: int) -> Element:
         """
         GET /api/0.6/[node|way|relation]/#id
+        served from the element cache while the cached version is fresh,
+        concurrent calls for the same element share one request
         """
-        data = requests.get(self.BASE_URL + '/{}/{}'.format(etype, eid), auth=(NAME, PASS))
+        elem = self.cache.get(etype, eid)
+        if elem is not None:
+            return elem
+        return self.flight.do(('element', etype, int(eid)), self.__get_element, etype, eid, share=copy_element)
+
+    def __get_element(self, etype: str, eid: int) -> Element:
+        data = self.transport.get(self.BASE_URL + '/{}/{}'.format(etype, eid))
         if data.ok:
-            tree = ElemTree.fromstring(data.text)
+            tree = self.__xml(data)
             logger.debug(data.text)
-            return self.__parse_elem(tree[0])
+            elem = self.__build(data, osm_parser.parse_elem, tree[0])
+            self.cache.put(elem)
+            return elem
         elif data.status_code == HTTPStatus.NOT_FOUND:
             raise NoneFoundError(data.text)
         elif data.status_code == HTTPStatus.GONE:
             raise LookupError(data.text)
         raise Exception(data.text)
 
-    def __parse_elem(self, elem: ElemTree.Element):
-        eid = elem.get('id')
-        version = int(elem.get('version'))
-        changeset = elem.get('changeset')
-        cr_date = elem.get('timestamp')
-        user = elem.get('user')
-        uid = elem.get('uid')
-        visible = bool(elem.get('visible'))
-        lat = elem.get('lat')  # lan & lon only type node
-        lon = elem.get('lon')
-
-        nodes = []
-        for node in elem.findall('nd'):
-            nodes.append(node.get('ref'))
-
-        members = []
-        for member in elem.findall('member'):
-            mem = {}
-            for item in member.keys():
-                mem[item] = member.get(item)
-            members.append(mem)
-
-        if elem.tag == 'node':
-            return Node(eid, lat, lon, version, changeset, user, uid, cr_date, visible,
-                        self.__kv_parser(elem.findall('tag')))
-        elif elem.tag == 'way':
-            return Way(eid, nodes, version, changeset, user, uid, cr_date, visible,
-                       self.__kv_parser(elem.findall('tag')))
-        elif elem.tag == 'relation':
-            return Relation(eid, members, version, changeset, user, uid, cr_date, visible,
-                            self.__kv_parser(elem.findall('tag')))
-        return elem
-
-    def __serial_elem(self, elem: Element, is_create: bool = False) -> str:
-        root = ElemTree.Element("osm")
-        doc = ElemTree.Element('None')
-        if not is_create:
-            params = {'id': elem.id, 'version': str(elem.version), 'changeset': str(elem.changeset),
-                      'user': elem.user, 'uid': str(elem.uid), 'visible': str(elem.visible), 'timestamp': elem.created}
-        else:
-            params = {'changeset': str(elem.changeset)}
-        if isinstance(elem, Node):
-            params['lat'] = str(elem.lat)
-            params['lon'] = str(elem.lon)
-            doc = ElemTree.SubElement(root, "node", params)
-        elif isinstance(elem, Way):
-            doc = ElemTree.SubElement(root, "way", params)
-            for ref in elem.nodes:
-                ElemTree.SubElement(doc, 'nd', {'ref': ref})
-        elif isinstance(elem, Relation):
-            doc = ElemTree.SubElement(root, "relation", params)
-            for member in elem.members:
-                ElemTree.SubElement(doc, 'member', member)
-        self.__kv_serial(elem.tags, doc)
-
-        return ElemTree.tostring(root).decode()
-
     def edit_element(self, elem: Element, cid: int) -> int:
         """
         PUT /api/0.6/[node|way|relation]/#id
         :returns: New version Number
         """
         elem.changeset = cid
-        data = requests.put(self.BASE_URL + '/{}/{}'.format(elem.e_type, elem.id),
-                            data=self.__serial_elem(elem), auth=(NAME, PASS))
+        self.__invalidate_tiles(elem)
+        self.cache.invalidate(elem.e_type, elem.id)
+        data = self.transport.put(self.BASE_URL + '/{}/{}'.format(elem.e_type, elem.id),
+                                  data=osm_parser.serial_elem(elem))
         if data.ok:
             return int(data.text)
         elif data.status_code == HTTPStatus.BAD_REQUEST:
@@ -273,6 +329,33 @@ class OsmApi(a_osm_api.OsmApi):
             raise ParseError(data.text)
         raise Exception(data.text)
 
+    def edit_element_rebase(self, delta: ElementDelta, cid: int, retries: int = 3) -> int:
+        """
+        PUT /api/0.6/[node|way|relation]/#id of delta applied to its base version
+        on a version mismatch (409) the current version is fetched, the delta merged into it and the PUT retried
+
+        :param retries: max rebases
+        :returns: new version number, the current one if it already contains the change
+        :raises ConflictError: real conflict, the element got deleted, the changeset is closed
+            or still a version mismatch after retries
+        """
+        current = delta.base
+        for attempt in range(retries + 1):
+            if not delta.pending(current):
+                return current.version
+            elem = delta.merge(current)
+            try:
+                return self.edit_element(elem, cid)
+            except ConflictError as err:
+                if attempt == retries or server_version(err.message) is None:
+                    raise
+                logger.info('rebasing {} {} onto version {}'.format(delta.etype, delta.eid,
+                                                                    server_version(err.message)))
+            try:
+                current = self.get_element(delta.etype, delta.eid)
+            except LookupError:
+                raise ConflictError('{} {} was deleted'.format(delta.etype, delta.eid)) from None
+
     def delete_element(self, elem: Element, cid: int) -> int:
         """
         DELETE /api/0.6/[node|way|relation]/#id
@@ -280,8 +363,10 @@ class OsmApi(a_osm_api.OsmApi):
         :returns: new version number
         """
         elem.changeset = cid
-        data = requests.delete(self.BASE_URL + '/{}/{}'.format(elem.e_type, elem.id),
-                               data=self.__serial_elem(elem), auth=(NAME, PASS))
+        self.__invalidate_tiles(elem)
+        self.cache.invalidate(elem.e_type, elem.id)
+        data = self.transport.delete(self.BASE_URL + '/{}/{}'.format(elem.e_type, elem.id),
+                                     data=osm_parser.serial_elem(elem))
         if data.ok:
             return int(data.text)
         elif data.status_code == HTTPStatus.BAD_REQUEST:
@@ -299,22 +384,62 @@ class OsmApi(a_osm_api.OsmApi):
     def get_elements(self, etype: str, lst_eid: list) -> list:
         """
         GET /api/0.6/[nodes|ways|relations]?#parameters
-        """
-        data = requests.get(self.BASE_URL + '/{}s?{}s={}'.format(etype, etype, ','.join(map(str, lst_eid))),
-                            auth=(NAME, PASS))
-        if data.ok:
-            tree = ElemTree.fromstring(data.text)
-            logger.debug(data.text)
+        only ids missing in the element cache are requested,
+        long id lists are split into URL-length-safe chunks, which are fetched concurrently
+
+        :returns: elements in the order of lst_eid, duplicates removed
+        """
+        eids = list(dict.fromkeys(map(str, lst_eid)))
+        by_id = {}
+        missing = []
+        for eid in eids:
+            elem = None if 'v' in eid else self.cache.get(etype, eid)
+            if elem is None:
+                missing.append(eid)
+            else:
+                by_id[eid] = elem
+        chunks = self.__chunk_ids(etype, missing)
+        if len(chunks) > 1:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as pool:
+                parts = pool.map(lambda chunk: self.__get_elements_chunk(etype, chunk), chunks)
+                elems = [elem for part in parts for elem in part]
+        elif missing:
+            elems = self.__get_elements_chunk(etype, missing)
+        else:
             elems = []
-            for sub in tree:
-                elems.append(self.__parse_elem(sub))
-            return elems
-
+        for elem in elems:
+            self.cache.put(elem)
+            by_id[str(elem.id)] = elem
+        return [by_id[eid.split('v')[0]] for eid in eids if eid.split('v')[0] in by_id]
+
+    def __chunk_ids(self, etype: str, eids: list) -> list:
+        """
+        :returns: eids split into chunks whose request URL stays below MAX_URL_LENGTH
+        """
+        base_len = len(self.BASE_URL + '/{}s?{}s='.format(etype, etype))
+        chunks = [[]]
+        length = base_len
+        for eid in eids:
+            if chunks[-1] and length + len(eid) + 1 > self.MAX_URL_LENGTH:
+                chunks.append([])
+                length = base_len
+            chunks[-1].append(eid)
+            length += len(eid) + 1
+        return chunks
+
+    def __get_elements_chunk(self, etype: str, eids: list) -> list:
+        data = self.transport.get(self.BASE_URL + '/{}s?{}s={}'.format(etype, etype, ','.join(eids)))
+        if data.ok:
+            tree = self.__xml(data)
+            return self.__build(data, osm_parser.parse_elems, tree)
         elif data.status_code == HTTPStatus.BAD_REQUEST:
             raise ParseError(data.text)
         elif data.status_code == HTTPStatus.NOT_FOUND:
             raise NoneFoundError(data.text)
         elif data.status_code == HTTPStatus.REQUEST_URI_TOO_LONG:
+            if len(eids) > 1:  # server limit is below MAX_URL_LENGTH, retry in halves
+                half = len(eids) // 2
+                return self.__get_elements_chunk(etype, eids[:half]) + self.__get_elements_chunk(etype, eids[half:])
             raise MethodError(data.text)
         raise Exception(data.text)
 
@@ -322,13 +447,11 @@ class OsmApi(a_osm_api.OsmApi):
         """
         GET /api/0.6/[node|way|relation]/#id/relations
         """
-        data = requests.get(self.BASE_URL + '/{}/{}/relations'.format(etype, eid), auth=(NAME, PASS))
+        data = self.transport.get(self.BASE_URL + '/{}/{}/relations'.format(etype, eid))
         if data.ok:
-            tree = ElemTree.fromstring(data.text)
+            tree = self.__xml(data)
             logger.debug(data.text)
-            elems = []
-            for sub in tree:
-                elems.append(self.__parse_elem(sub))
+            elems = self.__build(data, osm_parser.parse_elems, tree)
             if not elems:
                 raise NoneFoundError('no such element or no relations on this element')
             return elems
@@ -338,13 +461,11 @@ class OsmApi(a_osm_api.OsmApi):
         """
         GET /api/0.6/node/#id/ways
         """
-        data = requests.get(self.BASE_URL + '/node/{}/ways'.format(eid), auth=(NAME, PASS))
+        data = self.transport.get(self.BASE_URL + '/node/{}/ways'.format(eid))
         if data.ok:
-            tree = ElemTree.fromstring(data.text)
+            tree = self.__xml(data)
             logger.debug(data.text)
-            elems = []
-            for sub in tree:
-                elems.append(self.__parse_elem(sub))
+            elems = self.__build(data, osm_parser.parse_elems, tree)
             if not elems:
                 raise NoneFoundError('no such node or no ways on this element')
             return elems
@@ -352,43 +473,217 @@ class OsmApi(a_osm_api.OsmApi):
 
     def get_element_bbox(self, bbox: tuple) -> list:
         """
-        :returns: all Elements with minimum one Node within this BoundingBox max: 50.000 Elements
+        :returns: all Elements with minimum one Node within this BoundingBox
         GET /api/0.6/map?bbox=left,bottom,right,top
+        bbox is snapped to the tile cache, only missing or stale tiles are downloaded,
+        areas the server refuses as too large or too dense are split until every part is accepted
+
+        :raise NoneFoundError: no elements are found
+        :raise AreaRefusedError: an area below MIN_BBOX_EDGE is still refused
+            or the split needs more than MAX_MAP_REQUESTS requests
+        :raise ValueError: HTTP 400 BAD REQUEST for another reason e.g. an invalid bbox
+        """
+        tiles = self.__tiled('map', bbox, self.__get_map_split)
+        if tiles is None:
+            elems = self.flight.do(('map', tuple(bbox)), self.__get_map_split, bbox,
+                                   share=lambda shared: [copy_element(elem) for elem in shared])
+        else:
+            elems = merge_elements(tiles, bbox)
+        if not elems:
+            raise NoneFoundError('no elements')
+        return elems
+
+    def __get_map_split(self, bbox: tuple) -> list:
+        """
+        adaptive quadtree download: bbox is pre-split into parts of MAX_BBOX_AREA,
+        each refused part is split into quadrants, every round of parts is fetched concurrently
+
+        :returns: merged elements of all accepted parts
+        """
+        pending = split_bbox(bbox, self.MAX_BBOX_AREA)
+        leaves = []
+        sent = 0
+        while pending:
+            sent += len(pending)
+            if sent > self.MAX_MAP_REQUESTS:
+                raise AreaRefusedError('area {} needs more than {} requests'.format(bbox, self.MAX_MAP_REQUESTS))
+            if len(pending) > 1:
+                with ThreadPoolExecutor(max_workers=min(self.max_workers, len(pending))) as pool:
+                    results = list(pool.map(self.__get_map_leaf, pending))
+            else:
+                results = [self.__get_map_leaf(pending[0])]
+            refused = []
+            for part, elems in zip(pending, results):
+                if elems is not None:
+                    leaves.append(elems)
+                elif part[2] - part[0] < self.MIN_BBOX_EDGE:
+                    raise AreaRefusedError('area {} is still refused'.format(part))
+                else:
+                    refused.extend(quarter_bbox(part))
+            pending = refused
+        if len(leaves) == 1:
+            return leaves[0]
+        return merge_elements(leaves, bbox)
+
+    def __get_map_leaf(self, bbox: tuple):
+        """
+        :returns: elements of bbox, None if the server refuses the area as too large or too dense
+        """
+        try:
+            return list(self.iter_element_bbox(bbox))
+        except NoneFoundError:
+            return []
+        except AreaRefusedError:
+            return None
 
+    def iter_element_bbox(self, bbox: tuple, chunk_size: int = 64 * 1024):
         """
-        data = requests.get(self.BASE_URL + '/map?bbox={}'.format(','.join(map(str, bbox))), auth=(NAME, PASS))
-        if data.ok:
-            tree = ElemTree.fromstring(data.text)
-            logger.debug(data.text)
-            elems = []
-            for sub in tree[1:]:
-                elems.append(self.__parse_elem(sub))
-            if not len(tree) > 1:
-                raise NoneFoundError('no elements or over 50.000 elements')
-            return elems
-        raise Exception(data.text)
+        streaming variant of get_element_bbox
+        the response body is parsed while it is downloaded, elements are yielded one by one
+        GET /api/0.6/map?bbox=left,bottom,right,top
+
+        :param bbox: (minlon, minlat, maxlon, maxlat)
+        :param chunk_size: bytes read from the connection at once
+        :returns: generator of all Elements with minimum one Node within this BoundingBox
+        :raise NoneFoundError: no elements are found
+        :raise AreaRefusedError: HTTP 400 BAD REQUEST
+            area too large or over 50.000 nodes
+        :raise ValueError: HTTP 400 BAD REQUEST for another reason
+        """
+        data = self.transport.get(self.BASE_URL + '/map?bbox={}'.format(','.join(map(str, bbox))), stream=True)
+        try:
+            if data.status_code == HTTPStatus.BAD_REQUEST:
+                raise map_error(data.text)
+            if not data.ok:
+                raise Exception(data.text)
+            count = 0
+            for elem in self.__iter_timed(data, osm_parser.iter_elems, chunk_size):
+                count += 1
+                yield elem
+            if not count:
+                raise NoneFoundError('no elements')
+        finally:
+            data.close()
+
+    def get_element_bbox_columnar(self, bbox: tuple, chunk_size: int = 64 * 1024):
+        """
+        columnar variant of get_element_bbox, requires numpy
+        nodes, ways, relations and tags are returned as arrays for vectorized geometry
+        GET /api/0.6/map?bbox=left,bottom,right,top
+
+        :param bbox: (minlon, minlat, maxlon, maxlat)
+        :returns: osm_columnar.ColumnarMap
+        :raise NoneFoundError: no elements are found
+        :raise ValueError: HTTP 400 BAD REQUEST
+            area too large or over 50.000 nodes
+        """
+        from osm.osm_columnar import ColumnarMap
+
+        data = self.transport.get(self.BASE_URL + '/map?bbox={}'.format(','.join(map(str, bbox))), stream=True)
+        try:
+            if data.status_code == HTTPStatus.BAD_REQUEST:
+                raise map_error(data.text)
+            if not data.ok:
+                raise Exception(data.text)
+            with self.metrics.time('stream', data.url):
+                result = ColumnarMap.from_xml(data.iter_content(chunk_size))
+        finally:
+            data.close()
+        if not len(result):
+            raise NoneFoundError('no elements')
+        return result
 
     ''' GPX '''
 
-    def get_bbox_gpx(self, bbox: tuple, page: int = 0) -> list:
+    def get_bbox_gpx(self, bbox: tuple, page: int = 0):
         """
-        returns 5000GPS trackpoints max, increase page for any additional 5000
+        one page of public GPS trackpoints, 5000 points max, increase page for any additional 5000
         GET /api/0.6/trackpoints?bbox=left,bottom,right,top&page=pageNumber
+        the first page is served from the tile cache, only missing or stale tiles are downloaded.
+        If the tiles hold more than one page, bbox is requested as a whole, like later pages. requires numpy
+
+        :param bbox: (minlon, minlat, maxlon, maxlat)
+        :returns: gpx.TrackPoints inside bbox
+        :raise ValueError: HTTP 400 BAD REQUEST
+            area too large
+        """
+        from osm.gpx import TrackPoints, TRACKPOINTS_PAGE
+
+        # pages of a tile are no pages of bbox
+        tiles = None if page else self.__tiled('trackpoints', bbox, lambda tile: self.__get_trackpoints(tile, 0))
+        if tiles is None or any(len(points) >= TRACKPOINTS_PAGE for points in tiles):
+            return self.__get_trackpoints(bbox, page)
+        points = TrackPoints.concat(tiles)
+        points = points[points.mask(bbox)]
+        if len(points) > TRACKPOINTS_PAGE:
+            return self.__get_trackpoints(bbox, page)
+        return points
+
+    def iter_bbox_gpx(self, bbox: tuple, page: int = 0, prefetch: bool = True):
+        """
+        walks all pages of public GPS trackpoints in bbox
+        the next page is downloaded while the current one is consumed, requires numpy
+        GET /api/0.6/trackpoints?bbox=left,bottom,right,top&page=pageNumber
+
+        :param page: first page
+        :param prefetch: request the next page in the background
+        :returns: generator of gpx.TrackPoints, one per page
         """
-        data = requests.get(self.BASE_URL + '/trackpoints?bbox={}' + ','.join(map(str, bbox)), auth=(NAME, PASS))
-        if data.ok:
-            return self.__parse_gpx_info(data.text)
-        raise Exception(data.text)
+        from osm.gpx import TRACKPOINTS_PAGE
+
+        pool = ThreadPoolExecutor(max_workers=1)
+        try:
+            future = pool.submit(self.__get_trackpoints, bbox, page)
+            while future:
+                points = future.result()
+                future = None
+                if len(points) >= TRACKPOINTS_PAGE:
+                    page += 1
+                    future = pool.submit(self.__get_trackpoints, bbox, page) if prefetch else None
+                    yield points
+                    future = future or pool.submit(self.__get_trackpoints, bbox, page)
+                elif len(points):
+                    yield points
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def __get_trackpoints(self, bbox: tuple, page: int):
+        from osm.gpx import TrackPoints
+
+        data = self.transport.get(self.BASE_URL + '/trackpoints',
+                                  params={'bbox': ','.join(map(str, bbox)), 'page': page}, stream=True)
+        try:
+            if data.ok:
+                with self.metrics.time('stream', data.url):
+                    return TrackPoints.from_gpx(data.iter_content(64 * 1024))
+            elif data.status_code == HTTPStatus.BAD_REQUEST:
+                raise ValueError(data.text)
+            raise Exception(data.text)
+        finally:
+            data.close()
 
     def upload_gpx(self, trace: str, name: str, description: str, tags: set,
-                   public: bool = True, visibility: str = 'trackable') -> int:
+                   public: bool = True, visibility: str = 'trackable',
+                   tolerance: float = None, min_interval: float = None, compress: bool = False) -> int:
         """
         uploads gpx trace
         POST /api/0.6/gpx/create
+
+        :param trace: GPX document or file object, with tolerance, min_interval or compress
+            anything gpx.read_gpx accepts e.g. a path
+        :param tolerance: simplify the trace, max deviation in meters, requires numpy
+        :param min_interval: thin the trace to one point per min_interval seconds, requires numpy
+        :param compress: upload gzip compressed
         """
+        if tolerance is not None or min_interval is not None or compress:
+            from osm.gpx import prepare_upload
+
+            trace = prepare_upload(trace, tolerance, min_interval, compress)
+            if compress:
+                name += '.gz'
         content = {'description': description, 'tags': ','.join(tags), 'visibility': visibility}
         req_file = {'file': (name, trace)}
-        data = requests.post(self.BASE_URL + '/gpx/create', auth=(NAME, PASS), files=req_file, data=content)
+        data = self.transport.post(self.BASE_URL + '/gpx/create', files=req_file, data=content)
         if data.ok:
             return int(data.text)
         raise Exception(data.text)
@@ -401,7 +696,7 @@ class OsmApi(a_osm_api.OsmApi):
         """
         content = {'description': description, 'tags': ','.join(tags), 'public': public, 'visibility': visibility}
         req_file = {'file': ('test-trace.gpx', trace)}
-        data = requests.put(self.BASE_URL + '/gpx/' + str(tid), auth=(NAME, PASS), files=req_file, data=content)
+        data = self.transport.put(self.BASE_URL + '/gpx/' + str(tid), files=req_file, data=content)
         if data.ok:
             logger.debug('updated')
         else:
@@ -412,7 +707,7 @@ class OsmApi(a_osm_api.OsmApi):
         """
         DELETE /api/0.6/gpx/#id
         """
-        data = requests.delete(self.BASE_URL + '/gpx/' + str(tid), auth=(NAME, PASS))
+        data = self.transport.delete(self.BASE_URL + '/gpx/' + str(tid))
         if data.ok:
             logger.debug('deleted')
         else:
@@ -423,70 +718,77 @@ class OsmApi(a_osm_api.OsmApi):
         """
         GET /api/0.6/gpx/#id/data
         """
-        data = requests.get(self.BASE_URL + '/gpx/{}/data'.format(tid), auth=(NAME, PASS))
+        data = self.transport.get(self.BASE_URL + '/gpx/{}/data'.format(tid))
         if data.ok:
             return data.text
         raise Exception(data.text)
 
+    def get_gpx_points(self, tid: int, chunk_size: int = 64 * 1024):
+        """
+        trackpoints of a trace, the response is parsed while it is downloaded, requires numpy
+        GET /api/0.6/gpx/#id/data.xml
+
+        :returns: gpx.TrackPoints
+        """
+        from osm.gpx import read_gpx
+
+        data = self.transport.get(self.BASE_URL + '/gpx/{}/data.xml'.format(tid), stream=True)
+        try:
+            if data.ok:
+                with self.metrics.time('stream', data.url):
+                    return read_gpx(data.iter_content(chunk_size))
+            elif data.status_code == HTTPStatus.NOT_FOUND:
+                raise NoneFoundError(data.text)
+            raise Exception(data.text)
+        finally:
+            data.close()
+
     def get_own_gpx(self) -> list:
         """
         GET /api/0.6/user/gpx_files
         """
-        data = requests.get(self.BASE_URL + '/user/gpx_files', auth=(NAME, PASS))
+        data = self.transport.get(self.BASE_URL + '/user/gpx_files')
         if data.ok:
-            return self.__parse_gpx_info(data.text)
+            return self.__build(data, osm_parser.parse_gpx_info, self.__xml(data))
         raise Exception(data.text)
 
-    def __parse_gpx_info(self, xml):
-        tree = ElemTree.fromstring(xml)
-        lst = []
-        for item in tree.findall('gpx_file'):
-            attrib = item.attrib
-            attrib['timestamp'] = str(dateutil.parser.isoparse(attrib['timestamp']))
-            for info in item:
-                attrib[info.tag] = info.text
-            lst.append(attrib)
-        return lst
-
     ''' user '''
 
     def get_user(self, uid: int) -> dict:
         """
-        GET /api/0.6/user/#id
+        GET /api/0.6/users?users=#id
+        served from the user directory
         :param uid: user id
         :returns: dictionary with user detail
+        :raises NoneFoundError: no such user
         """
-        data = requests.get(self.BASE_URL + '/user/' + str(uid), auth=(NAME, PASS))
-        if data.ok:
-            return self.__parse_user(data.text)[0]
-        raise Exception(data.text)
+        user = self.users.get(uid)
+        if user is None:
+            raise NoneFoundError('no user {}'.format(uid))
+        return user
 
     def get_users(self, uids: list) -> list:
         """
         GET /api/0.6/users?users=#id1,#id2,...,#idn
+        served from the user directory, missing users are requested in chunks
 
         :param uids: uid in a list
-        :returns: list of dictionary with user detail
+        :returns: list of dictionary with user detail in the order of uids, unknown users are left out
         """
-        data = requests.get(self.BASE_URL + '/users?users=' + ','.join(map(str, uids)), auth=(NAME, PASS))
+        users = self.users.get_many(uids)
+        return [users[uid] for uid in dict.fromkeys(map(int, uids)) if uid in users]
+
+    def __get_users_chunk(self, uids: list) -> list:
+        data = self.transport.get(self.BASE_URL + '/users', params={'users': ','.join(map(str, uids))})
         if data.ok:
             logger.debug(data.text)
-            return self.__parse_user(data.text)
+            return self.__build(data, osm_parser.parse_user, self.__xml(data))
+        elif data.status_code == HTTPStatus.NOT_FOUND:
+            return []
+        elif data.status_code == HTTPStatus.BAD_REQUEST:
+            raise ValueError(data.text)
         raise Exception(data.text)
 
-    def __parse_user(self, xml: str) -> list:
-        tree = ElemTree.fromstring(xml)
-        users = []
-        for user in tree.findall('user'):
-            users.append({'uid': user.get('id'),
-                          'name': user.get('display_name'),
-                          'cr_date': user.get('account_created'),
-                          'description': user.find('description').text,
-                          'terms': bool(user.find('contributor-terms').get('agreed')),
-                          'changeset_count': int(user.find('changesets').get('count')),
-                          'traces_count': int(user.find('traces').get('count'))})
-        return users
-
     def get_own_preferences(self) -> dict:
         """
         GET /api/0.6/user/preferences
@@ -497,38 +799,31 @@ class OsmApi(a_osm_api.OsmApi):
 
     ''' notes '''
 
-    def __parse_notes(self, tree: ElemTree.Element):
-        lst = []
-        for item in tree.findall('note'):
-            lon = item.get('lon')
-            lat = item.get('lat')
-            nid = item.find('id').text
-            created = dateutil.parser.parse(item.find('date_created').text)
-            is_open = item.find('status').text
-            if not is_open == 'closed':
-                is_open = True
-            else:
-                is_open = False
-            comments = []
-            for comment in item.findall('comments/comment'):
-                created = comment.find('date').text
-                uid = comment.find('uid').text
-                user = comment.find('user').text
-                text = comment.find('text').text
-                action = comment.find('action').text
-                comments.append(Comment(text, uid, user, created, action))
-            lst.append(Note(nid, lat, lon, created, is_open, comments))
-        return lst
-
     def get_notes_bbox(self, bbox: tuple, limit: int = 100, closed: int = 7) -> list:
         """
-        GET /api/0.6/notes?bbox=left,bottom,right,top
-        """
-        data = requests.get(self.BASE_URL + '/notes?bbox=' + ','.join(map(str, bbox)), auth=(NAME, PASS))
+        GET /api/0.6/notes?bbox=left,bottom,right,top&limit=&closed=
+        bbox is snapped to the tile cache, only missing or stale tiles are downloaded
+
+        :param limit: max notes, 1-10000
+        :param closed: max days closed -1=all, 0=only_open
+        :returns: the limit most recently updated notes, newest first like the API
+        """
+        tiles = self.__tiled(('notes', limit, closed), bbox, lambda tile: self.__get_notes(tile, limit, closed))
+        if tiles is None:
+            return self.flight.do(('notes', tuple(bbox), limit, closed), self.__get_notes, bbox, limit, closed,
+                                  share=copy.deepcopy)
+        # each tile holds its limit newest notes, so the limit newest of their union are the ones of bbox
+        notes = merge_located(tiles, bbox, key=lambda note: note.id)
+        notes.sort(key=lambda note: note.updated or OSM_EPOCH, reverse=True)
+        return notes[:limit]
+
+    def __get_notes(self, bbox: tuple, limit: int, closed: int) -> list:
+        data = self.transport.get(self.BASE_URL + '/notes',
+                                  params={'bbox': ','.join(map(str, bbox)), 'limit': limit, 'closed': closed})
         logger.debug(data.text)
         if data.ok:
-            tree = ElemTree.fromstring(data.text)
-            return self.__parse_notes(tree)
+            tree = self.__xml(data)
+            return self.__build(data, osm_parser.parse_notes, tree)
         elif data.status_code == HTTPStatus.BAD_REQUEST:
             raise ValueError(data.text)
         raise Exception(data.text)
@@ -536,12 +831,16 @@ class OsmApi(a_osm_api.OsmApi):
     def get_note(self, nid: int) -> Note:
         """
         GET /api/0.6/notes/#id
+        concurrent calls for the same note share one request
         """
-        data = requests.get(self.BASE_URL + '/notes/{}'.format(str(nid)), auth=(NAME, PASS))
+        return self.flight.do(('note', int(nid)), self.__get_note, nid, share=copy.deepcopy)
+
+    def __get_note(self, nid: int) -> Note:
+        data = self.transport.get(self.BASE_URL + '/notes/{}'.format(str(nid)))
         logger.debug(data.text)
         if data.ok:
-            tree = ElemTree.fromstring(data.text)
-            return self.__parse_notes(tree)[0]
+            tree = self.__xml(data)
+            return self.__build(data, osm_parser.parse_notes, tree)[0]
         elif data.status_code == HTTPStatus.BAD_REQUEST:
             raise ValueError(data.text)
         raise Exception(data.text)
@@ -550,11 +849,12 @@ class OsmApi(a_osm_api.OsmApi):
         """
         POST /api/0.6/notes?lat=<lat>&lon=<lon>&text=<ANote>
         """
-        data = requests.post(self.BASE_URL + '/notes', params={'lat': lat, 'lon': lon, 'text': text}, auth=(NAME, PASS))
+        data = self.transport.post(self.BASE_URL + '/notes', params={'lat': lat, 'lon': lon, 'text': text})
         logger.debug(data.text)
+        self.tiles.invalidate('notes', lat, lon)
         if data.ok:
-            tree = ElemTree.fromstring(data.text)
-            return self.__parse_notes(tree)[0]
+            tree = self.__xml(data)
+            return self.__build(data, osm_parser.parse_notes, tree)[0]
         elif data.status_code == HTTPStatus.BAD_REQUEST:
             raise ValueError(data.text)
         raise Exception(data.text)
@@ -563,12 +863,14 @@ class OsmApi(a_osm_api.OsmApi):
         """
         POST /api/0.6/notes/#id/comment?text=<ANoteComment>
         """
-        data = requests.post(self.BASE_URL + '/notes/{}/comment'.format(str(nid)),
-                             params={'text': text}, auth=(NAME, PASS))
+        data = self.transport.post(self.BASE_URL + '/notes/{}/comment'.format(str(nid)),
+                                   params={'text': text})
         logger.debug(data.text)
         if data.ok:
-            tree = ElemTree.fromstring(data.text)
-            return self.__parse_notes(tree)[0]
+            tree = self.__xml(data)
+            note = self.__build(data, osm_parser.parse_notes, tree)[0]
+            self.tiles.invalidate('notes', note.lat, note.lon)
+            return note
         elif data.status_code == HTTPStatus.BAD_REQUEST:
             raise ValueError(data.text)
         elif data.status_code == HTTPStatus.NOT_FOUND:
@@ -581,12 +883,14 @@ class OsmApi(a_osm_api.OsmApi):
         """
         POST /api/0.6/notes/#id/close?text=<Comment>
         """
-        data = requests.post(self.BASE_URL + '/notes/{}/close'.format(str(nid)),
-                             params={'text': text}, auth=(NAME, PASS))
+        data = self.transport.post(self.BASE_URL + '/notes/{}/close'.format(str(nid)),
+                                   params={'text': text})
         logger.debug(data.text)
         if data.ok:
-            tree = ElemTree.fromstring(data.text)
-            return self.__parse_notes(tree)[0]
+            tree = self.__xml(data)
+            note = self.__build(data, osm_parser.parse_notes, tree)[0]
+            self.tiles.invalidate('notes', note.lat, note.lon)
+            return note
         elif data.status_code == HTTPStatus.BAD_REQUEST:
             raise ValueError(data.text)
         elif data.status_code == HTTPStatus.NOT_FOUND:
@@ -599,12 +903,14 @@ class OsmApi(a_osm_api.OsmApi):
         """
         POST /api/0.6/notes/#id/reopen?text=<ANoteComment>
         """
-        data = requests.post(self.BASE_URL + '/notes/{}/close'.format(str(nid)),
-                             params={'text': text}, auth=(NAME, PASS))
+        data = self.transport.post(self.BASE_URL + '/notes/{}/reopen'.format(str(nid)),
+                                   params={'text': text})
         logger.debug(data.text)
         if data.ok:
-            tree = ElemTree.fromstring(data.text)
-            return self.__parse_notes(tree)[0]
+            tree = self.__xml(data)
+            note = self.__build(data, osm_parser.parse_notes, tree)[0]
+            self.tiles.invalidate('notes', note.lat, note.lon)
+            return note
         elif data.status_code == HTTPStatus.NOT_FOUND:
             raise NoneFoundError(data.text)
         elif data.status_code == HTTPStatus.CONFLICT:
@@ -643,17 +949,165 @@ class OsmApi(a_osm_api.OsmApi):
         """
         raise NotImplementedError
 
-    def __kv_parser(self, lst: list) -> dict:
+    ''' tile cache '''
+
+    def __tiled(self, kind, bbox: tuple, fetch):
         """
-        :param lst: list of tags form <tag k="some" v="value"/>
-        :return: dictionary of key value pairs
+        :param kind: cache key of the resource and its parameters
+        :param fetch: callable downloading the items of one tile bbox
+        :returns: list of item lists, one per tile touched by bbox, None if bbox is not snapped
         """
-        tags = {}
-        for item in lst:
-            tags[item.get('k')] = item.get('v')
-        return tags
+        tiles = self.tiles.tiles(bbox)
+        if not tiles:
+            return None
+        results = {tile: self.tiles.get(kind, tile) for tile in tiles}
+        missing = [tile for tile, items in results.items() if items is None]
+
+        def fetch_tile(tile: tuple) -> list:
+            # callers hitting the same missing tile share its download
+            return self.flight.do((kind, tile), fetch, self.tiles.tile_bbox(tile))
+
+        if len(missing) > 1:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(missing))) as pool:
+                fetched = list(pool.map(fetch_tile, missing))
+        else:
+            fetched = [fetch_tile(tile) for tile in missing]
+        for tile, items in zip(missing, fetched):
+            self.tiles.put(kind, tile, items)
+            results[tile] = items
+        return list(results.values())
+
+    def __invalidate_tiles(self, elem: Element, create: bool = False):
+        """
+        drops cached map tiles an edit of elem makes stale
+        for a node the tiles at its new and its old position, the old one is taken from the element cache,
+        so this is called before the cache entry is invalidated. /map returns all nodes of the ways in a bbox,
+        tiles holding a copy of the node elsewhere are dropped too.
+        all map tiles if a position is unknown and for ways and relations.
+
+        :param create: elem is new, no tile holds an old version of it
+        """
+        old = None if create else self.cache.get(elem.type, elem.id)
+        if not isinstance(elem, Node) or elem.lat is None or not (create or isinstance(old, Node)):
+            self.tiles.invalidate('map')
+            return
+        self.tiles.invalidate('map', elem.lat, elem.lon)
+        if not create:
+            self.tiles.invalidate('map', old.lat, old.lon)
+            self.tiles.invalidate('map', match=lambda items: any(
+                isinstance(item, Node) and item.id == elem.id for item in items))
+
+    ''' metrics '''
+
+    def __xml(self, data) -> ElemTree.Element:
+        """
+        parses a response body, timed as parse phase of its endpoint
+        """
+        with self.metrics.time('parse', data.url):
+            return osm_parser.fromstring(data.content)
+
+    def __iter_timed(self, data, parse, chunk_size: int):
+        """
+        yields what parse yields for the streamed body of response data.
+        the time spent in parse is recorded as stream phase, without waiting for the body as parse phase,
+        the time the caller holds the generator is not counted
+        """
+        body = data.iter_content(chunk_size)
+        waited = spent = 0.0
+
+        def chunks():
+            nonlocal waited
+            while True:
+                start = time.perf_counter()
+                chunk = next(body, None)
+                waited += time.perf_counter() - start
+                if chunk is None:
+                    return
+                yield chunk
+
+        items = parse(chunks())
+        try:
+            while True:
+                start = time.perf_counter()
+                item = next(items, None)
+                spent += time.perf_counter() - start
+                if item is None:
+                    return
+                yield item
+        finally:
+            self.metrics.observe('stream', data.url, spent)
+            self.metrics.observe('parse', data.url, spent - waited)
+
+    def __build(self, data, build, *args):
+        """
+        calls build with args, timed as build phase of the endpoint of response data
+        """
+        with self.metrics.time('build', data.url):
+            return build(*args)
+
+
+def credentials() -> tuple:
+    """
+    :returns: (username, password) from the environment variables OSM_USERNAME and OSM_PASSWORD
+    :raises AuthError: one of them is not set
+    """
+    try:
+        return os.environ['OSM_USERNAME'], os.environ['OSM_PASSWORD']
+    except KeyError:
+        raise AuthError('no "OSM_USERNAME" or "OSM_PASSWORD" in environment variables') from None
+
+
+def map_error(text: str) -> ValueError:
+    """
+    :param text: body of a HTTP 400 response of GET /map
+    :returns: AreaRefusedError if the area is refused as too large or too dense, else ValueError
+    """
+    if 'too many nodes' in text or 'maximum bbox size' in text:
+        return AreaRefusedError(text)
+    return ValueError(text)
+
+
+def changeset_params(bbox: tuple, user: str, is_open: bool, is_closed: bool) -> dict:
+    """
+    :returns: query parameters of GET /changesets without time window
+    """
+    params = {}
+    if bbox:
+        params['bbox'] = ','.join(map(str, bbox))
+    if user:
+        params['user' if str(user).isdigit() else 'display_name'] = user
+    if is_open and not is_closed:
+        params['open'] = 'true'
+    elif is_closed and not is_open:
+        params['closed'] = 'true'
+    return params
+
+
+def changeset_window(params: dict, time1: datetime, time2: datetime) -> dict:
+    """
+    :returns: params with the time window closed after time1 and created before time2
+    """
+    if time2 is not None:
+        return dict(params, time='{},{}'.format(_api_time(time1 or OSM_EPOCH), _api_time(time2)))
+    if time1 is not None:
+        return dict(params, time=_api_time(time1))
+    return params
+
+
+def next_window_end(page: list, fresh: list) -> datetime:
+    """
+    :param page: a full page of changesets
+    :param fresh: changesets of page not seen before
+    :returns: end of the time window of the following page
+    """
+    oldest = min(changeset.created for changeset in page)
+    if fresh:  # changesets created in the same second as the oldest one may be missing, ask again for them
+        return oldest + timedelta(seconds=1)
+    return oldest  # a whole page within one second, skip the rest of it
+
+
+def _api_time(value: datetime) -> str:
+    if value.tzinfo:
+        value = value.astimezone(timezone.utc)
+    return value.strftime('%Y-%m-%dT%H:%M:%SZ')
 
-    def __kv_serial(self, tags: dict, parent: ElemTree.Element) -> list:
-        lst = []
-        for key, value in tags.items():
-            ElemTree.SubElement(parent, 'tag', {'k': key, 'v': value})
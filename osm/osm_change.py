@@ -0,0 +1,87 @@
+from osm.osm_util import Element, Way, Relation
+
+TYPE_ORDER = {'node': 0, 'way': 1, 'relation': 2}
+
+
+class OsmChange:
+    """
+    collects creates, modifies and deletes to be uploaded as one osmChange document
+    new elements get negative placeholder ids, which can be referenced by ways and relations of the same batch
+    """
+
+    def __init__(self):
+        self.creates = []
+        self.modifies = []
+        self.deletes = []
+        self.if_unused = False
+        self._next_id = -1
+
+    def create(self, elem: Element) -> int:
+        """
+        :returns: placeholder id of the new element, replaced by the real id after upload
+        """
+        if elem.id is None or int(elem.id) >= 0:
+            elem._id = self._next_id
+            self._next_id -= 1
+        self.creates.append(elem)
+        return elem.id
+
+    def modify(self, elem: Element):
+        self.modifies.append(elem)
+
+    def delete(self, elem: Element, if_unused: bool = False):
+        """
+        :param if_unused: let the server skip elements still used by others instead of failing
+        """
+        self.deletes.append(elem)
+        self.if_unused = self.if_unused or if_unused
+
+    def apply_diff(self, diff: list) -> list:
+        """
+        maps a parsed diffResult back onto the collected elements
+        new ids, versions and placeholder references in ways and relations get updated
+
+        :param diff: list of (type, old_id, new_id, new_version)
+        :returns: all uploaded elements in diffResult order
+        """
+        elems = {}
+        for elem in self.creates + self.modifies + self.deletes:
+            elems[(elem.type, int(elem.id))] = elem
+        new_ids = {}
+        result = []
+        for etype, old_id, new_id, new_version in diff:
+            elem = elems.get((etype, old_id))
+            if elem is None:
+                continue
+            if new_id is None:
+                elem.visible = False
+            else:
+                if new_id != old_id:
+                    new_ids[(etype, old_id)] = new_id
+                    elem._id = new_id
+                elem.version = new_version
+            result.append(elem)
+        for elem in self.creates + self.modifies:
+            if isinstance(elem, Way):
+                elem.nodes = [new_ids.get(('node', ref), ref) for ref in elem.nodes]
+            elif isinstance(elem, Relation):
+                for member in elem.members:
+                    key = (member['type'], int(member['ref']))
+                    if key in new_ids:
+                        member['ref'] = new_ids[key]
+        return result
+
+    def ordered_creates(self) -> list:
+        """
+        :returns: new elements, nodes before ways before relations, so references resolve
+        """
+        return sorted(self.creates, key=lambda elem: TYPE_ORDER[elem.type])
+
+    def ordered_deletes(self) -> list:
+        """
+        :returns: deleted elements, relations before ways before nodes, so nothing is still in use
+        """
+        return sorted(self.deletes, key=lambda elem: -TYPE_ORDER[elem.type])
+
+    def __len__(self):
+        return len(self.creates) + len(self.modifies) + len(self.deletes)
@@ -0,0 +1,272 @@
+'''
+Columnar representation of map downloads, requires numpy
+
+nodes are held as parallel arrays, ways and relations as CSR structures
+(offsets into one flat array) and tags as (owner, key, value) tables,
+so geometric work runs vectorized instead of looping over Node objects.
+'''
+
+from array import array
+from osm import osm_parser
+import numpy as np
+from osm.osm_util import EARTH_RAD
+
+TYPES = ('node', 'way', 'relation')
+
+
+class TagTable:
+    """
+    all tags of one element type, owner is the index of the element in its id array
+    """
+
+    def __init__(self, owner: np.ndarray, keys: np.ndarray, values: np.ndarray):
+        self.owner = owner
+        self.keys = keys
+        self.values = values
+
+    def column(self, key: str, size: int) -> np.ndarray:
+        """
+        :param size: number of elements of this type
+        :returns: object array with the value of key per element, None where missing
+        """
+        col = np.full(size, None, dtype=object)
+        hit = self.keys == key
+        col[self.owner[hit]] = self.values[hit]
+        return col
+
+    def has(self, key: str, size: int, value: str = None) -> np.ndarray:
+        """
+        :returns: bool mask of elements having key (with this value if given)
+        """
+        hit = self.keys == key
+        if value is not None:
+            hit &= self.values == value
+        mask = np.zeros(size, dtype=bool)
+        mask[self.owner[hit]] = True
+        return mask
+
+    def __len__(self):
+        return len(self.owner)
+
+
+class ColumnarMap:
+    """
+    columnar result of GET /api/0.6/map
+
+    node_ids, lat, lon: one entry per node
+    way_ids, way_offsets, way_nodes: nodes of way i are node indices way_nodes[way_offsets[i]:way_offsets[i + 1]],
+        -1 for nodes outside the download
+    relation_ids, relation_offsets, member_type, member_ref, member_role: members as CSR,
+        member_type is the index in TYPES
+    tags: element type -> TagTable
+    """
+
+    def __init__(self, node_ids, lat, lon, way_ids, way_offsets, way_nodes,
+                 relation_ids, relation_offsets, member_type, member_ref, member_role, tags: dict):
+        self.node_ids = node_ids
+        self.lat = lat
+        self.lon = lon
+        self.way_ids = way_ids
+        self.way_offsets = way_offsets
+        self.way_nodes = way_nodes
+        self.relation_ids = relation_ids
+        self.relation_offsets = relation_offsets
+        self.member_type = member_type
+        self.member_ref = member_ref
+        self.member_role = member_role
+        self.tags = tags
+
+    @classmethod
+    def from_xml(cls, chunks):
+        """
+        builds the columns while parsing an <osm> document incrementally
+
+        :param chunks: iterable of bytes, e.g. a streamed response body
+        """
+        node_ids, lat, lon = array('q'), array('d'), array('d')
+        way_ids, way_offsets, way_refs = array('q'), array('q', [0]), array('q')
+        rel_ids, rel_offsets = array('q'), array('q', [0])
+        member_type, member_ref, member_role = array('b'), array('q'), []
+        tag_owner = {etype: array('q') for etype in TYPES}
+        tag_key = {etype: [] for etype in TYPES}
+        tag_value = {etype: [] for etype in TYPES}
+        type_index = {etype: i for i, etype in enumerate(TYPES)}
+
+        parser = osm_parser.pull_parser()
+        root = None
+        current = None
+        for chunk in chunks:
+            parser.feed(chunk)
+            for event, elem in parser.read_events():
+                tag = elem.tag
+                if event == 'start':
+                    if root is None:
+                        root = elem
+                    elif tag == 'node':
+                        current = 'node'
+                        node_ids.append(int(elem.get('id')))
+                        lat.append(float(elem.get('lat')))
+                        lon.append(float(elem.get('lon')))
+                    elif tag == 'way':
+                        current = 'way'
+                        way_ids.append(int(elem.get('id')))
+                    elif tag == 'relation':
+                        current = 'relation'
+                        rel_ids.append(int(elem.get('id')))
+                    elif tag == 'nd':
+                        way_refs.append(int(elem.get('ref')))
+                    elif tag == 'member':
+                        member_type.append(type_index[elem.get('type')])
+                        member_ref.append(int(elem.get('ref')))
+                        member_role.append(elem.get('role'))
+                    elif tag == 'tag' and current:
+                        owner = {'node': node_ids, 'way': way_ids, 'relation': rel_ids}[current]
+                        tag_owner[current].append(len(owner) - 1)
+                        tag_key[current].append(elem.get('k'))
+                        tag_value[current].append(elem.get('v'))
+                elif tag in TYPES:
+                    if tag == 'way':
+                        way_offsets.append(len(way_refs))
+                    elif tag == 'relation':
+                        rel_offsets.append(len(member_ref))
+                    current = None
+                    root.clear()
+        parser.close()
+
+        node_ids = np.frombuffer(node_ids, dtype=np.int64).copy()
+        tags = {etype: TagTable(np.frombuffer(tag_owner[etype], dtype=np.int64).copy(),
+                                np.array(tag_key[etype], dtype=object), np.array(tag_value[etype], dtype=object))
+                for etype in TYPES}
+        return cls(node_ids, np.frombuffer(lat, dtype=np.float64).copy(), np.frombuffer(lon, dtype=np.float64).copy(),
+                   np.frombuffer(way_ids, dtype=np.int64).copy(), np.frombuffer(way_offsets, dtype=np.int64).copy(),
+                   node_index(node_ids, np.frombuffer(way_refs, dtype=np.int64)),
+                   np.frombuffer(rel_ids, dtype=np.int64).copy(), np.frombuffer(rel_offsets, dtype=np.int64).copy(),
+                   np.frombuffer(member_type, dtype=np.int8).copy(), np.frombuffer(member_ref, dtype=np.int64).copy(),
+                   np.array(member_role, dtype=object), tags)
+
+    ''' nodes '''
+
+    def node_mask(self, bbox: tuple) -> np.ndarray:
+        """
+        :param bbox: (minlon, minlat, maxlon, maxlat)
+        :returns: bool mask of nodes inside bbox
+        """
+        min_lon, min_lat, max_lon, max_lat = bbox
+        return (self.lon >= min_lon) & (self.lon <= max_lon) & (self.lat >= min_lat) & (self.lat <= max_lat)
+
+    def distances(self, lat: float, lon: float) -> np.ndarray:
+        """
+        :returns: distance in meters of every node to (lat, lon)
+        """
+        return haversine(lat, lon, self.lat, self.lon)
+
+    def nearest_nodes(self, lat: float, lon: float, k: int = 1) -> np.ndarray:
+        """
+        :returns: indices of the k nearest nodes, nearest first
+        """
+        dist = self.distances(lat, lon)
+        k = min(k, len(dist))
+        if not k:
+            return np.empty(0, dtype=np.int64)
+        nearest = np.argpartition(dist, k - 1)[:k]
+        return nearest[np.argsort(dist[nearest])]
+
+    ''' ways '''
+
+    def way_geometry(self, i: int) -> tuple:
+        """
+        :param i: way index
+        :returns: (lat, lon) arrays of the way, NaN for nodes outside the download
+        """
+        idx = self.way_nodes[self.way_offsets[i]:self.way_offsets[i + 1]]
+        return self.__gather(self.lat, idx), self.__gather(self.lon, idx)
+
+    def way_lengths(self) -> np.ndarray:
+        """
+        :returns: length of every way in meters, segments with nodes outside the download count as 0
+        """
+        lat = self.__gather(self.lat, self.way_nodes)
+        lon = self.__gather(self.lon, self.way_nodes)
+        seg = np.nan_to_num(haversine(lat[:-1], lon[:-1], lat[1:], lon[1:]))
+        inner = self.way_offsets[1:-1]
+        inner = inner[(inner > 0) & (inner < len(self.way_nodes))]
+        seg[inner - 1] = 0  # no segments between consecutive ways
+        total = np.concatenate(([0.0], np.cumsum(seg)))
+        start = self.way_offsets[:-1]
+        end = np.maximum(self.way_offsets[1:] - 1, start)
+        return total[end] - total[start]
+
+    def way_bboxes(self) -> np.ndarray:
+        """
+        :returns: (n_ways, 4) array of (minlon, minlat, maxlon, maxlat), NaN for ways without known nodes
+        """
+        lat = self.__gather(self.lat, self.way_nodes)
+        lon = self.__gather(self.lon, self.way_nodes)
+        result = np.full((len(self.way_ids), 4), np.nan)
+        filled = self.way_offsets[1:] > self.way_offsets[:-1]
+        if filled.any():
+            start = self.way_offsets[:-1][filled]
+            result[filled, 0] = np.fmin.reduceat(lon, start)
+            result[filled, 1] = np.fmin.reduceat(lat, start)
+            result[filled, 2] = np.fmax.reduceat(lon, start)
+            result[filled, 3] = np.fmax.reduceat(lat, start)
+        return result
+
+    def ways_in_bbox(self, bbox: tuple) -> np.ndarray:
+        """
+        :returns: indices of ways with minimum one node inside bbox
+        """
+        inside = np.zeros(len(self.way_nodes), dtype=bool)
+        known = self.way_nodes >= 0
+        inside[known] = self.node_mask(bbox)[self.way_nodes[known]]
+        hits = np.concatenate(([0], np.cumsum(inside)))
+        return np.nonzero(hits[self.way_offsets[1:]] > hits[self.way_offsets[:-1]])[0]
+
+    ''' tags '''
+
+    def tag_column(self, etype: str, key: str) -> np.ndarray:
+        """
+        :returns: object array with the value of key for every element of etype, None where missing
+        """
+        return self.tags[etype].column(key, self.__count(etype))
+
+    def tag_mask(self, etype: str, key: str, value: str = None) -> np.ndarray:
+        """
+        :returns: bool mask of elements of etype having key (with this value if given)
+        """
+        return self.tags[etype].has(key, self.__count(etype), value)
+
+    def __count(self, etype: str) -> int:
+        return len({'node': self.node_ids, 'way': self.way_ids, 'relation': self.relation_ids}[etype])
+
+    @staticmethod
+    def __gather(values: np.ndarray, idx: np.ndarray) -> np.ndarray:
+        out = np.full(len(idx), np.nan)
+        known = idx >= 0
+        out[known] = values[idx[known]]
+        return out
+
+    def __len__(self):
+        return len(self.node_ids) + len(self.way_ids) + len(self.relation_ids)
+
+
+def node_index(node_ids: np.ndarray, refs: np.ndarray) -> np.ndarray:
+    """
+    :returns: index of every ref in node_ids, -1 if the node is not present
+    """
+    if not len(node_ids):
+        return np.full(len(refs), -1, dtype=np.int64)
+    order = np.argsort(node_ids, kind='stable')
+    pos = np.searchsorted(node_ids[order], refs)
+    pos = np.minimum(pos, len(order) - 1)
+    idx = order[pos]
+    return np.where(node_ids[idx] == refs, idx, -1)
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """
+    vectorized great circle distance in meters
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RAD * np.arcsin(np.sqrt(a))
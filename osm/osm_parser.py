@@ -0,0 +1,390 @@
+'''
+XML parsing and serialisation of OSM API documents
+shared by the blocking and the asyncio OsmApi implementation
+'''
+
+import sys
+import importlib.util
+import xml.etree.ElementTree as ElemTree
+from osm.osm_util import Element, Node, Way, Relation, Comment, Note, ChangeSet, parse_time
+from osm.osm_change import OsmChange
+
+BACKENDS = ('lxml', 'stdlib')
+_backend = None  # chosen at the first parse, lxml is imported only when it is used
+_LXML_OPTIONS = {'resolve_entities': False, 'no_network': True, 'remove_comments': True, 'remove_pis': True}
+
+
+def available_backends() -> list:
+    """
+    :returns: BACKENDS usable in this environment
+    """
+    return [name for name in BACKENDS if name != 'lxml' or importlib.util.find_spec('lxml') is not None]
+
+
+def use_backend(name: str):
+    """
+    selects the XML parser for all following parsing
+
+    :param name: one of BACKENDS
+    :raises ValueError: unknown backend
+    :raises ImportError: lxml is not installed
+    """
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError('unknown parser backend {}'.format(name))
+    if name not in available_backends():
+        raise ImportError('the lxml backend requires lxml')
+    _backend = name
+
+
+def backend() -> str:
+    """
+    :returns: name of the XML parser in use, lxml if it is installed and no other was selected
+    """
+    global _backend
+    if _backend is None:
+        _backend = available_backends()[0]
+    return _backend
+
+
+def fromstring(data):
+    """
+    parses a whole document with the selected backend
+    external entities are never resolved, comments and processing instructions are dropped
+
+    :param data: XML as bytes or str
+    :returns: root element, both backends provide the ElementTree API
+    """
+    if backend() == 'lxml':
+        from lxml import etree
+
+        if isinstance(data, str):
+            data = data.encode()
+        return etree.fromstring(data, etree.XMLParser(**_LXML_OPTIONS))
+    return ElemTree.fromstring(data)
+
+
+def pull_parser(events: tuple = ('start', 'end')):
+    """
+    :returns: incremental parser of the selected backend, providing feed, read_events and close
+    """
+    if backend() == 'lxml':
+        from lxml import etree
+
+        return etree.XMLPullParser(events, **_LXML_OPTIONS)
+    return ElemTree.XMLPullParser(events)
+
+
+def parse_elem(elem: ElemTree.Element):
+    """
+    builds a Node, Way or Relation in one pass over the children of elem
+    """
+    tag = elem.tag
+    tags = {}
+    nodes = []
+    members = []
+    for child in elem:
+        child_tag = child.tag
+        if child_tag == 'nd':
+            nodes.append(child.get('ref'))
+        elif child_tag == 'tag':
+            tags[sys.intern(child.get('k'))] = child.get('v')
+        elif child_tag == 'member':
+            member = dict(child.attrib)
+            member['ref'] = int(member['ref'])
+            members.append(member)
+
+    get = elem.get
+    eid = get('id')
+    version = int(get('version'))
+    changeset = get('changeset')
+    cr_date = get('timestamp')
+    user = _intern(get('user'))
+    uid = get('uid')
+    visible = get('visible') != 'false'
+    if tag == 'node':
+        return Node(eid, get('lat'), get('lon'), version, changeset, user, uid, cr_date, visible, tags)
+    elif tag == 'way':
+        return Way(eid, nodes, version, changeset, user, uid, cr_date, visible, tags)
+    elif tag == 'relation':
+        return Relation(eid, members, version, changeset, user, uid, cr_date, visible, tags)
+    return elem
+
+
+def parse_elems(tree: ElemTree.Element) -> list:
+    """
+    :param tree: <osm> root
+    :returns: all elements directly below the root, other children like <bounds> are skipped
+    """
+    return [parse_elem(sub) for sub in tree if sub.tag in ('node', 'way', 'relation')]
+
+
+def iter_elems(chunks) -> iter:
+    """
+    incrementally parses an <osm> document and yields its elements one by one
+    every element subtree is dropped from the document as soon as it is parsed.
+
+    :param chunks: iterable of bytes, e.g. a streamed response body
+    :returns: generator of Node, Way and Relation
+    """
+    parser = pull_parser()
+    root = None
+    for chunk in chunks:
+        parser.feed(chunk)
+        for event, elem in parser.read_events():
+            if event == 'start':
+                if root is None:
+                    root = elem
+            elif elem.tag in ('node', 'way', 'relation'):
+                yield parse_elem(elem)
+                root.clear()
+    parser.close()
+
+
+def serial_elem(elem: Element, is_create: bool = False) -> str:
+    if not is_create:
+        params = {'id': elem.id, 'version': elem.version, 'changeset': elem.changeset, 'user': elem.user,
+                  'uid': elem.uid, 'visible': str(elem.visible).lower(), 'timestamp': elem.created}
+    else:
+        params = {'changeset': elem.changeset}
+    return '<osm>{}</osm>'.format(elem_xml(elem, params))
+
+
+def serial_change(change: OsmChange, cid: int) -> bytes:
+    """
+    :returns: osmChange document of all collected elements, assigned to changeset cid
+    """
+    return b''.join(iter_change(change, cid))
+
+
+def iter_change(change: OsmChange, cid: int, batch_size: int = 500):
+    """
+    writes the osmChange document of all collected elements incrementally, assigned to changeset cid
+    no tree is built, memory is bound by batch_size elements
+
+    :param batch_size: elements per yielded chunk
+    :returns: generator of bytes
+    """
+    buf = ['<osmChange version="0.6" generator="osmate">']
+    actions = (('create', change.ordered_creates()), ('modify', change.modifies), ('delete', change.ordered_deletes()))
+    for action, elems in actions:
+        if not elems:
+            continue
+        attrib = {'if-unused': 'true'} if action == 'delete' and change.if_unused else {}
+        buf.append('<{}{}>'.format(action, _attrs(attrib)))
+        for elem in elems:
+            elem.changeset = cid
+            params = {'id': elem.id, 'changeset': cid}
+            if action != 'create':
+                params['version'] = elem.version
+            buf.append(elem_xml(elem, params))
+            if len(buf) >= batch_size:
+                yield ''.join(buf).encode()
+                buf = []
+        buf.append('</{}>'.format(action))
+    buf.append('</osmChange>')
+    yield ''.join(buf).encode()
+
+
+class ChangeBody:
+    """
+    chunked request body of an osmChange upload
+    every iteration writes the document anew, so a retried request sends it again in full.
+    """
+
+    def __init__(self, change: OsmChange, cid: int, batch_size: int = 500):
+        self.change = change
+        self.cid = cid
+        self.batch_size = batch_size
+        self.size = 0  # bytes written by the last iteration
+
+    def __iter__(self):
+        self.size = 0
+        for chunk in iter_change(self.change, self.cid, self.batch_size):
+            self.size += len(chunk)
+            yield chunk
+
+
+def elem_xml(elem: Element, params: dict) -> str:
+    """
+    :param params: attributes of the element tag, lat and lon of nodes are added
+    :returns: the element as XML text
+    """
+    children = []
+    if isinstance(elem, Node):
+        tag = 'node'
+        params['lat'] = elem.lat
+        params['lon'] = elem.lon
+    elif isinstance(elem, Way):
+        tag = 'way'
+        children = ['<nd ref="{}"/>'.format(ref) for ref in elem.nodes]
+    elif isinstance(elem, Relation):
+        tag = 'relation'
+        children = ['<member{}/>'.format(_attrs(member)) for member in elem.members]
+    else:
+        tag = 'None'
+    children += ['<tag k="{}" v="{}"/>'.format(_escape(key), _escape(value)) for key, value in elem.tags.items()]
+    if children:
+        return '<{}{}>{}</{}>'.format(tag, _attrs(params), ''.join(children), tag)
+    return '<{}{}/>'.format(tag, _attrs(params))
+
+
+_ESCAPES = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;',
+                          '\n': '&#10;', '\r': '&#13;', '\t': '&#09;'})
+
+
+def _escape(value) -> str:
+    return str(value).translate(_ESCAPES)
+
+
+def _attrs(params: dict) -> str:
+    """
+    :returns: params as XML attributes, None values are left out
+    """
+    return ''.join(' {}="{}"'.format(key, _escape(value)) for key, value in params.items() if value is not None)
+
+
+def parse_diff_result(xml) -> list:
+    """
+    :param xml: diffResult document, as text or parsed root
+    :returns: list of (type, old_id, new_id, new_version), new_id and new_version are None for deleted elements
+    """
+    tree = _tree(xml)
+    diff = []
+    for item in tree:
+        new_id = item.get('new_id')
+        new_version = item.get('new_version')
+        diff.append((item.tag, int(item.get('old_id')), int(new_id) if new_id is not None else None,
+                     int(new_version) if new_version is not None else None))
+    return diff
+
+
+def serial_changeset(tags: dict) -> bytes:
+    children = ''.join('<tag k="{}" v="{}"/>'.format(_escape(key), _escape(value)) for key, value in tags.items())
+    return '<osm><changeset>{}</changeset></osm>'.format(children).encode()
+
+
+def parse_changeset(data) -> ChangeSet:
+    tree = _tree(data)
+    return _changeset(tree.find('changeset'))
+
+
+def parse_changesets(data) -> list:
+    """
+    :param data: response of GET /api/0.6/changesets, as text or parsed root
+    :returns: ChangeSets in response order, newest first
+    """
+    tree = _tree(data)
+    return [_changeset(cs_xml) for cs_xml in tree if cs_xml.tag == 'changeset']
+
+
+def _changeset(cs_xml: ElemTree.Element) -> ChangeSet:
+    tags = {}
+    comments = []
+    for child in cs_xml:
+        if child.tag == 'tag':
+            tags[sys.intern(child.get('k'))] = child.get('v')
+        elif child.tag == 'discussion':
+            for com in child:
+                if com.tag == 'comment':
+                    text = next((part.text for part in com if part.tag == 'text'), None)
+                    comments.append(Comment(text, com.get('uid'), com.get('user'), com.get('date')))
+    cs_prop = cs_xml.attrib
+    try:
+        bbox = cs_prop['max_lon'], cs_prop['max_lat'], cs_prop['min_lon'], cs_prop['min_lat']
+    except KeyError:
+        bbox = ()
+    closed = cs_prop.get('closed_at')
+    ch_set = ChangeSet(cs_prop['id'], cs_prop.get('user'), cs_prop.get('uid'),
+                       parse_time(cs_prop['created_at']), cs_prop.get('open') == 'true', bbox,
+                       parse_time(closed) if closed else None, tags, comments)
+    return ch_set
+
+
+def parse_gpx_info(xml) -> list:
+    tree = _tree(xml)
+    lst = []
+    for item in tree:
+        if item.tag != 'gpx_file':
+            continue
+        attrib = dict(item.attrib)
+        attrib['timestamp'] = str(parse_time(attrib['timestamp']))
+        for info in item:
+            attrib[info.tag] = info.text
+        lst.append(attrib)
+    return lst
+
+
+def parse_user(xml) -> list:
+    tree = _tree(xml)
+    users = []
+    for user in tree:
+        if user.tag != 'user':
+            continue
+        info = {'uid': user.get('id'),
+                'name': user.get('display_name'),
+                'cr_date': user.get('account_created'),
+                'description': None,
+                'terms': False,
+                'changeset_count': 0,
+                'traces_count': 0}
+        for child in user:
+            tag = child.tag
+            if tag == 'description':
+                info['description'] = child.text
+            elif tag == 'contributor-terms':
+                info['terms'] = child.get('agreed') == 'true'
+            elif tag == 'changesets':
+                info['changeset_count'] = int(child.get('count'))
+            elif tag == 'traces':
+                info['traces_count'] = int(child.get('count'))
+        users.append(info)
+    return users
+
+
+def parse_notes(tree: ElemTree.Element) -> list:
+    return [parse_note(item) for item in tree if item.tag == 'note']
+
+
+def parse_note(item: ElemTree.Element) -> Note:
+    """
+    builds a Note in one pass over the children of <note>
+    """
+    fields = {}
+    comments = []
+    for child in item:
+        if child.tag == 'comments':
+            comments = [_note_comment(comment) for comment in child if comment.tag == 'comment']
+        else:
+            fields[child.tag] = child.text
+    return Note(fields['id'], item.get('lat'), item.get('lon'), fields['date_created'],
+                fields.get('status') != 'closed', comments)
+
+
+def _note_comment(comment: ElemTree.Element) -> Comment:
+    fields = {child.tag: child.text for child in comment}
+    return Comment(fields.get('text'), fields.get('uid'), _intern(fields.get('user')), fields.get('date'),
+                   fields.get('action'))
+
+
+def _tree(xml) -> ElemTree.Element:
+    """
+    :param xml: XML text or an already parsed root
+    """
+    return fromstring(xml) if isinstance(xml, (str, bytes)) else xml
+
+
+def kv_parser(lst: list) -> dict:
+    """
+    :param lst: list of tags form <tag k="some" v="value"/>
+    :return: dictionary of key value pairs
+    """
+    tags = {}
+    for item in lst:
+        tags[sys.intern(item.get('k'))] = item.get('v')
+    return tags
+
+
+def _intern(value: str):
+    """ repeated strings like user names and tag keys are shared between elements """
+    return sys.intern(value) if value is not None else None
@@ -1,11 +1,17 @@
 import json
 import math
+from array import array
 from datetime import datetime
-import dateutil.parser
 
 OSM_URL = 'https://master.apis.dev.openstreetmap.org'
+EARTH_RAD = 6378000.0
+DEG_M = math.pi * EARTH_RAD / 180  # meters per degree latitude
+
 
 class Element:
+    __slots__ = ('_id', 'tags', 'version', 'changeset', 'user', 'uid', 'created', 'visible')
+    e_type = 'element'
+
     def __init__(self, eid: int, version: int, changeset: int,
                  user: str, uid: int, created: str, visible: bool, tags: dict):
         """
@@ -13,18 +19,17 @@ class Element:
         :param eid:
         :param tags:
         """
-        self._id = eid
+        self._id = to_int(eid)
         self.tags = tags or {}
-        self.version = version
-        self.changeset = changeset
+        self.version = to_int(version)
+        self.changeset = to_int(changeset)
         self.user = user
-        self.uid = uid
+        self.uid = to_int(uid)
         self.created = created
         self.visible = visible
-        self.e_type = 'element'
 
     def __repr__(self):
-        return json.dumps(self.__dict__, default=lambda o: o.__dict__)
+        return json.dumps(slot_dict(self), default=json_default)
 
     def __str__(self):
         return str(self.id)
@@ -39,50 +44,72 @@ class Element:
 
 
 class MicroElem:
+    __slots__ = ('eid', 'e_type', 'tags')
+
     def __init__(self, eid, e_type, tags: dict = None):
-        self.eid = eid
+        self.eid = to_int(eid)
         self.e_type = e_type
         self.tags = tags or {}
 
+    def __repr__(self):
+        return json.dumps(slot_dict(self), default=json_default)
+
     def __str__(self):
         return self.e_type + str(self.eid)
 
 
 class Node(Element):
+    __slots__ = ('lat', 'lon')
+    e_type = 'node'
+
     def __init__(self, eid: int, lat: float, lon: float, version: int, changeset: int,
                  user: str, uid: int, created: str, visible: bool, tags: dict):
         super().__init__(eid, version, changeset, user, uid, created, visible, tags)
-        self.lat = lat
-        self.lon = lon
-        self.e_type = 'node'
+        self.lat = to_float(lat)
+        self.lon = to_float(lon)
 
 
 class Way(Element):
+    __slots__ = ('_nodes',)
+    e_type = 'way'
+
     def __init__(self, eid: int, nodes: list, version: int, changeset: int,
                  user: str, uid: int, created: str, visible: bool, tags: dict):
         super().__init__(eid, version, changeset, user, uid, created, visible, tags)
         self.nodes = nodes
-        self.e_type = 'way'
+
+    @property
+    def nodes(self) -> array:
+        """ node ids as array('q') """
+        return self._nodes
+
+    @nodes.setter
+    def nodes(self, nodes):
+        self._nodes = array('q', map(int, nodes or ()))
 
 
 class Relation(Element):
+    __slots__ = ('members',)
+    e_type = 'relation'
+
     def __init__(self, eid: int, members: list, version: int, changeset: int,
                  user: str, uid: int, created: str, visible: bool, tags: dict):
         super().__init__(eid, version, changeset, user, uid, created, visible, tags)
         self.members = members
-        self.e_type = 'relation'
 
 
 class Comment:
+    __slots__ = ('text', '_id', 'user', 'created', 'action')
+
     def __init__(self, text: str, uid: int, username: str, created: datetime, action: str = None):
         self.text = text
-        self._id = uid
+        self._id = to_int(uid)
         self.user = username
         self.created = created
         self.action = action
 
     def __repr__(self):
-        return json.dumps(self.__dict__)
+        return json.dumps(slot_dict(self), default=json_default)
 
     @property
     def id(self):
@@ -90,12 +117,14 @@ class Comment:
 
 
 class Note:
+    __slots__ = ('_id', 'lat', 'lon', '_created', '_open', '_comments')
+
     def __init__(self, nid: int, lat: float, lon: float, created: str, is_open: bool, comments: list):
-        self._id = nid
-        self.lat = lat
-        self.lon = lon
+        self._id = to_int(nid)
+        self.lat = to_float(lat)
+        self.lon = to_float(lon)
         try:
-            dateutil.parser.parse(created)
+            parse_time(created)
             self._created = created
         except ValueError:
             self._created = None
@@ -104,15 +133,21 @@ class Note:
         self._comments = comments
 
     def __repr__(self):
-        return json.dumps(self.__dict__, default=lambda o: o.__dict__)
+        return json.dumps(slot_dict(self), default=json_default)
 
     @property
     def created(self) -> datetime:
         if self._created:
-            return dateutil.parser.parse(self._created)
+            return parse_time(self._created)
         else:
             return None
 
+    @property
+    def updated(self) -> datetime:
+        """ time of the last comment, the API lists notes newest first by it """
+        dates = [comment.created for comment in self._comments if comment.created]
+        return parse_time(max(dates)) if dates else self.created
+
     @property
     def id(self):
         return self._id
@@ -146,28 +181,36 @@ class Trace:
 
 
 class ChangeSet:
+    __slots__ = ('_id', '_user', '_uid', '_created', 'open', 'maxlon', 'maxlat', 'minlon', 'minlan',
+                 'closed', 'tags', 'comments')
+
     def __init__(self, cid: int, username: str, uid: int, created: datetime, is_open: bool, bbox: tuple,
                  closed: datetime = None, tags: dict = None, comments: list = None):
-        self._id = cid
+        self._id = to_int(cid)
         self._user = username
-        self._uid = uid
+        self._uid = to_int(uid)
         self._created = created
         self.open = is_open
-        self.maxlon = bbox[0] or None
-        self.maxlat = bbox[1] or None
-        self.minlon = bbox[2] or None
-        self.minlan = bbox[3] or None
+        bbox = bbox or (None, None, None, None)
+        self.maxlon = to_float(bbox[0])
+        self.maxlat = to_float(bbox[1])
+        self.minlon = to_float(bbox[2])
+        self.minlan = to_float(bbox[3])
         self.closed = closed
         self.tags = tags or {}
         self.comments = comments or []
 
     def __repr__(self):
-        return json.dumps(self.__dict__, default=lambda o: o.__dict__)
+        return json.dumps(slot_dict(self), default=json_default)
 
     @property
     def id(self):
         return self._id
 
+    @property
+    def created(self):
+        return self._created
+
     @property
     def open_comment(self):
         try:
@@ -180,6 +223,56 @@ class ChangeSet:
         return self.maxlon, self.maxlat, self.minlon, self.minlan
 
 
+def to_int(value):
+    """ int of an id or counter as sent by the API, None stays None """
+    return int(value) if value is not None else None
+
+
+def to_float(value):
+    """ float of a coordinate as sent by the API, None and '' become None """
+    return float(value) if value not in (None, '') else None
+
+
+def parse_time(value: str) -> datetime:
+    """ timestamp as sent by the API, ISO 8601 or '2020-05-31 12:00:00 UTC' of notes,
+    dateutil is only imported for other forms """
+    try:
+        return datetime.fromisoformat(value.replace(' UTC', '+00:00'))
+    except ValueError:
+        import dateutil.parser
+
+        return dateutil.parser.parse(value)
+
+
+def slot_dict(obj) -> dict:
+    """
+    attributes of a slotted object in declaration order, the way __dict__ used to list them
+    """
+    data = {}
+    for cls in reversed(type(obj).__mro__):
+        for name in cls.__dict__.get('__slots__', ()):
+            if hasattr(obj, name):
+                data[name] = getattr(obj, name)
+        if cls is Element:
+            data['e_type'] = obj.e_type
+    if isinstance(obj, Way):
+        data['nodes'] = data.pop('_nodes')
+    return data
+
+
+def json_default(obj):
+    """
+    default for json.dumps handling model objects and node arrays
+    """
+    if isinstance(obj, array):
+        return obj.tolist()
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if hasattr(obj, '__slots__'):
+        return slot_dict(obj)
+    return obj.__dict__
+
+
 def create_bbox(lat: float, lon: float, rad: int):
     """
     creates a Geo Bounding box with lat, lon as center
@@ -189,7 +282,6 @@ def create_bbox(lat: float, lon: float, rad: int):
     :param rad: radius in meters
     """
 
-    EARTH_RAD = float(6378000)
     lat_d = (math.asin(float(rad) / (EARTH_RAD * math.cos(math.pi * lat / 180)))) * 180 / math.pi
     lon_d = (math.asin(float(rad) / EARTH_RAD)) * 180 / math.pi
 
@@ -201,3 +293,45 @@ def create_bbox(lat: float, lon: float, rad: int):
     min_lon = round(lon - lon_d, dec)
 
     return min_lon, min_lat, max_lon, max_lat
+
+
+def distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """
+    great circle distance in meters
+
+    :param lat1: latitude of the first point
+    :param lon1: longitude of the first point
+    :param lat2: latitude of the second point
+    :param lon2: longitude of the second point
+    """
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    a = math.sin((phi2 - phi1) / 2) ** 2 + \
+        math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RAD * math.asin(math.sqrt(a))
+
+
+def quarter_bbox(bbox: tuple) -> list:
+    """
+    :param bbox: (minlon, minlat, maxlon, maxlat)
+    :returns: the four quadrants of bbox
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox
+    mid_lon = (min_lon + max_lon) / 2
+    mid_lat = (min_lat + max_lat) / 2
+    return [(min_lon, min_lat, mid_lon, mid_lat), (mid_lon, min_lat, max_lon, mid_lat),
+            (min_lon, mid_lat, mid_lon, max_lat), (mid_lon, mid_lat, max_lon, max_lat)]
+
+
+def split_bbox(bbox: tuple, max_area: float) -> list:
+    """
+    :param max_area: max area of a part in square degrees
+    :returns: bbox split into a grid of equal parts no larger than max_area
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox
+    width, height = max_lon - min_lon, max_lat - min_lat
+    edge = math.sqrt(max_area)
+    cols, rows = max(math.ceil(width / edge), 1), max(math.ceil(height / edge), 1)
+    return [(min_lon + width * col / cols, min_lat + height * row / rows,
+             min_lon + width * (col + 1) / cols, min_lat + height * (row + 1) / rows)
+            for row in range(rows) for col in range(cols)]
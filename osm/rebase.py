@@ -0,0 +1,167 @@
+import re
+import copy
+from osm.osm_util import Element, Node, Way, Relation
+from ee_osmose import ConflictError
+
+VERSION_MISMATCH = re.compile(r'Version mismatch: Provided (\d+), server had: (\d+)')
+
+
+class ElementDelta:
+    """
+    intended change of one element relative to the version it is based on:
+    tags set or removed and the new position, way nodes or relation members.
+    Each change keeps its base value, so it can be merged three-way into a newer version of the element.
+    """
+
+    def __init__(self, base: Element, tags: dict = None, remove=(), lat: float = None, lon: float = None,
+                 nodes: list = None, members: list = None):
+        """
+        :param base: element as downloaded, it is not modified
+        :param tags: tags to set
+        :param remove: tag keys to remove
+        :param lat: new latitude of a node, together with lon
+        :param lon: new longitude of a node, together with lat
+        :param nodes: new node ids of a way
+        :param members: new members of a relation, dicts of type, ref and role
+        """
+        self.base = base
+        self.tags = {}  # key -> (base value, new value), None if absent
+        for key, value in (tags or {}).items():
+            if base.tags.get(key) != value:
+                self.tags[key] = (base.tags.get(key), value)
+        for key in remove:
+            if key in base.tags:
+                self.tags[key] = (base.tags[key], None)
+        self.geometry = {}  # position | nodes | members -> (base value, new value)
+        new = {}
+        if lat is not None or lon is not None:
+            new['position'] = (float(lat), float(lon))
+        if nodes is not None:
+            new['nodes'] = tuple(map(int, nodes))
+        if members is not None:
+            new['members'] = _members(members)
+        old = _geometry(base)
+        for name, value in new.items():
+            if name not in old:
+                raise ValueError('{} of a {}'.format(name, base.type))
+            if old[name] != value:
+                self.geometry[name] = (old[name], value)
+
+    @classmethod
+    def diff(cls, base: Element, edited: Element):
+        """
+        :param base: element as downloaded
+        :param edited: changed copy of base
+        :returns: delta turning base into edited
+        """
+        if (base.type, base.id) != (edited.type, edited.id):
+            raise ValueError('{} {} is no edit of {} {}'.format(edited.type, edited.id, base.type, base.id))
+        kwargs = {}
+        if isinstance(edited, Node):
+            kwargs = {'lat': edited.lat, 'lon': edited.lon}
+        elif isinstance(edited, Way):
+            kwargs = {'nodes': edited.nodes}
+        elif isinstance(edited, Relation):
+            kwargs = {'members': edited.members}
+        return cls(base, edited.tags, [key for key in base.tags if key not in edited.tags], **kwargs)
+
+    @property
+    def etype(self) -> str:
+        return self.base.type
+
+    @property
+    def eid(self) -> int:
+        return self.base.id
+
+    @property
+    def version(self) -> int:
+        """ version the delta is based on """
+        return self.base.version
+
+    def __bool__(self):
+        return bool(self.tags or self.geometry)
+
+    def __repr__(self):
+        return '<ElementDelta {} {} v{} tags={} geometry={}>'.format(self.etype, self.eid, self.version,
+                                                                    self.tags, list(self.geometry))
+
+    def conflicts(self, current: Element) -> list:
+        """
+        a change conflicts if current holds neither its base value nor its new value
+
+        :param current: newer version of the element
+        :returns: descriptions of the conflicting changes
+        """
+        conflicts = []
+        for key, (old, new) in self.tags.items():
+            theirs = current.tags.get(key)
+            if theirs not in (old, new):
+                conflicts.append('tag {}: base {!r}, ours {!r}, theirs {!r}'.format(key, old, new, theirs))
+        theirs = _geometry(current)
+        for name, (old, new) in self.geometry.items():
+            if theirs[name] not in (old, new):
+                conflicts.append('{} changed'.format(name))
+        return conflicts
+
+    def pending(self, current: Element) -> bool:
+        """
+        :returns: whether current lacks any of the changes
+        """
+        theirs = _geometry(current)
+        return any(current.tags.get(key) != new for key, (_, new) in self.tags.items()) or \
+            any(theirs[name] != new for name, (_, new) in self.geometry.items())
+
+    def merge(self, current: Element) -> Element:
+        """
+        three-way merge: the changes of the delta on top of current, a newer version of the base
+
+        :param current: element as currently stored, not modified
+        :returns: copy of current with the delta applied, carrying the version of current
+        :raises ConflictError: current was deleted or changed a tag or the geometry differently
+        """
+        if (current.type, current.id) != (self.etype, self.eid):
+            raise ValueError('{} {} is no version of {} {}'.format(current.type, current.id, self.etype, self.eid))
+        if current.visible is False:
+            raise ConflictError('{} {} was deleted'.format(self.etype, self.eid))
+        conflicts = self.conflicts(current)
+        if conflicts:
+            raise ConflictError('{} {} v{} -> v{}: {}'.format(self.etype, self.eid, self.version, current.version,
+                                                              '; '.join(conflicts)))
+        merged = copy.copy(current)
+        merged.tags = dict(current.tags)
+        for key, (_, new) in self.tags.items():
+            if new is None:
+                merged.tags.pop(key, None)
+            else:
+                merged.tags[key] = new
+        if isinstance(merged, Way):
+            merged.nodes = self.geometry['nodes'][1] if 'nodes' in self.geometry else current.nodes
+        elif isinstance(merged, Relation):
+            members = self.geometry['members'][1] if 'members' in self.geometry else _members(current.members)
+            merged.members = [{'type': etype, 'ref': ref, 'role': role} for etype, ref, role in members]
+        elif 'position' in self.geometry:
+            merged.lat, merged.lon = self.geometry['position'][1]
+        return merged
+
+
+def server_version(message: str):
+    """
+    :param message: text of a 409 response to an element upload
+    :returns: current version on the server if it is a version mismatch, else None
+    """
+    match = VERSION_MISMATCH.search(message or '')
+    return int(match.group(2)) if match else None
+
+
+def _geometry(elem: Element) -> dict:
+    if isinstance(elem, Node):
+        return {'position': (elem.lat, elem.lon)}
+    if isinstance(elem, Way):
+        return {'nodes': tuple(elem.nodes)}
+    if isinstance(elem, Relation):
+        return {'members': _members(elem.members)}
+    return {}
+
+
+def _members(members: list) -> tuple:
+    return tuple((member['type'], int(member['ref']), member.get('role') or '') for member in members)
@@ -0,0 +1,71 @@
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """
+    coalesces concurrent identical calls
+    the first caller of a key runs the call, everyone arriving with the same key while it is in flight
+    waits for it and gets the same result or exception, or its own copy of the result. Nothing is kept once the call
+    is done.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+        self._flights = {}  # key -> Future of the call in flight
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, *args, share=None, **kwargs):
+        """
+        :param key: hashable identity of the call
+        :param fn: called with args and kwargs unless a call with key is in flight
+        :param share: called with the result for every waiting caller, e.g. a copy of mutable results
+        :returns: result of fn
+        """
+        future, leader = self.join(key)
+        if not leader:
+            result = future.result()
+            return result if share is None else share(result)
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as err:
+            self.done(key, error=err)
+            raise
+        self.done(key, result)
+        return result
+
+    def join(self, key) -> tuple:
+        """
+        lower level part of do for callers resolving several keys with one request
+
+        :returns: (Future of the call, True if the caller has to run it and call done)
+        """
+        with self._lock:
+            future = self._flights.get(key)
+            if future is not None:
+                self.shared += 1
+                return future, False
+            self.calls += 1
+            future = self._flights[key] = Future()
+            return future, True
+
+    def done(self, key, result=None, error: BaseException = None):
+        """
+        ends the call of key, waiting callers get result or error
+        """
+        with self._lock:
+            future = self._flights.pop(key)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def stats(self) -> dict:
+        """
+        :returns: calls run and calls served by a call already in flight
+        """
+        return {'calls': self.calls, 'shared': self.shared, 'in_flight': len(self._flights)}
+
+    def __len__(self):
+        return len(self._flights)
@@ -0,0 +1,169 @@
+import math
+import heapq
+import threading
+from collections import defaultdict
+from osm.osm_util import Node, Way, Relation, distance, DEG_M
+
+
+class SpatialIndex:
+    """
+    in-memory grid index over located things: elements, notes and osmose issues
+    answers bbox, radius and k-nearest queries without asking the server.
+    Adding something with a key already present replaces the old entry.
+    """
+
+    def __init__(self, cell_size: float = 0.005):
+        """
+        :param cell_size: grid cell edge in degrees, about the size of a typical query
+        """
+        self.cell_size = cell_size
+        self._cells = defaultdict(list)  # (cell_lon, cell_lat) -> [(lat, lon, key, item)]
+        self._keys = {}  # key -> cell
+        self._lock = threading.RLock()
+
+    def insert(self, lat: float, lon: float, item, key=None):
+        """
+        :param key: identity of item, default: the item itself
+        """
+        key = item if key is None else key
+        cell = self.__cell(lat, lon)
+        with self._lock:
+            if key in self._keys:
+                self.remove(key)
+            self._cells[cell].append((lat, lon, key, item))
+            self._keys[key] = cell
+
+    def remove(self, key):
+        with self._lock:
+            cell = self._keys.pop(key, None)
+            if cell is None:
+                return
+            self._cells[cell] = [entry for entry in self._cells[cell] if entry[2] != key]
+            if not self._cells[cell]:
+                del self._cells[cell]
+
+    def add_elements(self, elems: list):
+        """
+        nodes are indexed at their location, ways and relations at the center of their nodes
+        and members found in elems, elements without known position are skipped
+        """
+        located = {}
+        for elem in elems:
+            if isinstance(elem, Node) and elem.lat is not None:
+                located[('node', elem.id)] = (elem.lat, elem.lon)
+        for elem in elems:
+            if isinstance(elem, Way):
+                located[('way', elem.id)] = _center([located.get(('node', ref)) for ref in elem.nodes])
+        for elem in elems:
+            if isinstance(elem, Relation):
+                located[('relation', elem.id)] = _center([located.get((member['type'], int(member['ref'])))
+                                                          for member in elem.members])
+        for elem in elems:
+            pos = located.get((elem.type, elem.id))
+            if pos:
+                self.insert(pos[0], pos[1], elem, (elem.type, elem.id))
+
+    def add_notes(self, notes: list):
+        for note in notes:
+            self.insert(note.lat, note.lon, note, ('note', note.id))
+
+    def add_issues(self, issues: list):
+        for issue in issues:
+            self.insert(issue.lat, issue.lon, issue, ('issue', issue.id))
+
+    def bbox(self, bbox: tuple) -> list:
+        """
+        :param bbox: (minlon, minlat, maxlon, maxlat)
+        :returns: items inside bbox
+        """
+        min_lon, min_lat, max_lon, max_lat = bbox
+        result = []
+        with self._lock:
+            for entry in self.__entries(bbox):
+                if min_lat <= entry[0] <= max_lat and min_lon <= entry[1] <= max_lon:
+                    result.append(entry[3])
+        return result
+
+    def radius(self, lat: float, lon: float, rad: float) -> list:
+        """
+        :param rad: radius in meters
+        :returns: [(distance, item)] within rad, nearest first
+        """
+        lat_d = rad / DEG_M
+        lon_d = rad / (DEG_M * max(math.cos(math.radians(lat)), 1e-6))
+        hits = []
+        with self._lock:
+            for entry in self.__entries((lon - lon_d, lat - lat_d, lon + lon_d, lat + lat_d)):
+                dist = distance(lat, lon, entry[0], entry[1])
+                if dist <= rad:
+                    hits.append((dist, entry[3]))
+        hits.sort(key=lambda hit: hit[0])
+        return hits
+
+    def nearest(self, lat: float, lon: float, k: int = 1) -> list:
+        """
+        :returns: [(distance, item)] of the k nearest items, nearest first
+        """
+        if k <= 0:
+            return []
+        with self._lock:
+            if not self._cells:
+                return []
+            center = self.__cell(lat, lon)
+            max_ring = max(max(abs(cell[0] - center[0]), abs(cell[1] - center[1])) for cell in self._cells)
+            best = []  # max heap of (-distance, counter, item)
+            for ring in range(max_ring + 1):
+                for cell in _ring(center, ring):
+                    for entry in self._cells.get(cell, ()):
+                        dist = distance(lat, lon, entry[0], entry[1])
+                        if len(best) < k:
+                            heapq.heappush(best, (-dist, id(entry), entry[3]))
+                        elif dist < -best[0][0]:
+                            heapq.heapreplace(best, (-dist, id(entry), entry[3]))
+                # everything outside this ring is at least ring cells away
+                far_lat = min(abs(lat) + (ring + 1) * self.cell_size, 89.9)
+                if len(best) == k and -best[0][0] <= ring * self.cell_size * DEG_M * math.cos(math.radians(far_lat)):
+                    break
+        return [(-dist, item) for dist, _, item in sorted(best, reverse=True)]
+
+    def clear(self):
+        with self._lock:
+            self._cells.clear()
+            self._keys.clear()
+
+    def __cell(self, lat: float, lon: float) -> tuple:
+        return int(math.floor(lon / self.cell_size)), int(math.floor(lat / self.cell_size))
+
+    def __entries(self, bbox: tuple):
+        min_x, min_y = self.__cell(bbox[1], bbox[0])
+        max_x, max_y = self.__cell(bbox[3], bbox[2])
+        if (max_x - min_x + 1) * (max_y - min_y + 1) > len(self._cells):
+            cells = [cell for cell in self._cells if min_x <= cell[0] <= max_x and min_y <= cell[1] <= max_y]
+        else:
+            cells = [(x, y) for x in range(min_x, max_x + 1) for y in range(min_y, max_y + 1)]
+        for cell in cells:
+            yield from self._cells.get(cell, ())
+
+    def __len__(self):
+        return len(self._keys)
+
+
+def _ring(center: tuple, ring: int):
+    """ cells at chebyshev distance ring around center """
+    x, y = center
+    if ring == 0:
+        yield center
+        return
+    for dx in range(-ring, ring + 1):
+        yield x + dx, y - ring
+        yield x + dx, y + ring
+    for dy in range(-ring + 1, ring):
+        yield x - ring, y + dy
+        yield x + ring, y + dy
+
+
+def _center(points: list):
+    points = [point for point in points if point]
+    if not points:
+        return None
+    return sum(point[0] for point in points) / len(points), sum(point[1] for point in points) / len(points)
@@ -0,0 +1,174 @@
+import time
+import random
+import logging
+import threading
+from datetime import datetime, timezone
+from ee_osmose import ThrottleError
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    allows rate requests per second on average with bursts of up to burst requests
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        takes one token, possibly in advance
+
+        :returns: seconds to wait before the request may be sent
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+
+
+class RetryPolicy:
+    """
+    retry with jittered exponential backoff, Retry-After headers are honored
+    """
+
+    def __init__(self, retries: int = 5, backoff: float = 0.5, max_backoff: float = 60.0,
+                 statuses: tuple = (429, 503, 509), unsafe_statuses: tuple = (429, 509)):
+        """
+        :param retries: retries after the first attempt
+        :param backoff: base delay in seconds, doubled every attempt
+        :param max_backoff: upper bound of a single delay
+        :param statuses: HTTP status codes worth a retry
+        :param unsafe_statuses: status codes worth a retry of a non-idempotent request,
+            those are only retried on others if the response carries Retry-After
+        """
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = statuses
+        self.unsafe_statuses = unsafe_statuses
+
+    def retryable(self, resp, idempotent: bool = True) -> bool:
+        """
+        a 503 may come after a create was executed, a retry would create it twice
+        """
+        if resp.status_code not in self.statuses:
+            return False
+        return idempotent or resp.status_code in self.unsafe_statuses or 'Retry-After' in resp.headers
+
+    def delay(self, attempt: int, retry_after: str = None) -> float:
+        """
+        :param attempt: number of the failed attempt, starting at 0
+        :param retry_after: Retry-After header of the response, seconds or HTTP date
+        """
+        jitter = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        wait = _parse_retry_after(retry_after)
+        if wait is not None:
+            return min(wait, self.max_backoff) + jitter * 0.1
+        return jitter
+
+
+class Throttle:
+    """
+    rate limiting and retry for one process, shared by OsmApi and osmose
+    every request belongs to an endpoint class, each class has its own token bucket
+    """
+    LIMITS = {'read': (10.0, 20), 'write': (2.0, 5), 'osmose': (5.0, 10)}
+
+    def __init__(self, limits: dict = None, retry: RetryPolicy = None):
+        """
+        :param limits: endpoint class -> (requests per second, burst), merged into LIMITS
+        :param retry: retry policy for throttled responses
+        """
+        limits = dict(self.LIMITS, **(limits or {}))
+        self.buckets = {endpoint: TokenBucket(rate, burst) for endpoint, (rate, burst) in limits.items()}
+        self.retry = retry or RetryPolicy()
+        self.retries = 0
+
+    def call(self, endpoint: str, send, idempotent: bool = True):
+        """
+        :param endpoint: endpoint class e.g. read, write, osmose
+        :param send: callable sending the request, returns the response
+        :param idempotent: whether sending the request twice is harmless
+        :raises ThrottleError: still throttled after all retries
+        """
+        bucket = self.buckets[endpoint]
+        for attempt in range(self.retry.retries + 1):
+            bucket.acquire()
+            resp = send()
+            if not self.retry.retryable(resp, idempotent):
+                return resp
+            self.__give_up(resp, attempt)
+            wait = self.retry.delay(attempt, resp.headers.get('Retry-After'))
+            logger.info('throttled with %s, retry in %.2fs', resp.status_code, wait)
+            time.sleep(wait)
+
+    async def acall(self, endpoint: str, send, idempotent: bool = True):
+        """
+        asyncio variant of call, send is a coroutine function
+        """
+        import asyncio
+
+        bucket = self.buckets[endpoint]
+        for attempt in range(self.retry.retries + 1):
+            wait = bucket.reserve()
+            if wait:
+                await asyncio.sleep(wait)
+            resp = await send()
+            if not self.retry.retryable(resp, idempotent):
+                return resp
+            self.__give_up(resp, attempt)
+            wait = self.retry.delay(attempt, resp.headers.get('Retry-After'))
+            logger.info('throttled with %s, retry in %.2fs', resp.status_code, wait)
+            await asyncio.sleep(wait)
+
+    def __give_up(self, resp, attempt: int):
+        if attempt >= self.retry.retries:
+            raise ThrottleError(resp.text)
+        self.retries += 1
+        if hasattr(resp, 'close'):
+            resp.close()
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared() -> Throttle:
+    """
+    :returns: the process wide Throttle used by default
+    """
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = Throttle()
+        return _shared
+
+
+def _parse_retry_after(value: str):
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    from email.utils import parsedate_to_datetime
+
+    try:
+        return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,161 @@
+import math
+import time
+import threading
+from collections import OrderedDict
+from osm.osm_util import Node, Way, Relation
+from osm.elem_cache import copy_element
+
+
+class TileCache:
+    """
+    caches bbox query results per tile of a fixed grid
+    queries are snapped to the tiles they touch, so overlapping bboxes share the downloaded tiles.
+    entries are keyed by (kind, tile), kind separates the queried resource and its parameters,
+    the least recently used tiles are evicted once max_tiles is exceeded.
+    """
+
+    def __init__(self, tile_size: float = 0.01, ttl: float = 300.0, max_tiles: int = 512, max_query_tiles: int = 64):
+        """
+        :param tile_size: tile edge in degrees
+        :param ttl: seconds a tile is served from the cache
+        :param max_tiles: max number of cached tiles, 0 disables caching
+        :param max_query_tiles: queries touching more tiles are not snapped
+        """
+        self.tile_size = tile_size
+        self.ttl = ttl
+        self.max_tiles = max_tiles
+        self.max_query_tiles = max_query_tiles
+        self.hits = 0
+        self.misses = 0
+        self._tiles = OrderedDict()  # (kind, tile) -> (items, stored_at)
+        self._lock = threading.Lock()
+
+    def tiles(self, bbox: tuple) -> list:
+        """
+        :param bbox: (minlon, minlat, maxlon, maxlat)
+        :returns: tiles touched by bbox, empty if caching is disabled or bbox is too large
+        """
+        min_lon, min_lat, max_lon, max_lat = bbox
+        min_x, min_y = self.__tile(min_lat, min_lon)
+        max_x, max_y = self.__tile(max_lat, max_lon)
+        if not self.max_tiles or (max_x - min_x + 1) * (max_y - min_y + 1) > self.max_query_tiles:
+            return []
+        return [(x, y) for y in range(min_y, max_y + 1) for x in range(min_x, max_x + 1)]
+
+    def tile_bbox(self, tile: tuple) -> tuple:
+        """
+        :returns: (minlon, minlat, maxlon, maxlat) of tile
+        """
+        x, y = tile
+        dec = 8
+        return (round(x * self.tile_size, dec), round(y * self.tile_size, dec),
+                round((x + 1) * self.tile_size, dec), round((y + 1) * self.tile_size, dec))
+
+    def get(self, kind, tile: tuple):
+        """
+        :returns: cached items of tile or None
+        """
+        key = (kind, tile)
+        with self._lock:
+            entry = self._tiles.get(key)
+            if entry is None or time.monotonic() - entry[1] > self.ttl:
+                if entry is not None:
+                    del self._tiles[key]
+                self.misses += 1
+                return None
+            self._tiles.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, kind, tile: tuple, items: list):
+        if not self.max_tiles:
+            return
+        with self._lock:
+            self._tiles[(kind, tile)] = (items, time.monotonic())
+            self._tiles.move_to_end((kind, tile))
+            while len(self._tiles) > self.max_tiles:
+                self._tiles.popitem(last=False)
+
+    def invalidate(self, kind=None, lat: float = None, lon: float = None, match=None):
+        """
+        drops cached tiles
+
+        :param kind: only tiles of this kind, a tuple kind matches on its first entry, default: all kinds
+        :param lat: only the tile at this position, default: all tiles
+        :param match: only tiles for whose items match(items) is true, default: all tiles
+        """
+        tile = None if lat is None else self.__tile(lat, lon)
+        with self._lock:
+            for key, (items, _) in list(self._tiles.items()):
+                key_kind = key[0][0] if isinstance(key[0], tuple) else key[0]
+                if (kind is None or kind in (key[0], key_kind)) and (tile is None or key[1] == tile) \
+                        and (match is None or match(items)):
+                    del self._tiles[key]
+
+    def clear(self):
+        with self._lock:
+            self._tiles.clear()
+
+    def stats(self) -> dict:
+        return {'tiles': len(self._tiles), 'hits': self.hits, 'misses': self.misses}
+
+    def __tile(self, lat: float, lon: float) -> tuple:
+        return int(math.floor(lon / self.tile_size)), int(math.floor(lat / self.tile_size))
+
+    def __len__(self):
+        return len(self._tiles)
+
+
+def in_bbox(bbox: tuple, lat: float, lon: float) -> bool:
+    return bbox[1] <= lat <= bbox[3] and bbox[0] <= lon <= bbox[2]
+
+
+def merge_elements(tiles: list, bbox: tuple) -> list:
+    """
+    merges map downloads of several tiles and cuts them to bbox like GET /map would:
+    nodes inside bbox, ways with minimum one of these nodes and all their nodes,
+    relations with a member among them and the relations those are a member of, not recursively.
+    Duplicates keep their newest version. The elements are copies, the cached tiles are not changed by callers.
+
+    :param tiles: list of element lists
+    """
+    elems = {}
+    for items in tiles:
+        for elem in items:
+            key = (elem.type, elem.id)
+            if key not in elems or (elems[key].version or 0) < (elem.version or 0):
+                elems[key] = elem
+    inside = {eid for (etype, eid), elem in elems.items() if etype == 'node' and in_bbox(bbox, elem.lat, elem.lon)}
+    ways = [elem for elem in elems.values() if isinstance(elem, Way) and any(ref in inside for ref in elem.nodes)]
+    nodes = set(inside)
+    for way in ways:
+        nodes.update(ref for ref in way.nodes if ('node', ref) in elems)
+    keep = {('node', eid) for eid in nodes} | {('way', way.id) for way in ways}
+    relations = [elem for elem in elems.values() if isinstance(elem, Relation)
+                 and any((member['type'], int(member['ref'])) in keep for member in elem.members)]
+    children = {('relation', elem.id) for elem in relations}
+    parents = [elem for elem in elems.values() if isinstance(elem, Relation) and ('relation', elem.id) not in children
+               and any((member['type'], int(member['ref'])) in children for member in elem.members)]
+    kept = [elem for elem in elems.values() if isinstance(elem, Node) and elem.id in nodes] + ways + relations + parents
+    return [copy_element(elem) for elem in kept]
+
+
+def merge_located(tiles: list, bbox: tuple, key=None) -> list:
+    """
+    merges tile results of located items e.g. notes or trackpoints, keeps the items inside bbox
+
+    :param key: identity of an item, duplicates are dropped, default: keep all items
+    """
+    seen = set()
+    result = []
+    for items in tiles:
+        for item in items:
+            if not in_bbox(bbox, item.lat, item.lon):
+                continue
+            if key is not None:
+                ident = key(item)
+                if ident in seen:
+                    continue
+                seen.add(ident)
+            result.append(item)
+    return result
@@ -0,0 +1,298 @@
+import json
+import time
+import logging
+import threading
+from osm.throttle import Throttle, shared as throttle_shared
+from osm.metrics import Metrics, body_size, shared as metrics_shared
+
+logger = logging.getLogger(__name__)
+
+
+class Transport:
+    """
+    pooled keep-alive HTTP transport
+    one instance is shared by all calls of an OsmApi, so connections (and TLS sessions) get reused.
+    Anything providing request/get/put/post/delete with the same signature can be used instead,
+    e.g. a local stand-in for tests.
+    """
+
+    def __init__(self, auth=None, pool_connections: int = 4, pool_maxsize: int = 10,
+                 pool_block: bool = True, timeout: tuple = (5, 60), headers: dict = None,
+                 throttle: Throttle = None, endpoint: str = None, metrics: Metrics = None):
+        """
+        requests is imported and the session is created at the first request
+
+        :param auth: (username, password) sent with every request,
+            or a callable returning them, called at the first request
+        :param pool_connections: number of hosts a connection pool is kept for
+        :param pool_maxsize: max kept-alive connections per host
+        :param pool_block: wait for a free connection instead of opening more than pool_maxsize per host
+        :param timeout: (connect, read) timeout in seconds, used when a call does not provide one
+        :param headers: additional headers sent with every request
+        :param throttle: rate limiter and retry policy, default: the process wide one
+        :param endpoint: endpoint class of all requests, default: read for GET else write
+        :param metrics: records every request, default: the process wide one
+        """
+        self.timeout = timeout
+        self.throttle = throttle or throttle_shared()
+        self.endpoint = endpoint
+        self.metrics = metrics or metrics_shared()
+        self.auth = auth
+        self.headers = headers or {}
+        self.pool = {'pool_connections': pool_connections, 'pool_maxsize': pool_maxsize, 'pool_block': pool_block}
+        self.session = None
+        self._lock = threading.Lock()
+
+    def _session(self):
+        with self._lock:
+            if self.session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                session.auth = self.auth() if callable(self.auth) else self.auth
+                session.headers.update(self.headers)
+                adapter = HTTPAdapter(**self.pool)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self.session = session
+            return self.session
+
+    def request(self, method: str, url: str, **kwargs):
+        """
+        :raises ThrottleError: still throttled after all retries
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        endpoint = self.endpoint or ('read' if method == 'GET' else 'write')
+        session = self._session()
+        attempts = []
+        rewind = _rewinder(kwargs)
+
+        def send():
+            rewind()
+            start = time.perf_counter()
+            resp = session.request(method, url, **kwargs)
+            seconds = time.perf_counter() - start
+            if kwargs.get('stream'):
+                # counted while the body is read, resp.content reads it by iter_content too
+                bytes_in = 0
+                resp.iter_content = _counted(resp.iter_content, self.metrics, url)
+            else:
+                bytes_in = len(resp.content)
+            bytes_out = int(resp.request.headers.get('Content-Length') or 0) or body_size(resp.request.body)
+            self.metrics.request(url, method, resp.status_code, seconds, bytes_in, bytes_out, retry=bool(attempts))
+            attempts.append(resp.status_code)
+            return resp
+
+        return self.throttle.call(endpoint, send, idempotent(method, url))
+
+    def get(self, url: str, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def put(self, url: str, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def delete(self, url: str, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+    def close(self):
+        if self.session is not None:
+            self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class Response:
+    """
+    fully read response of an AsyncTransport, mirrors the used parts of requests.Response
+    """
+
+    def __init__(self, url: str, status_code: int, content: bytes, headers: dict, encoding: str = None):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.encoding = encoding or 'utf-8'
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding, errors='replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class AsyncTransport:
+    """
+    pooled keep-alive asyncio HTTP transport based on aiohttp
+    the session is created on first use, inside the running event loop.
+    """
+
+    def __init__(self, auth=None, limit: int = 100, limit_per_host: int = 20,
+                 timeout: tuple = (5, 60), headers: dict = None, throttle: Throttle = None, endpoint: str = None,
+                 metrics: Metrics = None):
+        """
+        :param auth: (username, password) sent with every request,
+            or a callable returning them, called when the session is created
+        :param limit: max open connections in total
+        :param limit_per_host: max open connections per host
+        :param timeout: (connect, read) timeout in seconds
+        :param headers: additional headers sent with every request
+        :param throttle: rate limiter and retry policy, default: the process wide one
+        :param endpoint: endpoint class of all requests, default: read for GET else write
+        :param metrics: records every request, default: the process wide one
+        """
+        _aiohttp()
+        self.auth = auth
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self.headers = headers or {}
+        self.throttle = throttle or throttle_shared()
+        self.endpoint = endpoint
+        self.metrics = metrics or metrics_shared()
+        self.session = None
+
+    def _session(self):
+        if self.session is None or self.session.closed:
+            aiohttp = _aiohttp()
+            auth = self.auth() if callable(self.auth) else self.auth
+            connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host)
+            timeout = aiohttp.ClientTimeout(sock_connect=self.timeout[0], sock_read=self.timeout[1])
+            self.session = aiohttp.ClientSession(connector=connector, auth=aiohttp.BasicAuth(*auth) if auth else None,
+                                                 timeout=timeout, headers=self.headers)
+        return self.session
+
+    async def request(self, method: str, url: str, data=None, params: dict = None, files: dict = None,
+                      **kwargs) -> Response:
+        if params:
+            params = {key: str(value) for key, value in params.items()}
+        body_kwargs = {'data': data, 'files': files}
+        rewind = _rewinder(body_kwargs)
+        data, files = body_kwargs['data'], body_kwargs['files']
+        bytes_out = body_size(data)
+        attempts = []
+
+        def body():
+            # a FormData can be sent once only, every attempt builds its own
+            if not files:
+                return data
+            form = _aiohttp().FormData()
+            for key, value in (data or {}).items():
+                form.add_field(key, str(value))
+            for key, (filename, content) in files.items():
+                form.add_field(key, content, filename=filename)
+            return form
+
+        async def send():
+            rewind()
+            start = time.perf_counter()
+            async with self._session().request(method, url, data=body(), params=params, **kwargs) as resp:
+                content = await resp.read()
+                response = Response(str(resp.url), resp.status, content, dict(resp.headers), resp.charset)
+            self.metrics.request(url, method, response.status_code, time.perf_counter() - start, len(content),
+                                 bytes_out, retry=bool(attempts))
+            attempts.append(response.status_code)
+            return response
+
+        endpoint = self.endpoint or ('read' if method == 'GET' else 'write')
+        return await self.throttle.acall(endpoint, send, idempotent(method, url))
+
+    async def get(self, url: str, **kwargs) -> Response:
+        return await self.request('GET', url, **kwargs)
+
+    async def put(self, url: str, **kwargs) -> Response:
+        return await self.request('PUT', url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> Response:
+        return await self.request('POST', url, **kwargs)
+
+    async def delete(self, url: str, **kwargs) -> Response:
+        return await self.request('DELETE', url, **kwargs)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+
+def idempotent(method: str, url: str) -> bool:
+    """
+    whether sending the request twice is harmless, POSTs and PUT .../create are not
+    """
+    if method == 'POST':
+        return False
+    return not (method == 'PUT' and url.split('?')[0].rstrip('/').endswith('/create'))
+
+
+def _rewinder(kwargs: dict):
+    """
+    every attempt of a request reads its file objects again,
+    unseekable ones are read into bytes, the others are rewound to their current position
+
+    :param kwargs: request arguments, data and files are updated in place
+    :returns: callable rewinding all file objects, called before every attempt
+    """
+    positions = []
+
+    def replayable(value):
+        if not hasattr(value, 'read'):
+            return value
+        try:
+            positions.append((value, value.tell()))
+            return value
+        except (AttributeError, OSError):
+            return value.read()
+
+    if 'data' in kwargs:
+        kwargs['data'] = replayable(kwargs['data'])
+    files = kwargs.get('files')
+    if files:
+        kwargs['files'] = {key: (value[0], replayable(value[1])) + tuple(value[2:]) if isinstance(value, tuple)
+                           else replayable(value) for key, value in files.items()}
+
+    def rewind():
+        for file, position in positions:
+            file.seek(position)
+
+    return rewind
+
+
+def _counted(iter_content, metrics: Metrics, url: str):
+    """
+    :returns: iter_content of a streamed response, recording the size of every chunk as received bytes of url
+    """
+
+    def counting(*args, **kwargs):
+        for chunk in iter_content(*args, **kwargs):
+            metrics.received(url, len(chunk))
+            yield chunk
+
+    return counting
+
+
+def _aiohttp():
+    """
+    :returns: the aiohttp module, imported on first use
+    """
+    try:
+        import aiohttp
+    except ImportError:
+        raise ImportError('AsyncTransport requires aiohttp') from None
+    return aiohttp
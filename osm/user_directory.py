@@ -0,0 +1,119 @@
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from osm.single_flight import SingleFlight
+
+
+class UserDirectory:
+    """
+    cached lookup of user details for many uids
+    users are kept for ttl seconds, missing ones are requested in chunks,
+    concurrent lookups of a uid already requested wait for that request instead of sending their own.
+    unknown users are cached as None as well.
+    """
+
+    def __init__(self, fetch, ttl: float = 3600.0, chunk_size: int = 100, max_entries: int = 100000,
+                 max_workers: int = 4, flight: SingleFlight = None):
+        """
+        :param fetch: callable requesting a list of uids, returns user dicts with key 'uid'
+        :param ttl: seconds a user is served from the cache
+        :param chunk_size: max uids per request
+        :param max_entries: max number of cached users
+        :param max_workers: max concurrent requests of one lookup
+        :param flight: coalesces lookups of uids in flight, may be shared with other callers
+        """
+        self.fetch = fetch
+        self.ttl = ttl
+        self.chunk_size = chunk_size
+        self.max_entries = max_entries
+        self.max_workers = max_workers
+        self.hits = 0
+        self.misses = 0
+        self.requests = 0
+        self.flight = flight or SingleFlight()
+        self._users = OrderedDict()  # uid -> (user or None, stored_at)
+        self._lock = threading.Lock()
+
+    def get(self, uid: int):
+        """
+        :returns: user dict or None for unknown users
+        """
+        return self.get_many([uid]).get(int(uid))
+
+    def get_many(self, uids: list) -> dict:
+        """
+        :returns: uid -> user dict for all known users of uids
+        """
+        found = {}
+        missing = []
+        with self._lock:
+            now = time.monotonic()
+            for uid in dict.fromkeys(map(int, uids)):
+                entry = self._users.get(uid)
+                if entry is not None and now - entry[1] <= self.ttl:
+                    self._users.move_to_end(uid)
+                    self.hits += 1
+                    found[uid] = entry[0]
+                else:
+                    self.misses += 1
+                    missing.append(uid)
+        futures = {}
+        mine = []
+        for uid in missing:
+            futures[uid], leader = self.flight.join(('user', uid))
+            if leader:
+                mine.append(uid)
+        with self._lock:  # a flight may have ended between the cache lookup and join
+            now = time.monotonic()
+            fresh = {uid: self._users[uid][0] for uid in mine
+                     if uid in self._users and now - self._users[uid][1] <= self.ttl}
+        for uid, user in fresh.items():
+            self.flight.done(('user', uid), user)
+        mine = [uid for uid in mine if uid not in fresh]
+        if mine:
+            self.__request(mine)
+        for uid, future in futures.items():
+            found[uid] = future.result()
+        return {uid: user for uid, user in found.items() if user is not None}
+
+    def invalidate(self, uid: int):
+        with self._lock:
+            self._users.pop(int(uid), None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+    def stats(self) -> dict:
+        return {'users': len(self._users), 'hits': self.hits, 'misses': self.misses, 'requests': self.requests}
+
+    def __request(self, uids: list):
+        """
+        requests uids in chunks and ends their flights, also on failure
+        """
+        chunks = [uids[i:i + self.chunk_size] for i in range(0, len(uids), self.chunk_size)]
+        try:
+            if len(chunks) > 1:
+                with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as pool:
+                    parts = list(pool.map(self.fetch, chunks))
+            else:
+                parts = [self.fetch(chunks[0])]
+        except Exception as err:
+            for uid in uids:
+                self.flight.done(('user', uid), error=err)
+            raise
+        self.requests += len(chunks)
+        users = {int(user['uid']): user for part in parts for user in part}
+        with self._lock:
+            now = time.monotonic()
+            for uid in uids:
+                self._users[uid] = (users.get(uid), now)
+                self._users.move_to_end(uid)
+            while len(self._users) > self.max_entries:
+                self._users.popitem(last=False)
+        for uid in uids:
+            self.flight.done(('user', uid), users.get(uid))
+
+    def __len__(self):
+        return len(self._users)
@@ -4,24 +4,28 @@ Documentation, License etc.
 @package osmate
 '''
 
+import os
 import logging
-import requests
 import json
 from operator import itemgetter
 from osm import osm_util
+from osm.transport import Transport
+from osm.single_flight import SingleFlight
 from ee_osmose import NoneFoundError
 
-logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(lineno)d - %(message)s', level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-URL = 'http://osmose.openstreetmap.fr/en/api/0.3beta'
+URL = os.environ.get('OSMOSE_URL', 'http://osmose.openstreetmap.fr/en/api/0.3beta')
 lang = 'en'
+transport = Transport(endpoint='osmose')
+flight = SingleFlight()  # identical concurrent queries share one request
 
 
 class Issue:
     """
         represents an Issue at Open Street Map
     """
+    __slots__ = ('lat', 'lon', 'id', 'title', 'subtitle', 'elems', 'bbox')
 
     def __init__(self, lat: float, lon: float, e_id: str, title: str,
                  subtitle: str, elems: list, bbox=None):
@@ -55,7 +59,7 @@ class Issue:
         return self.lat, self.lon
 
     def __repr__(self):
-        return json.dumps(self, default=lambda o: o.__dict__)
+        return json.dumps(self, default=osm_util.json_default)
 
     def __str__(self):
         return '"{}" Issue at: {} , elems: {} '\
@@ -88,10 +92,10 @@ def get_issues_user(user: str) -> list:  # future allows arbitrary arguments spe
     """
 
     logger.debug('Entering: get_issues_user')
-    lst = requests.get(URL + '/issues?full=true&username={}&limit=53'.format(user)).json()
-    logger.debug(lst)
-    if lst['issues']:
-        return __to_issue_list(lst)
+    url = URL + '/issues?full=true&username={}&limit=53'.format(user)
+    issues = flight.do(url, __get_issues, url)
+    if issues:
+        return list(issues)
     else:
         raise NoneFoundError('No issues found for user {}'.format(user))
 
@@ -122,14 +126,27 @@ def get_issues_loc(lat: float, lon: float, rad: int) -> list:
     logger.debug('Entering: get_issues_loc with (lat:{}, lon:{})'.format(lat, lon))
     bbox = osm_util.create_bbox(lat, lon, rad)
     path = '/issues?full=true&bbox={},{},{},{}&limit=50'
-    path = path.format(*bbox)
-    lst = requests.get(URL + path).json()
-    if lst['issues']:
-        return __to_issue_list(lst)
+    url = URL + path.format(*bbox)
+    issues = flight.do(url, __get_issues, url)
+    if issues:
+        return list(issues)
     else:
         raise NoneFoundError('No issues found in {}m around location: {},{}'.format(rad, lat, lon))
 
 
+def __get_json(url: str):
+    """GET url, decoding the response is timed as parse phase of the endpoint"""
+    data = transport.get(url)
+    with transport.metrics.time('parse', data.url):
+        return data.json()
+
+
+def __get_issues(url: str) -> list:
+    as_json = __get_json(url)
+    with transport.metrics.time('build', url):
+        return __to_issue_list(as_json)
+
+
 def __to_issue_list(issue_lst: dict) -> list:
     """transforms your osmose response list to a list of Issue objects"""
     logger.debug('to issue list')
@@ -168,7 +185,8 @@ def get_issue(issue_id: str) -> Issue:
     """
 
     logger.debug('Entering: get_issue')
-    as_json = requests.get(URL + '/issue/{}'.format(issue_id)).json()
+    url = URL + '/issue/{}'.format(issue_id)
+    as_json = flight.do(url, __get_json, url)
     logger.debug(as_json)
     bbox = itemgetter('minlon', 'minlat', 'maxlon', 'maxlat')(as_json)
     elems = []
@@ -0,0 +1,296 @@
+'''
+Local stand-in for the OSM API (/api/0.6/*) and the osmose API (/en/api/0.3beta/*)
+
+replays recorded fixtures from test/fixtures, can record missing ones from the real servers
+and optionally injects latency, error responses and large /map payloads.
+
+    with FakeServer(latency=0.05) as server:
+        api = OsmApi(base_url=server.osm_url)
+        osmose.URL = server.osmose_url
+
+run standalone: python test/fake_server.py --port 8000 [--record] [--map-size 50000] [--map-grid 0.001]
+'''
+
+import os
+import re
+import sys
+import time
+import hashlib
+import argparse
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from bench.fixtures import synthetic_map, grid_map, synthetic_trackpoints, synthetic_changesets
+
+FIXTURE_DIR = os.path.join(ROOT, 'test', 'fixtures')
+OSM_PREFIX = '/api/0.6'
+OSMOSE_PREFIX = '/en/api/0.3beta'
+UPSTREAM = {OSM_PREFIX: 'https://master.apis.dev.openstreetmap.org',
+            OSMOSE_PREFIX: 'http://osmose.openstreetmap.fr'}
+
+# OsmApi reads its credentials at the first request, the fake server accepts any
+os.environ.setdefault('OSM_USERNAME', 'fake')
+os.environ.setdefault('OSM_PASSWORD', 'fake')
+
+
+def fixture_path(fixtures: str, method: str, path: str, query: str = '') -> str:
+    """
+    fixtures are stored as <fixtures>/<METHOD>/<path>[__<query hash>]
+    """
+    name = os.path.join(fixtures, method, *path.strip('/').split('/'))
+    if query:
+        name += '__' + hashlib.sha1(query.encode()).hexdigest()[:10]
+    return name
+
+
+class FakeServer:
+    """
+    threaded HTTP server with keep-alive, serving fixtures for both APIs
+    """
+
+    def __init__(self, port: int = 0, fixtures: str = FIXTURE_DIR, record: bool = False,
+                 latency: float = 0.0, map_size: int = 0, map_grid: float = 0.0, map_limit: int = 0,
+                 track_size: int = 0, changeset_count: int = 0):
+        """
+        :param port: 0 picks a free port
+        :param fixtures: fixture directory
+        :param record: fetch and store responses without fixture from the real servers
+        :param latency: seconds added to every response
+        :param map_size: if set, /map answers with a synthetic map of this many nodes
+        :param map_grid: if set, /map answers with nodes on a global grid of this spacing in degrees
+        :param map_limit: if set, /map answers 400 for bboxes with more nodes, like the real 50.000 limit
+        :param track_size: if set, /trackpoints answers with pages of a synthetic track of this many points
+        :param changeset_count: if set, /changesets answers from this many synthetic changesets
+        """
+        self.fixtures = fixtures
+        self.record = record
+        self.latency = latency
+        self.map_size = map_size
+        self.map_grid = map_grid
+        self.map_limit = map_limit
+        self.track_size = track_size
+        self.changeset_count = changeset_count
+        self.requests = []
+        self.bodies = []  # request bodies, in the order of requests
+        self._errors = []
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', port), _handler(self))
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return 'http://127.0.0.1:{}'.format(self._httpd.server_port)
+
+    @property
+    def osm_url(self) -> str:
+        return self.url + OSM_PREFIX
+
+    @property
+    def osmose_url(self) -> str:
+        return self.url + OSMOSE_PREFIX
+
+    def inject(self, pattern: str, status: int, times: int = None, method: str = None,
+               retry_after: int = None, body: str = None):
+        """
+        answer requests whose path (and query) matches pattern with an error status
+
+        :param pattern: regular expression searched in the request path
+        :param status: e.g. 409, 410, 414 or 429
+        :param times: only the next n matching requests, default: all
+        :param method: only this HTTP method
+        :param retry_after: Retry-After header value
+        :param body: response text
+        """
+        with self._lock:
+            self._errors.append({'pattern': re.compile(pattern), 'status': status, 'times': times,
+                                 'method': method, 'retry_after': retry_after,
+                                 'body': body or 'injected error {}'.format(status)})
+
+    def clear_errors(self):
+        with self._lock:
+            self._errors = []
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def _injected(self, method: str, path: str):
+        with self._lock:
+            for error in self._errors:
+                if error['method'] and error['method'] != method:
+                    continue
+                if not error['pattern'].search(path) or error['times'] == 0:
+                    continue
+                if error['times'] is not None:
+                    error['times'] -= 1
+                return error
+        return None
+
+    def _fixture(self, method: str, path: str, query: str):
+        for name in (fixture_path(self.fixtures, method, path, query), fixture_path(self.fixtures, method, path)):
+            if os.path.isfile(name):
+                with open(name, 'rb') as file:
+                    return file.read()
+        return None
+
+    def _record(self, method: str, path: str, query: str, headers: dict, body: bytes):
+        prefix = OSM_PREFIX if path.startswith(OSM_PREFIX) else OSMOSE_PREFIX
+        url = UPSTREAM[prefix] + path + ('?' + query if query else '')
+        req = urllib.request.Request(url, data=body or None, method=method, headers=headers)
+        try:
+            with urllib.request.urlopen(req) as resp:
+                status, content = resp.status, resp.read()
+        except urllib.error.HTTPError as err:
+            return err.code, err.read()
+        name = fixture_path(self.fixtures, method, path, query)
+        os.makedirs(os.path.dirname(name), exist_ok=True)
+        with open(name, 'wb') as file:
+            file.write(content)
+        return status, content
+
+
+def _handler(server: FakeServer):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def do_GET(self):
+            self._serve()
+
+        def do_PUT(self):
+            self._serve()
+
+        def do_POST(self):
+            self._serve()
+
+        def do_DELETE(self):
+            self._serve()
+
+        def _serve(self):
+            body = self._read_body()
+            path, _, query = self.path.partition('?')
+            server.requests.append((self.command, self.path))
+            server.bodies.append(body)
+            if server.latency:
+                time.sleep(server.latency)
+
+            error = server._injected(self.command, self.path)
+            if error:
+                headers = {'Retry-After': str(error['retry_after'])} if error['retry_after'] is not None else {}
+                return self._send(error['status'], error['body'].encode(), headers)
+            if (server.map_size or server.map_grid) and path == OSM_PREFIX + '/map':
+                bbox = tuple(map(float, re.search(r'bbox=([^&]+)', query).group(1).split(',')))
+                if server.map_grid:
+                    count, chunks = grid_map(bbox, server.map_grid)
+                else:
+                    count, chunks = server.map_size, synthetic_map(bbox, server.map_size)
+                if server.map_limit and count > server.map_limit:
+                    message = 'You requested too many nodes (limit is {}). Either request a smaller area, ' \
+                              'or use planet.osm'.format(server.map_limit)
+                    return self._send(400, message.encode())
+                return self._send_chunked(chunks)
+            if server.track_size and path == OSM_PREFIX + '/trackpoints':
+                params = urllib.parse.parse_qs(query)
+                bbox = tuple(map(float, params['bbox'][0].split(',')))
+                page = int(params.get('page', ['0'])[0])
+                return self._send(200, synthetic_trackpoints(bbox, server.track_size, page))
+            if server.changeset_count and path == OSM_PREFIX + '/changesets':
+                return self._send(200, synthetic_changesets(query, server.changeset_count))
+
+            content = server._fixture(self.command, path, query)
+            if content is not None:
+                return self._send(200, content)
+            if server.record:
+                headers = {key: value for key, value in self.headers.items()
+                           if key.lower() in ('authorization', 'content-type')}
+                status, content = server._record(self.command, path, query, headers, body)
+                return self._send(status, content)
+            self._send(404, 'no fixture for {} {}'.format(self.command, self.path).encode())
+
+        def _read_body(self) -> bytes:
+            if self.headers.get('Transfer-Encoding', '').lower() != 'chunked':
+                length = int(self.headers.get('Content-Length') or 0)
+                return self.rfile.read(length) if length else b''
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b';')[0], 16)
+                if not size:
+                    self.rfile.readline()
+                    return b''.join(chunks)
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+
+        def _send(self, status: int, content: bytes, headers: dict = None):
+            self.send_response(status)
+            self.send_header('Content-Type', _content_type(content))
+            self.send_header('Content-Length', str(len(content)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(content)
+
+        def _send_chunked(self, chunks):
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/xml; charset=utf-8')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for chunk in chunks:
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+            self.wfile.write(b'0\r\n\r\n')
+
+    return Handler
+
+
+def _content_type(content: bytes) -> str:
+    start = content.lstrip()[:1]
+    if start in (b'{', b'['):
+        return 'application/json; charset=utf-8'
+    if start == b'<':
+        return 'application/xml; charset=utf-8'
+    return 'text/plain; charset=utf-8'
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description='local stand-in for the OSM and osmose APIs')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--fixtures', default=FIXTURE_DIR)
+    parser.add_argument('--record', action='store_true', help='record missing fixtures from the real servers')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    parser.add_argument('--map-size', type=int, default=0, help='nodes in synthetic /map responses')
+    parser.add_argument('--map-grid', type=float, default=0.0, help='grid spacing of synthetic /map responses')
+    parser.add_argument('--map-limit', type=int, default=0, help='max nodes of one /map response')
+    parser.add_argument('--track-size', type=int, default=0, help='points of the synthetic /trackpoints track')
+    parser.add_argument('--changesets', type=int, default=0, help='number of synthetic changesets')
+    args = parser.parse_args(argv)
+    server = FakeServer(args.port, args.fixtures, args.record, args.latency, args.map_size,
+                        args.map_grid, args.map_limit, args.track_size, args.changesets)
+    print('OSM API:', server.osm_url, ' osmose API:', server.osmose_url)
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
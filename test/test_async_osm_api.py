@@ -0,0 +1,173 @@
+import asyncio
+import unittest
+import urllib.parse
+import ee_osmose
+import osm.osm_api as osmapi
+from osm.async_osm_api import AsyncOsmApi
+from osm.throttle import Throttle
+from osm.transport import AsyncTransport
+from osm.osm_util import Node
+from fake_server import FakeServer
+
+BBOX = (13.43, 52.51, 13.44, 52.52)
+
+
+def new_node() -> Node:
+    return Node(-1, 52.5134, 13.4374, 0, 0, '', 0, None, True, {'amenity': 'bench'})
+
+
+class EndpointTest(unittest.TestCase):
+    """
+    method and URL of the calls whose endpoints were wrong once, for OsmApi and AsyncOsmApi
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakeServer(track_size=5010).start()  # 10 points on page 1
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.server.clear_errors()
+        self.server.requests.clear()
+
+    def run_async(self, call):
+        async def run():
+            async with AsyncOsmApi(AsyncTransport(auth=osmapi.credentials), base_url=self.server.osm_url) as api:
+                return await call(api)
+
+        return asyncio.run(run())
+
+    def last_request(self) -> tuple:
+        method, path = self.server.requests[-1]
+        url = urllib.parse.urlsplit(path)
+        return method, url.path[len('/api/0.6'):], urllib.parse.parse_qs(url.query)
+
+    def test_close_changeset(self):
+        osmapi.OsmApi(base_url=self.server.osm_url).close_changeset(100)
+        self.assertEqual(self.last_request(), ('PUT', '/changeset/100/close', {}))
+        self.run_async(lambda api: api.close_changeset(100))
+        self.assertEqual(self.last_request(), ('PUT', '/changeset/100/close', {}))
+
+    def test_download_changeset(self):
+        change = osmapi.OsmApi(base_url=self.server.osm_url).download_changeset(100)
+        self.assertIn('<osmChange', change)
+        self.assertEqual(self.last_request(), ('GET', '/changeset/100/download', {}))
+        self.assertEqual(self.run_async(lambda api: api.download_changeset(100)), change)
+        self.assertEqual(self.last_request(), ('GET', '/changeset/100/download', {}))
+
+    def test_reopen_note(self):
+        note = osmapi.OsmApi(base_url=self.server.osm_url).reopen_note(22599, 'still missing')
+        self.assertEqual(note.id, 22599)
+        self.assertEqual(self.last_request(), ('POST', '/notes/22599/reopen', {'text': ['still missing']}))
+        note = self.run_async(lambda api: api.reopen_note(22599, 'still missing'))
+        self.assertEqual(note.id, 22599)
+        self.assertEqual(self.last_request(), ('POST', '/notes/22599/reopen', {'text': ['still missing']}))
+
+    def test_create_element(self):
+        self.assertEqual(osmapi.OsmApi(base_url=self.server.osm_url).create_element(new_node(), 100), 5001)
+        self.assertEqual(self.last_request(), ('PUT', '/node/create', {}))
+        self.assertEqual(self.run_async(lambda api: api.create_element(new_node(), 100)), 5001)
+        self.assertEqual(self.last_request(), ('PUT', '/node/create', {}))
+
+    def test_create_element_error(self):
+        self.server.inject('/node/create', 500, method='PUT')
+        with self.assertRaises(Exception):
+            osmapi.OsmApi(base_url=self.server.osm_url).create_element(new_node(), 100)
+        with self.assertRaises(Exception):
+            self.run_async(lambda api: api.create_element(new_node(), 100))
+
+    def test_trackpoints(self):
+        query = {'bbox': [','.join(map(str, BBOX))], 'page': ['1']}
+        points = osmapi.OsmApi(base_url=self.server.osm_url).get_bbox_gpx(BBOX, 1)
+        self.assertEqual(len(points), 10)
+        self.assertEqual(self.last_request(), ('GET', '/trackpoints', query))
+        self.assertEqual(len(self.run_async(lambda api: api.get_bbox_gpx(BBOX, 1))), 10)
+        self.assertEqual(self.last_request(), ('GET', '/trackpoints', query))
+
+
+class AsyncOsmApiTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakeServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.server.clear_errors()
+        self.server.requests.clear()
+        self.throttle = Throttle()
+
+    def run_async(self, call):
+        async def run():
+            transport = AsyncTransport(auth=osmapi.credentials, throttle=self.throttle)
+            async with AsyncOsmApi(transport, base_url=self.server.osm_url) as api:
+                return await call(api)
+
+        return asyncio.run(run())
+
+    def test_get_element(self):
+        node = self.run_async(lambda api: api.get_element('node', 4314858041))
+        self.assertEqual(node.tags['amenity'], 'bench')
+
+    def test_concurrent(self):
+        async def both(api):
+            return await asyncio.gather(api.get_element('node', 4314858041), api.get_permissions())
+
+        node, permissions = self.run_async(both)
+        self.assertEqual(node.tags['amenity'], 'bench')
+        self.assertIn('allow_write_api', permissions)
+
+    def test_notes_bbox(self):
+        notes = self.run_async(lambda api: api.get_notes_bbox(BBOX, limit=20, closed=0))
+        self.assertEqual([note.id for note in notes], [22599])
+        method, path = self.server.requests[-1]
+        url = urllib.parse.urlsplit(path)
+        self.assertEqual((method, url.path), ('GET', '/api/0.6/notes'))
+        self.assertEqual(urllib.parse.parse_qs(url.query),
+                         {'bbox': [','.join(map(str, BBOX))], 'limit': ['20'], 'closed': ['0']})
+
+    def test_throttled_retry(self):
+        self.server.inject('/permissions', 429, times=2, retry_after=0)
+        self.assertIn('allow_write_api', self.run_async(lambda api: api.get_permissions()))
+        self.assertEqual(self.throttle.retries, 2)
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_errors(self):
+        self.server.inject('/node/', 410, method='GET')
+        with self.assertRaises(LookupError):
+            self.run_async(lambda api: api.get_element('node', 4314858041))
+        self.server.clear_errors()
+        self.server.inject('/node/', 404, method='GET')
+        with self.assertRaises(ee_osmose.NoneFoundError):
+            self.run_async(lambda api: api.get_element('node', 4314858041))
+        self.server.inject('/node/4314858041', 409, method='PUT')
+        node = Node(4314858041, 52.5134, 13.4374, 1, 0, '', 0, None, True, {'amenity': 'bench'})
+        with self.assertRaises(ee_osmose.ConflictError):
+            self.run_async(lambda api: api.edit_element(node, 100))
+
+
+    def test_map_bad_request(self):
+        self.server.inject('/map', 400, body='The latitudes must be between -90 and 90')
+        with self.assertRaises(ValueError) as error:
+            self.run_async(lambda api: api.get_element_bbox((13.4, 52.5, 13.402, 52.502)))
+        self.assertNotIsInstance(error.exception, ee_osmose.AreaRefusedError)
+        self.assertEqual(len(self.server.requests), 1)
+        self.server.clear_errors()
+        self.server.inject('/map', 400, body='You requested too many nodes (limit is 50000).')
+
+        async def capped(api):
+            api.MAX_MAP_REQUESTS = 8
+            return await api.get_element_bbox((13.4, 52.5, 13.402, 52.502))
+
+        with self.assertRaises(ee_osmose.AreaRefusedError):
+            self.run_async(capped)
+        self.assertEqual(len(self.server.requests), 1 + 1 + 4)  # the quarters of the quarters are not sent
+
+
+if __name__ == '__main__':
+    unittest.main()
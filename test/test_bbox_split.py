@@ -0,0 +1,74 @@
+import unittest
+import osm.osm_api as osmapi
+from ee_osmose import AreaRefusedError
+from osm.tile_cache import TileCache
+from fake_server import FakeServer
+
+BBOX = (13.4005, 52.5005, 13.4395, 52.5395)
+
+
+class BboxSplitTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakeServer(map_grid=0.001, map_limit=400).start()
+        cls.reference = FakeServer(map_grid=0.001).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        cls.reference.stop()
+
+    def expected(self):
+        api = osmapi.OsmApi(base_url=self.reference.osm_url)
+        return {(elem.type, elem.id) for elem in api.iter_element_bbox(BBOX)}
+
+    def test_refused_area_is_split(self):
+        api = osmapi.OsmApi(base_url=self.server.osm_url, tiles=TileCache(max_tiles=0))
+        with self.assertRaises(ValueError):
+            list(api.iter_element_bbox(BBOX))
+        elems = api.get_element_bbox(BBOX)
+        keys = [(elem.type, elem.id) for elem in elems]
+        self.assertEqual(len(keys), len(set(keys)))
+        self.assertEqual(set(keys), self.expected())
+
+    def test_other_bad_request_not_split(self):
+        self.reference.inject('/map', 400, body='The latitudes must be between -90 and 90')
+        try:
+            api = osmapi.OsmApi(base_url=self.reference.osm_url, tiles=TileCache(max_tiles=0))
+            sent = len(self.reference.requests)
+            with self.assertRaises(ValueError) as error:
+                api.get_element_bbox((13.4, 52.5, 13.402, 52.502))
+            self.assertNotIsInstance(error.exception, AreaRefusedError)
+            self.assertEqual(len(self.reference.requests) - sent, 1)
+        finally:
+            self.reference.clear_errors()
+
+    def test_request_cap(self):
+        api = osmapi.OsmApi(base_url=self.server.osm_url, tiles=TileCache(max_tiles=0))
+        api.MAX_MAP_REQUESTS = 4
+        sent = len(self.server.requests)
+        with self.assertRaises(AreaRefusedError):
+            api.get_element_bbox(BBOX)
+        self.assertLessEqual(len(self.server.requests) - sent, 4)
+
+    def test_large_area_is_presplit(self):
+        api = osmapi.OsmApi(base_url=self.reference.osm_url, tiles=TileCache(max_tiles=0))
+        api.MAX_BBOX_AREA = 0.0002
+        sent = len(self.reference.requests)
+        elems = api.get_element_bbox(BBOX)
+        self.assertGreater(len(self.reference.requests) - sent, 4)
+        self.assertEqual({(elem.type, elem.id) for elem in elems}, self.expected())
+
+    def test_tiled(self):
+        api = osmapi.OsmApi(base_url=self.server.osm_url, tiles=TileCache(tile_size=0.02))
+        self.assertEqual({(elem.type, elem.id) for elem in api.get_element_bbox(BBOX)}, self.expected())
+
+    def test_parent_relations(self):
+        expected = self.expected()
+        self.assertTrue(any(etype == 'relation' and eid > 10 ** 12 for etype, eid in expected))
+        api = osmapi.OsmApi(base_url=self.reference.osm_url, tiles=TileCache(tile_size=0.005))
+        self.assertEqual({(elem.type, elem.id) for elem in api.get_element_bbox(BBOX)}, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
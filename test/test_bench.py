@@ -0,0 +1,31 @@
+import unittest
+from bench import run, fixtures
+from osm import osm_parser
+
+
+class BenchTest(unittest.TestCase):
+    def test_fixture_sizes(self):
+        elems = osm_parser.parse_elems(osm_parser.fromstring(fixtures.osm_map(1000)))
+        self.assertEqual(len(elems), 1000)
+        self.assertEqual(len(osm_parser.parse_notes(osm_parser.fromstring(fixtures.notes(20)))), 20)
+        self.assertEqual(len(osm_parser.parse_changesets(fixtures.changesets(20))), 20)
+        self.assertEqual(fixtures.osm_map(1000), fixtures.osm_map(1000))
+
+    def test_cases_run(self):
+        for name, setup in run.CASES.items():
+            with self.subTest(name):
+                fn, items = setup(0.01)
+                fn()
+                self.assertGreater(items, 0)
+
+    def test_compare(self):
+        baseline = {'a': {'items_per_s': 1000, 'peak_kib': 100}, 'b': {'items_per_s': 1000, 'peak_kib': 100}}
+        results = {'a': {'items_per_s': 800, 'peak_kib': 105}, 'b': {'items_per_s': 700, 'peak_kib': 120},
+                   'new': {'items_per_s': 1, 'peak_kib': 1}}
+        regressions = run.compare(results, baseline, tolerance=0.25, alloc_tolerance=0.1)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(all(message.startswith('b: ') for message in regressions))
+
+
+if __name__ == '__main__':
+    unittest.main()
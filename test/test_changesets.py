@@ -0,0 +1,46 @@
+import unittest
+from datetime import datetime, timezone
+
+import osm.osm_api as osmapi
+from osm import osm_parser
+from bench.fixtures import synthetic_changesets
+from fake_server import FakeServer
+
+
+class ChangesetsTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakeServer(changeset_count=1000).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.api = osmapi.OsmApi(base_url=self.server.osm_url)
+
+    def test_parse_changesets(self):
+        changesets = osm_parser.parse_changesets(synthetic_changesets('', 3))
+        self.assertEqual([changeset.id for changeset in changesets], [3, 2, 1])
+        self.assertFalse(changesets[0].open)
+        self.assertEqual(changesets[0].created, datetime(2020, 1, 1, 0, 0, 1, tzinfo=timezone.utc))
+        self.assertEqual(changesets[0].open_comment, 'change 3')
+
+    def test_all_pages(self):
+        for prefetch in (True, False):
+            ids = [changeset.id for changeset in self.api.get_changesets(user='fake', prefetch=prefetch)]
+            self.assertEqual(ids, list(range(1000, 0, -1)))
+
+    def test_window_and_limit(self):
+        changesets = self.api.get_changesets(time1=datetime(2020, 1, 1, 1, 0, 0, tzinfo=timezone.utc),
+                                             time2=datetime(2020, 1, 1, 0, 4, 0, tzinfo=timezone.utc), limit=150)
+        ids = [changeset.id for changeset in changesets]
+        self.assertEqual(ids, list(range(719, 569, -1)))
+
+    def test_by_ids(self):
+        ids = [changeset.id for changeset in self.api.get_changesets(changesets=list(range(1, 251)))]
+        self.assertEqual(sorted(ids), list(range(1, 251)))
+
+
+if __name__ == '__main__':
+    unittest.main()
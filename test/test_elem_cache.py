@@ -0,0 +1,68 @@
+import unittest
+from osm.elem_cache import ElementCache
+from osm.osm_util import Node, Way
+
+
+def node(eid, version=1):
+    return Node(eid, 52.5, 13.4, version, 1, 'user', 1, '2020-01-01T00:00:00Z', True, {'amenity': 'bench'})
+
+
+class ElementCacheTest(unittest.TestCase):
+    def test_hit_miss(self):
+        cache = ElementCache()
+        self.assertIsNone(cache.get('node', 1))
+        cache.put(node(1))
+        self.assertIsNotNone(cache.get('node', '1'))
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_latest_version(self):
+        cache = ElementCache()
+        cache.put(node(1, 1))
+        cache.put(node(1, 2))
+        self.assertEqual(cache.get('node', 1).version, 2)
+        self.assertEqual(cache.get('node', 1, 1).version, 1)
+
+    def test_lru_eviction(self):
+        cache = ElementCache(max_entries=2)
+        cache.put(node(1))
+        cache.put(node(2))
+        cache.get('node', 1)
+        cache.put(node(3))
+        self.assertIsNone(cache.get('node', 2))
+        self.assertIsNotNone(cache.get('node', 1))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_ttl(self):
+        cache = ElementCache(ttl=-1)
+        cache.put(node(1))
+        self.assertIsNone(cache.get('node', 1))
+        self.assertEqual(len(cache), 0)
+
+    def test_invalidate(self):
+        cache = ElementCache()
+        cache.put(node(1, 1))
+        cache.put(node(1, 2))
+        cache.invalidate('node', 1)
+        self.assertIsNone(cache.get('node', 1))
+        self.assertEqual(cache.stats()['bytes'], 0)
+
+
+    def test_copies(self):
+        cache = ElementCache()
+        elem = node(1)
+        cache.put(elem)
+        elem.tags['amenity'] = 'waste_basket'
+        cached = cache.get('node', 1)
+        self.assertEqual(cached.tags['amenity'], 'bench')
+        cached.tags['amenity'] = 'waste_basket'
+        self.assertEqual(cache.get('node', 1).tags['amenity'], 'bench')
+
+        way = Way(2, [1, 2], 1, 1, 'user', 1, '', True, {})
+        cache.put(way)
+        cache.get('way', 2).nodes.append(3)
+        self.assertEqual(list(cache.get('way', 2).nodes), [1, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,162 @@
+import io
+import unittest
+import xml.etree.ElementTree as ElemTree
+import ee_osmose
+import osmose
+import osm.osm_api as osmapi
+from osm.throttle import Throttle, RetryPolicy
+from osm.transport import Transport
+from osm.metrics import Metrics
+from osm.osm_change import OsmChange
+from osm.osm_util import Node
+from fake_server import FakeServer
+
+
+class FakeServerTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakeServer().start()
+        cls.osmose_url = osmose.URL
+        osmose.URL = cls.server.osmose_url
+
+    @classmethod
+    def tearDownClass(cls):
+        osmose.URL = cls.osmose_url
+        cls.server.stop()
+
+    def setUp(self):
+        self.server.clear_errors()
+        self.server.requests.clear()
+        self.server.bodies.clear()
+        self.osmo = osmapi.OsmApi(base_url=self.server.osm_url)
+
+    def test_permissions(self):
+        self.assertIn('allow_write_api', self.osmo.get_permissions())
+
+    def test_get_node(self):
+        node = self.osmo.get_element('node', 4314858041)
+        self.assertEqual(node.tags['amenity'], 'bench')
+
+    def test_cached_element_not_shared(self):
+        node = self.osmo.get_element('node', 4314858041)
+        node.tags['amenity'] = 'waste_basket'
+        self.assertEqual(self.osmo.get_element('node', 4314858041).tags['amenity'], 'bench')
+        self.assertEqual(self.osmo.get_elements('node', [4314858041])[0].tags['amenity'], 'bench')
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_get_elements_order(self):
+        nodes = self.osmo.get_elements('node', [4314858043, 4314858041])
+        self.assertEqual([str(node.id) for node in nodes], ['4314858043', '4314858041'])
+
+    def test_gone(self):
+        self.server.inject('/node/', 410, method='GET')
+        with self.assertRaises(LookupError):
+            self.osmo.get_element('node', 4314858041)
+
+    def test_conflict(self):
+        self.server.inject('/node/4314858041', 409, method='PUT')
+        node = self.osmo.get_element('node', 4314858041)
+        with self.assertRaises(ee_osmose.ConflictError):
+            self.osmo.edit_element(node, 100)
+
+    def test_uri_too_long_split(self):
+        self.server.inject('/nodes', 414, times=1)
+        nodes = self.osmo.get_elements('node', [4314858041, 4314858042])
+        self.assertEqual(len(nodes), 2)
+        self.assertEqual(self.node_chunks(), [['4314858041', '4314858042'], ['4314858041'], ['4314858042']])
+
+    def test_uri_too_long_single(self):
+        self.server.inject('/nodes', 414)
+        with self.assertRaises(ee_osmose.MethodError):
+            self.osmo.get_elements('node', [4314858041])
+
+    def test_get_elements_chunks(self):
+        eids = [4314858041, 4314858042, 4314858043, 4314858044, 4314858045]
+        base = self.server.osm_url + '/nodes?nodes='
+        self.osmo.MAX_URL_LENGTH = len(base) + 2 * 11  # two ids with their commas
+        nodes = self.osmo.get_elements('node', eids)
+        self.assertEqual([node.id for node in nodes], eids[:3])
+        chunks = self.node_chunks()
+        self.assertEqual(sorted(chunks), [['4314858041', '4314858042'], ['4314858043', '4314858044'], ['4314858045']])
+        self.assertTrue(all(len(base + ','.join(chunk)) <= self.osmo.MAX_URL_LENGTH for chunk in chunks))
+
+    def node_chunks(self) -> list:
+        """
+        :returns: the ids of every sent GET /nodes, in order
+        """
+        return [path.split('nodes=')[1].split(',') for method, path in self.server.requests if '/nodes?' in path]
+
+    def test_throttled_retry(self):
+        self.server.inject('/permissions', 429, times=2, retry_after=0)
+        self.assertIn('allow_write_api', self.osmo.get_permissions())
+
+    def test_throttled_give_up(self):
+        self.server.inject('/permissions', 509)
+        throttle = Throttle(retry=RetryPolicy(retries=2, backoff=0.01))
+        osmo = osmapi.OsmApi(Transport(throttle=throttle), base_url=self.server.osm_url)
+        with self.assertRaises(ee_osmose.ThrottleError):
+            osmo.get_permissions()
+        self.assertEqual(throttle.retries, 2)
+
+    def test_retry_resends_file(self):
+        self.server.inject('/gpx/create', 429, times=1, retry_after=0)
+        trace = io.BytesIO(b'<gpx version="1.0"></gpx>')
+        self.assertEqual(self.osmo.upload_gpx(trace, 'trace.gpx', 'test', {'test'}), 5000)
+        self.assertEqual(len(self.server.bodies), 2)
+        self.assertIn(b'<gpx version="1.0"></gpx>', self.server.bodies[1])
+
+    def test_no_retry_of_unavailable_create(self):
+        self.server.inject('/changeset/create', 503)
+        with self.assertRaises(Exception):
+            self.osmo.create_changeset({'comment': 'test'})
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_large_map(self):
+        server = FakeServer(map_size=20000).start()
+        try:
+            osmo = osmapi.OsmApi(base_url=server.osm_url)
+            count = sum(1 for _ in osmo.iter_element_bbox((13.42, 52.49, 13.44, 52.52)))
+            self.assertEqual(count, 22000)
+        finally:
+            server.stop()
+
+    def test_map_streamed(self):
+        server = FakeServer(map_size=20000).start()
+        try:
+            metrics = Metrics()
+            osmo = osmapi.OsmApi(Transport(metrics=metrics), base_url=server.osm_url)
+            elems = osmo.iter_element_bbox((13.42, 52.49, 13.44, 52.52), chunk_size=4096)
+            self.assertIsInstance(next(elems), Node)
+            read = metrics.snapshot()['/map']['bytes_in']
+            self.assertEqual(sum(1 for _ in elems), 22000 - 1)
+            self.assertLess(read, metrics.snapshot()['/map']['bytes_in'] / 10)  # parsed while downloaded
+        finally:
+            server.stop()
+
+    def test_notes(self):
+        notes = self.osmo.get_notes_bbox((13.42, 52.49, 13.44, 52.52))
+        self.assertEqual(notes[0].id, 22599)
+
+    def test_diff_upload_chunked(self):
+        self.server.inject('/upload', 429, times=1, retry_after=0)
+        change = OsmChange()
+        change.create(Node(None, 52.5, 13.4, 0, None, None, None, None, True, {'name': 'a & "b"'}))
+        elems = self.osmo.diff_upload(100, change)
+        self.assertEqual(elems[0].id, 4314858100)
+        sent = [body for (method, path), body in zip(self.server.requests, self.server.bodies)
+                if path.endswith('/upload')]
+        self.assertEqual(len(sent), 2)  # the retry sends the whole document again
+        self.assertEqual(sent[0], sent[1])
+        self.assertEqual(ElemTree.fromstring(sent[1]).find('create/node/tag').get('v'), 'a & "b"')
+
+    def test_issues_loc(self):
+        issues = osmose.get_issues_loc(49.16949, 9.38447, 500)
+        self.assertEqual(len(issues), 2)
+
+    def test_issue(self):
+        issue = osmose.get_issue('a1b2c3d4-0000-0000-0000-000000000001')
+        self.assertEqual(issue.elems[0].e_type, 'way')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import io
+import gzip
+import os
+import pathlib
+import unittest
+import urllib.parse
+
+try:
+    import numpy as np
+    from osm.gpx import TrackPoints, read_gpx, prepare_upload
+except ImportError:
+    np = None
+import osm.osm_api as osmapi
+from osm.tile_cache import TileCache
+from bench.fixtures import synthetic_trackpoints
+from fake_server import FakeServer
+
+BBOX = (13.40, 52.50, 13.41, 52.51)
+
+
+@unittest.skipIf(np is None, 'numpy is not installed')
+class TrackPointsTest(unittest.TestCase):
+
+    def test_from_gpx(self):
+        xml = synthetic_trackpoints(BBOX, 250, 0)
+        points = TrackPoints.from_gpx([xml[i:i + 100] for i in range(0, len(xml), 100)])
+        self.assertEqual(len(points), 250)
+        self.assertEqual(list(np.unique(points.segment)), [0, 1, 2])
+        self.assertTrue(np.isnat(points.time[100:200]).all())
+        self.assertEqual(str(points.time[61]), '2020-01-01T00:01:01.000')
+
+    def test_concat_and_mask(self):
+        first = TrackPoints.from_gpx([synthetic_trackpoints(BBOX, 200, 0)])
+        both = TrackPoints.concat([first, TrackPoints.empty(), first])
+        self.assertEqual(len(both), 400)
+        self.assertEqual(list(np.unique(both.segment)), [0, 1, 2, 3])
+        inside = both[both.mask((13.40, 52.50, 13.405, 52.505))]
+        self.assertEqual(len(inside), 2 * 101)
+
+    def test_read_gpx_sources(self):
+        xml = synthetic_trackpoints(BBOX, 300, 0)
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'trace.gpx')
+        with open(path, 'wb') as file:
+            file.write(xml)
+        try:
+            with open(path) as text:
+                sources = [xml, xml.decode(), '\ufeff\n' + xml.decode(), path, pathlib.Path(path), io.BytesIO(xml),
+                           text, iter([xml[:77], xml[77:]])]
+                for source in sources:
+                    self.assertEqual(len(read_gpx(source, chunk_size=64)), 300)
+        finally:
+            os.remove(path)
+
+    def test_analytics(self):
+        # 0.001 deg latitude steps of about 111 m, one second apart, gap of 10 minutes after point 2
+        lat = np.array([52.0, 52.001, 52.002, 52.003, 52.004])
+        time = np.array(['2020-01-01T00:00:00', '2020-01-01T00:00:01', '2020-01-01T00:00:02',
+                         '2020-01-01T00:10:02', 'NaT'], dtype='datetime64[ms]')
+        points = TrackPoints(lat, np.full(5, 13.0), time, np.array([0, 0, 0, 0, 1]))
+        step = 0.001 * np.pi / 180 * 6378000
+        self.assertAlmostEqual(points.length(), 3 * step, places=3)
+        np.testing.assert_allclose(points.segment_lengths(), [3 * step, 0])
+        speeds = points.speeds()
+        np.testing.assert_allclose(speeds[:2], [step, step])
+        self.assertTrue(np.isnan(speeds[3]))
+        self.assertEqual(list(points.gaps()), [2])
+        self.assertEqual(points.bbox(), (13.0, 52.0, 13.0, 52.004))
+        self.assertIsNone(TrackPoints.empty().bbox())
+
+    def test_simplify(self):
+        # noisy straight line with one real corner
+        rng = np.random.default_rng(1)
+        n = 2000
+        lat = np.r_[np.linspace(52.0, 52.01, n // 2), np.full(n // 2, 52.01)] + rng.normal(0, 2e-6, n)
+        lon = np.r_[np.full(n // 2, 13.0), np.linspace(13.0, 13.01, n // 2)] + rng.normal(0, 2e-6, n)
+        time = np.datetime64('2020-01-01T00:00:00', 'ms') + np.arange(n) * np.timedelta64(1, 's')
+        points = TrackPoints(lat, lon, time, np.zeros(n, dtype=np.int64))
+        keep = points.simplify_mask(5.0)
+        self.assertLess(keep.sum(), 20)
+        self.assertTrue(keep[0] and keep[-1])
+        # every dropped point is within tolerance of the simplified line
+        kept = points[keep]
+        dense = np.interp(np.arange(n), np.nonzero(keep)[0], kept.lat), \
+            np.interp(np.arange(n), np.nonzero(keep)[0], kept.lon)
+        self.assertLess(np.abs(dense[0] - lat).max() * 111000, 10)
+        thin = points.thin_mask(10)
+        self.assertEqual(thin.sum(), n // 10 + 1)
+
+    def test_prepare_upload(self):
+        xml = synthetic_trackpoints(BBOX, 1000, 0)
+        small = prepare_upload(xml, tolerance=1.0)
+        self.assertLess(len(small), len(xml) / 10)
+        self.assertEqual(len(read_gpx(small)), 2 * 10)  # ends of the 10 straight segments
+        packed = prepare_upload(io.BytesIO(xml), compress=True)
+        self.assertEqual(gzip.decompress(packed), xml)
+        self.assertIs(prepare_upload(xml), xml)
+
+
+@unittest.skipIf(np is None, 'numpy is not installed')
+class TrackPointsApiTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakeServer(track_size=12000).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.api = osmapi.OsmApi(base_url=self.server.osm_url, tiles=TileCache(max_tiles=0))
+
+    def test_page(self):
+        self.assertEqual(len(self.api.get_bbox_gpx(BBOX, 2)), 2000)
+        sent = [path for method, path in self.server.requests if 'trackpoints' in path][-1]
+        self.assertIn('page=2', sent)
+
+    def test_tiled_pages(self):
+        api = osmapi.OsmApi(base_url=self.server.osm_url)
+        self.assertEqual(len(api.get_bbox_gpx(BBOX)), 5000)  # full tiles, bbox is requested as a whole
+        self.assertEqual(len(api.get_bbox_gpx(BBOX, 1)), 5000)
+        sent = [path for method, path in self.server.requests if 'trackpoints' in path][-1]
+        self.assertIn('page=1', sent)
+        self.assertIn(urllib.parse.quote(','.join(map(str, BBOX))), sent)
+
+    def test_iter_pages(self):
+        for prefetch in (True, False):
+            pages = list(self.api.iter_bbox_gpx(BBOX, prefetch=prefetch))
+            self.assertEqual([len(page) for page in pages], [5000, 5000, 2000])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import osm.osm_api as osmapi
+from osm.metrics import Metrics, endpoint
+from osm.transport import Transport
+from fake_server import FakeServer
+
+
+class MetricsTest(unittest.TestCase):
+    def test_endpoint(self):
+        self.assertEqual(endpoint('https://api.openstreetmap.org/api/0.6/node/4314858041/ways'), '/node/{id}/ways')
+        self.assertEqual(endpoint('http://localhost:80/api/0.6/map?bbox=1,2,3,4'), '/map')
+        self.assertEqual(endpoint('http://osmose.openstreetmap.fr/en/api/0.3beta/issue/'
+                                  'b1a2c3d4-0000-1111-2222-333344445555'), '/issue/{id}')
+
+    def test_histogram(self):
+        metrics = Metrics(buckets=(0.1, 1.0))
+        metrics.request('http://h/api/0.6/permissions', 'GET', 200, 0.05, bytes_in=10)
+        metrics.request('http://h/api/0.6/permissions', 'GET', 429, 0.5, retry=True)
+        stats = metrics.snapshot()['/permissions']
+        self.assertEqual(stats['requests'], 2)
+        self.assertEqual(stats['retries'], 1)
+        self.assertEqual(stats['status'], {('GET', 200): 1, ('GET', 429): 1})
+        self.assertEqual(stats['latency']['network']['buckets'], {0.1: 1, 1.0: 2})
+
+    def test_prometheus(self):
+        metrics = Metrics(buckets=(1.0,))
+        metrics.request('http://h/api/0.6/node/1', 'GET', 200, 0.5, bytes_in=42)
+        text = metrics.prometheus()
+        self.assertIn('osmate_requests_total{endpoint="/node/{id}",method="GET",status="200"} 1', text)
+        self.assertIn('osmate_bytes_in_total{endpoint="/node/{id}"} 42', text)
+        self.assertIn('osmate_latency_seconds_bucket{endpoint="/node/{id}",phase="network",le="+Inf"} 1', text)
+
+
+class TransportMetricsTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakeServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.server.clear_errors()
+        self.metrics = Metrics()
+        self.osmo = osmapi.OsmApi(Transport(metrics=self.metrics), base_url=self.server.osm_url)
+
+    def test_phases(self):
+        self.osmo.get_element('node', 4314858041)
+        stats = self.metrics.snapshot()['/node/{id}']
+        self.assertEqual(stats['requests'], 1)
+        self.assertGreater(stats['bytes_in'], 0)
+        self.assertEqual(set(stats['latency']), {'network', 'parse', 'build'})
+
+    def test_streamed_bytes(self):
+        server = FakeServer(map_size=500).start()
+        try:
+            transport = Transport(metrics=self.metrics)
+            data = transport.get(server.osm_url + '/map?bbox=13.4,52.5,13.41,52.51', stream=True)
+            self.assertNotIn('Content-Length', data.headers)
+            size = sum(len(chunk) for chunk in data.iter_content(4096))
+            self.assertGreater(size, 0)
+            self.assertEqual(self.metrics.snapshot()['/map']['bytes_in'], size)
+            osmo = osmapi.OsmApi(transport, base_url=server.osm_url)
+            elems = list(osmo.iter_element_bbox((13.4, 52.5, 13.41, 52.51)))
+            stats = self.metrics.snapshot()['/map']
+            self.assertGreater(len(elems), 500)
+            self.assertEqual(stats['bytes_in'], 2 * size)
+            self.assertEqual(set(stats['latency']), {'network', 'stream', 'parse'})
+        finally:
+            server.stop()
+
+    def test_retries(self):
+        self.server.inject('/permissions', 429, times=2, retry_after=0)
+        self.osmo.get_permissions()
+        stats = self.metrics.snapshot()['/permissions']
+        self.assertEqual(stats['requests'], 3)
+        self.assertEqual(stats['retries'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+import xml.etree.ElementTree as ElemTree
+from osm import osm_parser
+from osm.osm_change import OsmChange
+from osm.osm_util import Node, Way
+
+
+def new_node(lat, lon):
+    return Node(None, lat, lon, 0, None, None, None, None, True, {})
+
+
+class OsmChangeTest(unittest.TestCase):
+    def test_placeholder_ids(self):
+        change = OsmChange()
+        self.assertEqual(change.create(new_node(1.0, 2.0)), -1)
+        self.assertEqual(change.create(new_node(1.0, 2.1)), -2)
+
+    def test_serial_order(self):
+        change = OsmChange()
+        way = Way(None, [], 0, None, None, None, None, True, {'highway': 'path'})
+        change.create(way)
+        way.nodes = [change.create(new_node(1.0, 2.0)), change.create(new_node(1.0, 2.1))]
+        change.delete(Node('7', 0.0, 0.0, 2, 1, 'u', 1, None, True, {}), if_unused=True)
+        tree = ElemTree.fromstring(osm_parser.serial_change(change, 42))
+        self.assertEqual([elem.tag for elem in tree.find('create')], ['node', 'node', 'way'])
+        self.assertEqual(tree.find('delete').get('if-unused'), 'true')
+        self.assertEqual(tree.find('delete/node').get('changeset'), '42')
+
+    def test_apply_diff(self):
+        change = OsmChange()
+        node = new_node(1.0, 2.0)
+        way = Way(None, [change.create(node)], 0, None, None, None, None, True, {})
+        change.create(way)
+        deleted = Node('7', 0.0, 0.0, 2, 1, 'u', 1, None, True, {})
+        change.delete(deleted)
+        xml = '<diffResult><node old_id="-1" new_id="11" new_version="1"/>' \
+              '<way old_id="-2" new_id="12" new_version="1"/><node old_id="7"/></diffResult>'
+        result = change.apply_diff(osm_parser.parse_diff_result(xml))
+        self.assertEqual(len(result), 3)
+        self.assertEqual(node.id, 11)
+        self.assertEqual(list(way.nodes), [11])
+        self.assertFalse(deleted.visible)
+
+    def test_iter_change_batches(self):
+        change = OsmChange()
+        for i in range(25):
+            change.create(new_node(1.0, i / 10))
+        chunks = list(osm_parser.iter_change(change, 42, batch_size=10))
+        self.assertGreater(len(chunks), 2)
+        self.assertEqual(b''.join(chunks), osm_parser.serial_change(change, 42))
+        tree = ElemTree.fromstring(b''.join(chunks))
+        self.assertEqual(len(tree.find('create')), 25)
+
+    def test_serial_elem_escape(self):
+        way = Way(5, [1, 2], 3, 9, 'u<ser>', 1, None, True, {'name': 'a & "b"\nc'})
+        tree = ElemTree.fromstring(osm_parser.serial_elem(way))
+        self.assertEqual(tree.find('way').get('user'), 'u<ser>')
+        self.assertEqual([nd.get('ref') for nd in tree.findall('way/nd')], ['1', '2'])
+        self.assertEqual(tree.find('way/tag').get('v'), 'a & "b"\nc')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+
+try:
+    import numpy as np
+    from osm.osm_columnar import ColumnarMap
+except ImportError:
+    np = None
+
+MAP = b'''<osm version="0.6">
+ <bounds minlat="52.0" minlon="13.0" maxlat="53.0" maxlon="14.0"/>
+ <node id="3" lat="52.0" lon="13.0"/>
+ <node id="1" lat="52.001" lon="13.0"><tag k="amenity" v="bench"/></node>
+ <node id="2" lat="52.002" lon="13.0"/>
+ <way id="10"><nd ref="3"/><nd ref="1"/><nd ref="2"/><tag k="highway" v="path"/></way>
+ <way id="11"></way>
+ <way id="12"><nd ref="2"/><nd ref="99"/></way>
+ <relation id="20"><member type="way" ref="10" role="outer"/><tag k="type" v="route"/></relation>
+</osm>'''
+
+
+@unittest.skipIf(np is None, 'numpy not installed')
+class ColumnarMapTest(unittest.TestCase):
+    def setUp(self):
+        self.map = ColumnarMap.from_xml([MAP[:100], MAP[100:]])
+
+    def test_columns(self):
+        self.assertEqual(self.map.node_ids.tolist(), [3, 1, 2])
+        self.assertEqual(self.map.way_offsets.tolist(), [0, 3, 3, 5])
+        self.assertEqual(self.map.way_nodes.tolist(), [0, 1, 2, 2, -1])
+        self.assertEqual(self.map.member_ref.tolist(), [10])
+
+    def test_way_lengths(self):
+        lengths = self.map.way_lengths()
+        self.assertAlmostEqual(lengths[0], 222.6, delta=0.5)
+        self.assertEqual(lengths[1], 0)
+        self.assertEqual(lengths[2], 0)
+
+    def test_bbox(self):
+        bbox = (12.9, 52.0015, 13.1, 52.01)
+        self.assertEqual(self.map.node_mask(bbox).tolist(), [False, False, True])
+        self.assertEqual(self.map.ways_in_bbox(bbox).tolist(), [0, 2])
+        self.assertTrue(np.isnan(self.map.way_bboxes()[1]).all())
+
+    def test_tags(self):
+        self.assertEqual(self.map.tag_mask('node', 'amenity', 'bench').tolist(), [False, True, False])
+        self.assertEqual(self.map.tag_column('way', 'highway').tolist(), ['path', None, None])
+
+    def test_nearest(self):
+        self.assertEqual(self.map.nearest_nodes(52.0021, 13.0, 2).tolist(), [2, 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
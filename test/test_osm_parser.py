@@ -0,0 +1,84 @@
+import os
+import unittest
+from osm import osm_parser
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'GET', 'api', '0.6')
+
+RELATION = b'<osm><!-- comment --><relation id="5" version="3" changeset="9" user="u" uid="1" visible="true">' \
+           b'<member type="way" ref="201774" role="outer"/><tag k="type" v="multipolygon"/></relation></osm>'
+CHANGESET = b'<osm><changeset id="7" user="u" uid="1" created_at="2020-05-30T08:01:10Z" open="false" ' \
+            b'closed_at="2020-05-30T09:01:10Z" min_lat="1" min_lon="2" max_lat="3" max_lon="4">' \
+            b'<tag k="comment" v="fix"/><discussion><comment date="2020-05-31T00:00:00Z" uid="2" user="v">' \
+            b'<text>thanks</text></comment></discussion></changeset></osm>'
+USER = b'<osm><user id="7634" display_name="osmate" account_created="2019-01-01T00:00:00Z">' \
+       b'<description>hi</description><contributor-terms agreed="true"/><changesets count="12"/>' \
+       b'<traces count="3"/></user></osm>'
+
+
+def fixture(name: str) -> bytes:
+    with open(os.path.join(FIXTURES, name), 'rb') as file:
+        return file.read()
+
+
+class ParserTest(unittest.TestCase):
+    def tearDown(self):
+        osm_parser.use_backend(osm_parser.available_backends()[0])
+
+    @staticmethod
+    def backends() -> list:
+        return osm_parser.available_backends()
+
+    def test_elems(self):
+        for backend in self.backends():
+            with self.subTest(backend=backend):
+                osm_parser.use_backend(backend)
+                way, = osm_parser.parse_elems(osm_parser.fromstring(fixture('way/201774')))
+                self.assertEqual(list(way.nodes), [4314858041, 4314858042, 4314858043])
+                self.assertEqual(way.tags, {'highway': 'footway'})
+                self.assertEqual(way.version, 2)
+                relation, = osm_parser.parse_elems(osm_parser.fromstring(RELATION))
+                self.assertEqual(relation.members, [{'type': 'way', 'ref': 201774, 'role': 'outer'}])
+                self.assertEqual(relation.tags, {'type': 'multipolygon'})
+
+    def test_iter_elems(self):
+        data = fixture('way/201774')
+        for backend in self.backends():
+            with self.subTest(backend=backend):
+                osm_parser.use_backend(backend)
+                elems = list(osm_parser.iter_elems(data[i:i + 50] for i in range(0, len(data), 50)))
+                self.assertEqual([elem.id for elem in elems], [201774])
+
+    def test_notes(self):
+        for backend in self.backends():
+            with self.subTest(backend=backend):
+                osm_parser.use_backend(backend)
+                note, = osm_parser.parse_notes(osm_parser.fromstring(fixture('notes')))
+                self.assertEqual(note.id, 22599)
+                self.assertTrue(note._open)
+                self.assertEqual(note._comments[0].text, 'bench is missing')
+                self.assertEqual(note._comments[0].action, 'opened')
+
+    def test_changeset(self):
+        for backend in self.backends():
+            with self.subTest(backend=backend):
+                osm_parser.use_backend(backend)
+                changeset = osm_parser.parse_changeset(CHANGESET)
+                self.assertFalse(changeset.open)
+                self.assertEqual(changeset.tags, {'comment': 'fix'})
+                self.assertEqual(changeset.comments[0].text, 'thanks')
+
+    def test_user(self):
+        for backend in self.backends():
+            with self.subTest(backend=backend):
+                osm_parser.use_backend(backend)
+                user, = osm_parser.parse_user(USER)
+                self.assertEqual((user['name'], user['terms'], user['changeset_count'], user['traces_count']),
+                                 ('osmate', True, 12, 3))
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            osm_parser.use_backend('sax')
+
+
+if __name__ == '__main__':
+    unittest.main()
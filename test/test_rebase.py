@@ -0,0 +1,108 @@
+import unittest
+from ee_osmose import ConflictError
+import osm.osm_api as osmapi
+from osm.osm_util import Node, Way, Relation
+from osm.rebase import ElementDelta, server_version
+from fake_server import FakeServer
+
+MISMATCH = 'Version mismatch: Provided 2, server had: 3 of Node 4314858041'
+
+
+def node(version=1, tags=None, lat=52.5, lon=13.4):
+    return Node(1, lat, lon, version, 1, 'user', 1, '2020-01-01T00:00:00Z', True, tags or {'amenity': 'bench'})
+
+
+class ElementDeltaTest(unittest.TestCase):
+    def test_merge_disjoint_tags(self):
+        delta = ElementDelta(node(1), tags={'backrest': 'yes'}, remove=['amenity'])
+        current = node(2, {'amenity': 'bench', 'material': 'wood'})
+        merged = delta.merge(current)
+        self.assertEqual(merged.tags, {'backrest': 'yes', 'material': 'wood'})
+        self.assertEqual(merged.version, 2)
+        self.assertEqual(current.tags, {'amenity': 'bench', 'material': 'wood'})
+
+    def test_conflicting_tag(self):
+        delta = ElementDelta(node(1), tags={'amenity': 'waste_basket'})
+        with self.assertRaises(ConflictError):
+            delta.merge(node(2, {'amenity': 'bicycle_parking'}))
+
+    def test_same_change_is_not_pending(self):
+        delta = ElementDelta(node(1), tags={'backrest': 'yes'})
+        current = node(2, {'amenity': 'bench', 'backrest': 'yes'})
+        self.assertEqual(delta.conflicts(current), [])
+        self.assertFalse(delta.pending(current))
+
+    def test_position(self):
+        delta = ElementDelta(node(1), lat=52.6, lon=13.5)
+        merged = delta.merge(node(2, {'name': 'x'}))
+        self.assertEqual((merged.lat, merged.lon), (52.6, 13.5))
+        with self.assertRaises(ConflictError):
+            delta.merge(node(2, lat=52.7))
+
+    def test_diff_way_and_relation(self):
+        base = Way(5, [1, 2, 3], 1, 1, 'user', 1, '', True, {'highway': 'path'})
+        edited = Way(5, [1, 2, 3, 4], 1, 1, 'user', 1, '', True, {'highway': 'footway'})
+        delta = ElementDelta.diff(base, edited)
+        merged = delta.merge(Way(5, [1, 2, 3], 2, 1, 'user', 1, '', True, {'highway': 'path', 'lit': 'yes'}))
+        self.assertEqual(list(merged.nodes), [1, 2, 3, 4])
+        self.assertEqual(merged.tags, {'highway': 'footway', 'lit': 'yes'})
+        with self.assertRaises(ConflictError):
+            delta.merge(Way(5, [1, 3], 2, 1, 'user', 1, '', True, {'highway': 'path'}))
+
+        members = [{'type': 'way', 'ref': 5, 'role': 'outer'}]
+        base = Relation(7, members, 1, 1, 'user', 1, '', True, {'type': 'multipolygon'})
+        delta = ElementDelta(base, members=members + [{'type': 'way', 'ref': 6, 'role': 'inner'}])
+        merged = delta.merge(Relation(7, members, 2, 1, 'user', 1, '', True, {'type': 'multipolygon'}))
+        self.assertEqual([member['ref'] for member in merged.members], [5, 6])
+
+    def test_deleted(self):
+        current = node(2)
+        current.visible = False
+        with self.assertRaises(ConflictError):
+            ElementDelta(node(1), tags={'backrest': 'yes'}).merge(current)
+
+    def test_server_version(self):
+        self.assertEqual(server_version(MISMATCH), 3)
+        self.assertIsNone(server_version('The changeset 100 was closed at 2020-06-01 10:00:00 UTC'))
+
+
+class RebaseEditTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakeServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.server.clear_errors()
+        self.server.requests.clear()
+        self.osmo = osmapi.OsmApi(base_url=self.server.osm_url)
+        self.base = Node(4314858041, 52.5134, 13.4374, 2, 1, 'osmate', 7634, '', True, {'amenity': 'bench'})
+
+    def test_rebase_on_version_mismatch(self):
+        self.server.inject('/node/4314858041', 409, times=1, method='PUT', body=MISMATCH)
+        version = self.osmo.edit_element_rebase(ElementDelta(self.base, tags={'material': 'wood'}), 100)
+        self.assertEqual(version, 4)
+        self.assertEqual([method for method, _ in self.server.requests], ['PUT', 'GET', 'PUT'])
+        body = self.server.bodies[-1].decode()
+        self.assertIn('version="3"', body)
+        self.assertIn('k="backrest"', body)
+        self.assertIn('k="material"', body)
+
+    def test_real_conflict(self):
+        self.server.inject('/node/4314858041', 409, times=1, method='PUT', body=MISMATCH)
+        with self.assertRaises(ConflictError):
+            self.osmo.edit_element_rebase(ElementDelta(self.base, tags={'backrest': 'no'}), 100)
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_closed_changeset_not_retried(self):
+        self.server.inject('/node/4314858041', 409, method='PUT', body='The changeset 100 was closed')
+        with self.assertRaises(ConflictError):
+            self.osmo.edit_element_rebase(ElementDelta(self.base, tags={'material': 'wood'}), 100)
+        self.assertEqual(len(self.server.requests), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
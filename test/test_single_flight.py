@@ -0,0 +1,111 @@
+import os
+import time
+import threading
+import unittest
+import osmose
+import osm.osm_api as osmapi
+from osm.single_flight import SingleFlight
+from fake_server import FakeServer
+
+
+def run_parallel(fn, n: int = 8) -> list:
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(fn())) for _ in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class SingleFlightTest(unittest.TestCase):
+
+    def test_concurrent_calls_share(self):
+        flight = SingleFlight()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.1)
+            return object()
+
+        results = run_parallel(lambda: flight.do('key', slow))
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(flight.stats(), {'calls': 1, 'shared': 7, 'in_flight': 0})
+        flight.do('key', slow)
+        self.assertEqual(len(calls), 2)
+
+    def test_share(self):
+        flight = SingleFlight()
+
+        def slow():
+            time.sleep(0.1)
+            return {'calls': 1}
+
+        results = run_parallel(lambda: flight.do('key', slow, share=dict))
+        self.assertEqual(len({id(result) for result in results}), 8)
+        self.assertTrue(all(result == {'calls': 1} for result in results))
+
+    def test_error_is_shared(self):
+        flight = SingleFlight()
+
+        def fail():
+            time.sleep(0.05)
+            raise LookupError('gone')
+
+        def call():
+            try:
+                flight.do('key', fail)
+            except LookupError as err:
+                return err
+
+        errors = run_parallel(call, 4)
+        self.assertEqual(len(errors), 4)
+        self.assertTrue(all(isinstance(err, LookupError) for err in errors))
+        self.assertEqual(len(flight), 0)
+
+
+class CoalescedRequestsTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakeServer(latency=0.1).start()
+        cls.osmose_url = osmose.URL
+        osmose.URL = cls.server.osmose_url
+
+    @classmethod
+    def tearDownClass(cls):
+        osmose.URL = cls.osmose_url
+        cls.server.stop()
+
+    def count(self, part: str) -> int:
+        return sum(1 for method, path in self.server.requests if part in path)
+
+    def test_get_element(self):
+        api = osmapi.OsmApi(base_url=self.server.osm_url)
+        nodes = run_parallel(lambda: api.get_element('node', 4314858041))
+        self.assertEqual({node.id for node in nodes}, {4314858041})
+        self.assertEqual(self.count('/node/4314858041'), 1)
+        self.assertEqual(len({id(node) for node in nodes}), len(nodes))
+        nodes[0].tags['amenity'] = 'waste_basket'
+        self.assertTrue(all(node.tags['amenity'] == 'bench' for node in nodes[1:]))
+
+    def test_get_note(self):
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'GET', 'api', '0.6',
+                               'notes')) as file:
+            self.server.inject('/notes/22599$', 200, method='GET', body=file.read())
+        self.addCleanup(self.server.clear_errors)
+        api = osmapi.OsmApi(base_url=self.server.osm_url)
+        sent = self.count('/notes/22599')
+        notes = run_parallel(lambda: api.get_note(22599), 4)
+        self.assertEqual(self.count('/notes/22599') - sent, 1)
+        self.assertEqual({note.id for note in notes}, {22599})
+        self.assertEqual(len({id(note) for note in notes}), 4)
+
+    def test_get_issues_loc(self):
+        run_parallel(lambda: osmose.get_issues_loc(52.5134, 13.4374, 100))
+        self.assertEqual(self.count('/issues?'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
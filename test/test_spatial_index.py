@@ -0,0 +1,52 @@
+import unittest
+from osm.osm_util import Node, Way, Note, distance
+from osm.spatial_index import SpatialIndex
+
+
+class SpatialIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = SpatialIndex(cell_size=0.01)
+        self.points = [(52.0 + i * 0.003, 13.0 + j * 0.003) for i in range(20) for j in range(20)]
+        for i, (lat, lon) in enumerate(self.points):
+            self.index.insert(lat, lon, i)
+
+    def test_bbox(self):
+        bbox = (13.01, 52.01, 13.03, 52.02)
+        expected = {i for i, (lat, lon) in enumerate(self.points) if 52.01 <= lat <= 52.02 and 13.01 <= lon <= 13.03}
+        self.assertEqual(set(self.index.bbox(bbox)), expected)
+
+    def test_radius(self):
+        hits = self.index.radius(52.03, 13.03, 500)
+        expected = {i for i, (lat, lon) in enumerate(self.points) if distance(52.03, 13.03, lat, lon) <= 500}
+        self.assertEqual({item for _, item in hits}, expected)
+        self.assertEqual([dist for dist, _ in hits], sorted(dist for dist, _ in hits))
+
+    def test_nearest(self):
+        for lat, lon in ((52.0301, 13.0299), (51.9, 12.9), (52.2, 13.0)):
+            brute = sorted((distance(lat, lon, p_lat, p_lon), i) for i, (p_lat, p_lon) in enumerate(self.points))
+            self.assertEqual([item for _, item in self.index.nearest(lat, lon, 4)], [i for _, i in brute[:4]])
+        self.assertEqual(SpatialIndex().nearest(52.0, 13.0), [])
+
+    def test_replace_and_remove(self):
+        self.index.insert(60.0, 20.0, 'moved', key=0)
+        self.assertEqual(len(self.index), len(self.points))
+        self.assertEqual(self.index.nearest(60.0, 20.0)[0][1], 'moved')
+        self.index.remove(0)
+        self.assertNotIn('moved', self.index.bbox((19.0, 59.0, 21.0, 61.0)))
+
+    def test_add_elements_and_notes(self):
+        index = SpatialIndex()
+        nodes = [Node(1, 52.0, 13.0, 1, 1, 'u', 1, None, True, {}),
+                 Node(2, 52.0, 13.002, 1, 1, 'u', 1, None, True, {})]
+        way = Way(10, [1, 2], 1, 1, 'u', 1, None, True, {})
+        note = Note(5, 52.1, 13.1, '2020-01-01 00:00:00 UTC', True, [])
+        index.add_elements(nodes + [way])
+        index.add_notes([note])
+        self.assertEqual(len(index), 4)
+        self.assertIs(index.nearest(52.0, 13.001, 1)[0][1], way)
+        self.assertEqual(index.bbox((13.05, 52.05, 13.15, 52.15)), [note])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import os
+import sys
+import subprocess
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHECK = '''
+import logging, sys
+import osm.osm_api, osmose
+assert not logging.getLogger().handlers, 'logging configured on import'
+lazy = [name for name in ('requests', 'aiohttp', 'asyncio', 'dateutil', 'numpy', 'lxml') if name in sys.modules]
+assert not lazy, 'imported on import: {}'.format(lazy)
+api = osm.osm_api.OsmApi(base_url='http://127.0.0.1:9')
+try:
+    api.get_permissions()
+except osm.osm_api.AuthError:
+    pass
+else:
+    raise AssertionError('missing credentials not reported')
+'''
+
+
+class StartupTest(unittest.TestCase):
+    def test_import_without_side_effects(self):
+        env = {key: value for key, value in os.environ.items() if key not in ('OSM_USERNAME', 'OSM_PASSWORD')}
+        env['PYTHONPATH'] = ROOT
+        proc = subprocess.run([sys.executable, '-c', CHECK], env=env, capture_output=True, text=True)
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+from osm.throttle import TokenBucket, RetryPolicy
+from osm.transport import Response, idempotent
+
+
+def response(status: int, headers: dict = None):
+    return Response('', status, b'', headers or {})
+
+
+class ThrottleTest(unittest.TestCase):
+    def test_bucket_burst(self):
+        bucket = TokenBucket(rate=1.0, burst=3)
+        self.assertEqual([bucket.reserve() for _ in range(3)], [0.0, 0.0, 0.0])
+        self.assertGreater(bucket.reserve(), 0.9)
+
+    def test_backoff_bounds(self):
+        retry = RetryPolicy(backoff=1.0, max_backoff=4.0)
+        for attempt in range(6):
+            self.assertLessEqual(retry.delay(attempt), 4.0)
+
+    def test_retry_after(self):
+        retry = RetryPolicy(backoff=1.0, max_backoff=60.0)
+        self.assertGreaterEqual(retry.delay(0, '5'), 5.0)
+        self.assertLess(retry.delay(0, '5'), 5.2)
+        self.assertLessEqual(retry.delay(0, 'Wed, 21 Oct 2015 07:28:00 GMT'), 1.0)
+
+    def test_retryable(self):
+        retry = RetryPolicy()
+        self.assertTrue(retry.retryable(response(503)))
+        self.assertFalse(retry.retryable(response(503), idempotent=False))
+        self.assertTrue(retry.retryable(response(503, {'Retry-After': '1'}), idempotent=False))
+        self.assertTrue(retry.retryable(response(429), idempotent=False))
+        self.assertFalse(retry.retryable(response(500)))
+
+    def test_idempotent(self):
+        self.assertTrue(idempotent('GET', 'https://x/api/0.6/node/1'))
+        self.assertTrue(idempotent('PUT', 'https://x/api/0.6/node/1'))
+        self.assertFalse(idempotent('PUT', 'https://x/api/0.6/changeset/create'))
+        self.assertFalse(idempotent('POST', 'https://x/api/0.6/notes?lat=1&lon=2'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import time
+import unittest
+import osm.osm_api as osmapi
+from osm.osm_util import Node, Way, Relation, Note
+from osm.tile_cache import TileCache, merge_elements
+from fake_server import FakeServer
+
+
+def node(eid, lat, lon, version=1):
+    return Node(eid, lat, lon, version, 1, 'u', 1, None, True, {})
+
+
+class TileCacheTest(unittest.TestCase):
+
+    def test_snapping(self):
+        cache = TileCache(tile_size=0.01)
+        self.assertEqual(cache.tiles((13.001, 52.001, 13.009, 52.009)), [(1300, 5200)])
+        self.assertEqual(len(cache.tiles((13.005, 52.005, 13.015, 52.015))), 4)
+        self.assertEqual(cache.tiles((13.0, 52.0, 14.0, 53.0)), [])
+        self.assertEqual(cache.tile_bbox((1300, 5200)), (13.0, 52.0, 13.01, 52.01))
+
+    def test_ttl_and_invalidate(self):
+        cache = TileCache(tile_size=0.01, ttl=0.05)
+        cache.put('map', (1300, 5200), [1])
+        cache.put(('notes', 100, 7), (1300, 5200), [2])
+        self.assertEqual(cache.get('map', (1300, 5200)), [1])
+        cache.invalidate('notes', 52.005, 13.005)
+        self.assertIsNone(cache.get(('notes', 100, 7), (1300, 5200)))
+        time.sleep(0.06)
+        self.assertIsNone(cache.get('map', (1300, 5200)))
+
+    def test_merge_elements(self):
+        inside, outside = node(1, 52.005, 13.005), node(2, 52.02, 13.02)
+        way = Way(10, [1, 2], 1, 1, 'u', 1, None, True, {})
+        far = Way(11, [2], 1, 1, 'u', 1, None, True, {})
+        rel = Relation(20, [{'type': 'way', 'ref': '10', 'role': ''}], 1, 1, 'u', 1, None, True, {})
+        newer = node(1, 52.005, 13.005, version=2)
+        merged = merge_elements([[inside, way, rel, outside], [newer, outside, far]], (13.0, 52.0, 13.01, 52.01))
+        self.assertEqual([(elem.type, elem.id) for elem in merged],
+                         [('node', 1), ('node', 2), ('way', 10), ('relation', 20)])
+        self.assertIsNot(merged[0], newer)
+        self.assertEqual(merged[0].version, 2)
+
+    def test_merge_parent_relations(self):
+        inside = node(1, 52.005, 13.005)
+        rel = Relation(20, [{'type': 'node', 'ref': 1, 'role': ''}], 1, 1, 'u', 1, None, True, {})
+        parent = Relation(21, [{'type': 'relation', 'ref': 20, 'role': ''}], 1, 1, 'u', 1, None, True, {})
+        grandparent = Relation(22, [{'type': 'relation', 'ref': 21, 'role': ''}], 1, 1, 'u', 1, None, True, {})
+        merged = merge_elements([[inside, rel], [parent, grandparent]], (13.0, 52.0, 13.01, 52.01))
+        self.assertEqual([(elem.type, elem.id) for elem in merged],
+                         [('node', 1), ('relation', 20), ('relation', 21)])
+
+
+class TiledQueryTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakeServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def test_notes_limit(self):
+        api = osmapi.OsmApi(base_url=self.server.osm_url)
+        notes = [Note(nid, 52.005, 13.005 + (nid % 2) * 0.01, '2020-05-0{} 12:00:00 UTC'.format(nid), True, [])
+                 for nid in range(1, 7)]
+        api.tiles.put(('notes', 3, 7), (1300, 5200), [note for note in notes if note.lon < 13.01])
+        api.tiles.put(('notes', 3, 7), (1301, 5200), [note for note in notes if note.lon > 13.01])
+        sent = len(self.server.requests)
+        found = api.get_notes_bbox((13.001, 52.001, 13.019, 52.009), limit=3)
+        self.assertEqual([note.id for note in found], [6, 5, 4])
+        self.assertEqual(len(self.server.requests), sent)
+
+    def test_move_node_across_tiles(self):
+        api = osmapi.OsmApi(base_url=self.server.osm_url)
+        elem = api.get_element('node', 4314858041)  # tile (1343, 5251)
+        old_tile, new_tile, way_tile, other_tile = (1343, 5251), (1344, 5251), (1342, 5251), (1342, 5250)
+        api.tiles.put('map', old_tile, [elem])
+        api.tiles.put('map', new_tile, [])
+        api.tiles.put('map', way_tile, [elem, Way(1, [elem.id], 1, 1, 'u', 1, None, True, {})])
+        api.tiles.put('map', other_tile, [node(2, 52.505, 13.425)])
+        elem.lon = 13.4404
+        api.edit_element(elem, 100)
+        self.assertIsNone(api.tiles.get('map', old_tile))
+        self.assertIsNone(api.tiles.get('map', new_tile))
+        self.assertIsNone(api.tiles.get('map', way_tile))
+        self.assertIsNotNone(api.tiles.get('map', other_tile))
+
+    def test_cached_map_not_shared(self):
+        server = FakeServer(map_grid=0.001).start()
+        try:
+            api = osmapi.OsmApi(base_url=server.osm_url)
+            bbox = (13.4005, 52.5005, 13.4095, 52.5095)
+            first = api.get_element_bbox(bbox)
+            first[0].tags['vandal'] = 'yes'
+            first[0].lat = 0.0
+            sent = len(server.requests)
+            second = api.get_element_bbox(bbox)
+            self.assertEqual(len(server.requests), sent)
+            self.assertIsNot(second[0], first[0])
+            self.assertNotIn('vandal', second[0].tags)
+            self.assertNotEqual(second[0].lat, 0.0)
+        finally:
+            server.stop()
+
+    def test_nearby_queries_share_tiles(self):
+        api = osmapi.OsmApi(base_url=self.server.osm_url)
+        first = api.get_notes_bbox((13.432, 52.508, 13.442, 52.518))
+        sent = len(self.server.requests)
+        second = api.get_notes_bbox((13.433, 52.509, 13.443, 52.519))
+        self.assertEqual([note.id for note in first], [22599])
+        self.assertEqual([note.id for note in second], [22599])
+        self.assertLessEqual(len(self.server.requests) - sent, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
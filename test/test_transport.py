@@ -0,0 +1,46 @@
+import unittest
+from osm.transport import Transport
+from fake_server import FakeServer
+
+
+class TransportTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakeServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.server.clear_errors()
+        self.calls = 0
+
+    def auth(self) -> tuple:
+        self.calls += 1
+        return 'fake', 'fake'
+
+    def test_lazy_session(self):
+        transport = Transport(auth=self.auth)
+        self.assertIsNone(transport.session)
+        self.assertEqual(self.calls, 0)
+        transport.get(self.server.osm_url + '/permissions')
+        self.assertIsNotNone(transport.session)
+        self.assertEqual(transport.session.auth, ('fake', 'fake'))
+
+    def test_session_reused(self):
+        with Transport(auth=self.auth, pool_maxsize=3) as transport:
+            for _ in range(5):
+                self.assertTrue(transport.get(self.server.osm_url + '/permissions').ok)
+            session = transport.session
+            transport.get(self.server.osm_url + '/node/4314858041')
+            self.assertIs(transport.session, session)
+            self.assertEqual(self.calls, 1)
+            adapter = session.get_adapter(self.server.osm_url)
+            self.assertEqual(adapter._pool_maxsize, 3)
+            pools = adapter.poolmanager.pools
+            self.assertEqual([pools[key].num_connections for key in pools.keys()], [1])  # all on one connection
+
+
+if __name__ == '__main__':
+    unittest.main()
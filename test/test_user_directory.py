@@ -0,0 +1,66 @@
+import time
+import threading
+import unittest
+from osm.user_directory import UserDirectory
+
+
+class FakeUsers:
+    """ fetch function answering every even uid, counting requests """
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, uids: list) -> list:
+        with self.lock:
+            self.calls.append(list(uids))
+        time.sleep(self.delay)
+        return [{'uid': str(uid), 'name': 'user{}'.format(uid)} for uid in uids if uid % 2 == 0]
+
+
+class UserDirectoryTest(unittest.TestCase):
+
+    def test_cache_and_chunks(self):
+        fetch = FakeUsers()
+        users = UserDirectory(fetch, chunk_size=100)
+        found = users.get_many(range(250))
+        self.assertEqual(len(found), 125)
+        self.assertEqual(sorted(len(call) for call in fetch.calls), [50, 100, 100])
+        users.get_many(range(250))
+        self.assertIsNone(users.get(3))
+        self.assertEqual(users.get(4)['name'], 'user4')
+        self.assertEqual(len(fetch.calls), 3)
+
+    def test_ttl(self):
+        fetch = FakeUsers()
+        users = UserDirectory(fetch, ttl=0.05)
+        users.get(2)
+        time.sleep(0.06)
+        users.get(2)
+        self.assertEqual(len(fetch.calls), 2)
+
+    def test_coalesce_concurrent(self):
+        fetch = FakeUsers(delay=0.1)
+        users = UserDirectory(fetch)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(users.get(42))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(fetch.calls), 1)
+        self.assertEqual([user['uid'] for user in results], ['42'] * 8)
+
+    def test_failure_is_shared(self):
+        def fetch(uids):
+            raise ConnectionError('down')
+
+        users = UserDirectory(fetch)
+        with self.assertRaises(ConnectionError):
+            users.get(1)
+        self.assertEqual(len(users), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()